@@ -1,8 +1,40 @@
 import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 from dotenv import load_dotenv
-from upstash_vector import Index
 import hashlib
+import io
+import itertools
+import json
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from sentence_transformers import SentenceTransformer
+from query_cache import bump_namespace_version
+from vector_store import get_vector_store, resolve_namespace, set_namespace_alias
+from lexical_index import load_lexical_index, save_lexical_index, update_lexical_index, BM25Index
+from utils import canonical_answer
+from tenants import get_tenant_registry
+
+EMBEDDING_MODEL = 'BAAI/bge-small-en-v1.5'
+
+# Which chunk ids each namespace holds, so re-runs only embed what changed
+MANIFEST_DIR = os.getenv(
+    "INGEST_MANIFEST_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "ingest_manifests")
+)
+
+# Chunks per model.encode call, and how many encode calls run at once
+EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH", "64"))
+EMBED_WORKERS = int(os.getenv("INGEST_EMBED_WORKERS", str(os.cpu_count() or 1)))
+
+# Precompute a TTS-ready answer per single-question chunk so queries asking it skip the formatter LLM
+CANONICAL_ANSWERS = os.getenv("INGEST_CANONICAL_ANSWERS", "1") != "0"
+
+# Category of the Q&A pairs server.py ingests when a supervisor resolves a session
+SERVER_QA_CATEGORY = "Customer_QA"
 
 def chunk_text(text, chunk_size=500, overlap=50):
     """Split text into overlapping chunks for better vector search"""
@@ -25,12 +57,310 @@ def get_embeddings(texts, model):
     embeddings = model.encode(texts)
     return embeddings.tolist()
 
-def ingest_salon_data():
-    """Ingest salon data into Upstash Vector database"""
+def process_section(section):
+    """Turn one raw '=== '-delimited section into titled chunks, splitting large ones"""
+    if not section.strip():
+        return []
+
+    # Clean up section header
+    if section.startswith('LUXURY SPA'):
+        section_title = "General Information"
+        section_content = section
+    else:
+        lines = section.split('\n', 1)
+        section_title = lines[0].replace('===', '').strip()
+        section_content = lines[1] if len(lines) > 1 else ""
+    
+    # Further chunk large sections
+    if len(section_content) > 1000:
+        chunks = chunk_text(section_content, chunk_size=400, overlap=50)
+        return [
+            {
+                'title': f"{section_title} - Part {i+1}",
+                'content': chunk.strip(),
+                'category': section_title
+            }
+            for i, chunk in enumerate(chunks)
+        ]
+    return [{
+        'title': section_title,
+        'content': section_content.strip(),
+        'category': section_title
+    }]
+
+def iter_sections(lines):
+    """
+    Stream titled chunks from an iterable of lines (e.g. an open file). Same result as
+    splitting the whole text on '=== ', but only one section is held in memory.
+    """
+    current = []
+    for line in lines:
+        parts = line.split('=== ')
+        current.append(parts[0])
+        for part in parts[1:]:
+            yield from process_section(''.join(current))
+            current = [part]
+    yield from process_section(''.join(current))
+
+def build_sections(content):
+    """Split salon data into titled sections, chunking large ones"""
+    return list(iter_sections(io.StringIO(content)))
+
+def iter_unique_sections(sections, seen):
+    """Attach content ids and skip repeated chunks, recording id -> [title, category] in `seen`"""
+    for section in sections:
+        section['id'] = create_vector_id(section['content'])
+        if section['id'] in seen:
+            continue
+        seen[section['id']] = [section['title'], section['category']]
+        yield section
+
+def changed_sections(sections, chunks, indexed, missing):
+    """
+    Yield sections that are new or changed since the manifest `chunks`. Unchanged ones are
+    already stored; those absent from the lexical index (`indexed` ids) are recorded in
+    `missing` as id -> metadata.
+    """
+    for section in sections:
+        if chunks.get(section['id']) != [section['title'], section['category']]:
+            yield section
+        elif section['id'] not in indexed:
+            missing[section['id']] = {
+                'title': section['title'],
+                'category': section['category'],
+                'content': section['content']
+            }
+
+def single_question(content):
+    """The question of a section holding exactly one 'Q: ... A: ...' pair, else None"""
+    match = re.fullmatch(r"Q:\s*(.+?)\s*\nA:\s*(.+)", content.strip(), re.DOTALL)
+    if not match or "\nQ:" in match.group(2):
+        return None
+    return match.group(1)
+
+def chunk_answerer(namespace):
+    """
+    Return a function giving a section's question and canonical answer, in the namespace
+    tenant's persona, as metadata to store with it. Sections covering several topics get
+    none ({}): one summary of them would not answer most of the questions they match.
+    """
+    system_message = get_tenant_registry().formatter_instruction(namespace)
+
+    def answer(section):
+        question = single_question(section['content'])
+        if question is None:
+            return {}
+        spoken = canonical_answer(section['content'], question, system_message)
+        return {'question': question, 'canonical_answer': spoken} if spoken else {}
+    return answer
+
+def _manifest_path(namespace):
+    return os.path.join(MANIFEST_DIR, f"{namespace}.json")
+
+def load_manifest(namespace):
+    """Return the manifest written by the last successful run, or None"""
+    try:
+        with open(_manifest_path(namespace), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def save_manifest(namespace, physical_namespace, chunks, canonical_answers=False):
+    os.makedirs(MANIFEST_DIR, exist_ok=True)
+    path = _manifest_path(namespace)
+    with open(path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump({
+            'model': EMBEDDING_MODEL,
+            'canonical_answers': canonical_answers,
+            'physical_namespace': physical_namespace,
+            'chunks': chunks
+        }, f)
+    os.replace(path + ".tmp", path)
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+def _prepare_batch(batch, model, answer_fn):
+    """Embed a batch and, if answer_fn is given, precompute each section's canonical answer metadata"""
+    embeddings = get_embeddings([section['content'] for section in batch], model)
+    answers = [answer_fn(section) for section in batch] if answer_fn else [{}] * len(batch)
+    return embeddings, answers
+
+def upsert_sections(vector_client, sections, model, namespace, batch_size=None, workers=None,
+                    answer_fn=None, lexical_index=None):
+    """
+    Embed and upsert a stream of sections. Batches of batch_size are encoded (and their
+    canonical answer metadata generated by answer_fn) on a thread pool while finished batches are
+    uploaded, with at most 2 * workers batches in flight, so memory stays bounded however
+    large the input is. Stored sections are added to lexical_index with their metadata.
+    Returns (ids that were stored, number of sections attempted).
+    """
+    batch_size = batch_size or EMBED_BATCH_SIZE
+    workers = workers or EMBED_WORKERS
+    stored, attempted = [], 0
+    started = time.perf_counter()
+
+    def upload(batch, future):
+        try:
+            embeddings, answers = future.result()
+        except Exception as e:
+            print(f"ERROR: Failed to get embeddings for batch of {len(batch)} sections: {e}")
+            return
+        vectors = []
+        for section, embedding, answer in zip(batch, embeddings, answers):
+            metadata = dict(section.get('metadata') or {
+                'title': section['title'],
+                'category': section['category'],
+                'content': section['content']
+            })
+            metadata.update(answer)
+            vectors.append({"id": section['id'], "vector": embedding, "metadata": metadata, "data": section['content']})
+        try:
+            vector_client.upsert(vectors=vectors, namespace=namespace)
+            stored.extend(vector['id'] for vector in vectors)
+        except Exception as batch_error:
+            print(f"ERROR: Failed to process batch of {len(vectors)} vectors: {batch_error}")
+            return
+        if lexical_index is not None:
+            for vector in vectors:
+                lexical_index.add(vector['id'], vector['metadata'])
+        elapsed = time.perf_counter() - started
+        print(f"INFO: {len(stored)}/{attempted} vectors stored ({len(stored) / elapsed:.1f} vectors/s)")
+
+    in_flight = deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for batch in _batches(sections, batch_size):
+            attempted += len(batch)
+            in_flight.append((batch, pool.submit(_prepare_batch, batch, model, answer_fn)))
+            if len(in_flight) >= workers * 2:
+                upload(*in_flight.popleft())
+        while in_flight:
+            upload(*in_flight.popleft())
+
+    if attempted:
+        elapsed = time.perf_counter() - started
+        print(f"SUCCESS: Stored {len(stored)} of {attempted} vectors in {elapsed:.1f}s ({len(stored) / elapsed:.1f} vectors/s)")
+    return stored, attempted
+
+def server_ingested_sections(physical_namespace, skip=()):
+    """
+    Q&A pairs server.py ingested into a physical namespace, as sections carrying their
+    stored metadata. The vector store cannot list its contents, so they are read from the
+    namespace's lexical index, which server.py updates with every pair it upserts.
+    """
+    for doc_id, metadata in load_lexical_index(physical_namespace).documents.items():
+        if metadata.get('category') == SERVER_QA_CATEGORY and doc_id not in skip:
+            yield {
+                'id': doc_id,
+                'title': metadata.get('title', ''),
+                'category': metadata['category'],
+                'content': metadata.get('content', ''),
+                'metadata': metadata
+            }
+
+def rebuild_namespace(vector_client, sections, model, namespace, answer_fn=None):
+    """
+    Blue/green full rebuild: fill the idle physical namespace, then swap the alias so
+    the live agent switches over at once and never sees an empty or half-built index.
+    `sections` may be a generator; it is consumed once.
+
+    Q&A pairs server.py ingested into the live namespace are not chunks of salon_data.txt,
+    so they are re-embedded into the new one with their metadata. The old namespace stays
+    in place (queries still in flight on it keep working) until the next rebuild resets
+    and reuses it.
+    """
+    seen = {}
+    lexical_index = BM25Index()
+    live = resolve_namespace(namespace)
+    target = f"{namespace}__green" if live == f"{namespace}__blue" else f"{namespace}__blue"
+
+    print(f"INFO: Rebuilding into namespace '{target}' (serving '{live}')...")
+    try:
+        vector_client.reset(namespace=target)
+    except Exception as e:
+        print(f"WARNING: Failed to reset namespace (this is okay if namespace doesn't exist yet): {e}")
+
+    stored, attempted = upsert_sections(vector_client, iter_unique_sections(sections, seen), model, target,
+                                        answer_fn=answer_fn, lexical_index=lexical_index)
+    carried, carry_attempted = upsert_sections(vector_client, server_ingested_sections(live), model, target,
+                                               lexical_index=lexical_index)
+    if len(stored) != attempted or len(carried) != carry_attempted:
+        print(f"ERROR: Rebuild stored {len(stored) + len(carried)} of {attempted + carry_attempted} vectors - keeping '{live}' live")
+        return len(stored), attempted - len(stored)
+    if carried:
+        print(f"INFO: Carried {len(carried)} server-ingested Q&A pairs over from '{live}'")
+
+    # The lexical index must be in place before the agent follows the alias to it
+    save_lexical_index(target, lexical_index)
+    set_namespace_alias(namespace, target)
+    save_manifest(namespace, target, seen, canonical_answers=answer_fn is not None)
+    bump_namespace_version(namespace)
+    print(f"SUCCESS: Namespace '{namespace}' now served from '{target}'")
+
+    # Pairs server.py upserted into the old namespace while this rebuild ran; from now on it writes to the new one
+    late = BM25Index()
+    upsert_sections(vector_client, server_ingested_sections(live, skip=lexical_index.documents), model, target,
+                    lexical_index=late)
+    if len(late):
+        update_lexical_index(target, late.documents)
+        bump_namespace_version(namespace)
+        print(f"INFO: Carried {len(late)} Q&A pairs ingested during the rebuild over from '{live}'")
+    print(f"INFO: Keeping '{live}' until the next rebuild reuses it")
+    return len(stored), 0
+
+def sync_namespace(vector_client, sections, model, namespace, manifest, answer_fn=None):
+    """Incremental sync: embed/upsert only new or changed chunks and delete only stale ids"""
+    physical = manifest['physical_namespace']
+    chunks = dict(manifest['chunks'])
+    wanted = {}
+    # Lexical changes are collected and merged into the index file at the end (server.py writes to it too);
+    # changed chunks are only collected once their vectors are stored
+    indexed = set(load_lexical_index(physical).documents)
+    missing = {}
+    added = BM25Index()
+
+    changed = changed_sections(iter_unique_sections(sections, wanted), chunks, indexed, missing)
+    stored, attempted = upsert_sections(vector_client, changed, model, physical,
+                                        answer_fn=answer_fn, lexical_index=added)
+    for vector_id in stored:
+        chunks[vector_id] = wanted[vector_id]
+
+    stale = [vector_id for vector_id in chunks if vector_id not in wanted]
+    print(f"INFO: {attempted} new or changed chunks, {len(stale)} stale, {len(wanted) - attempted} unchanged")
+
+    deleted = []
+    if stale:
+        try:
+            vector_client.delete(ids=stale, namespace=physical)
+            for vector_id in stale:
+                chunks.pop(vector_id, None)
+            deleted = stale
+            print(f"SUCCESS: Deleted {len(stale)} stale vectors")
+        except Exception as e:
+            print(f"ERROR: Failed to delete stale vectors: {e}")
+
+    if missing or len(added) or deleted:
+        update_lexical_index(physical, {**missing, **added.documents}, remove=deleted)
+    save_manifest(namespace, physical, chunks, canonical_answers=answer_fn is not None)
+    if stored or stale:
+        # The namespace contents changed, drop cached answers in every agent worker
+        bump_namespace_version(namespace)
+    return len(stored), attempted - len(stored)
+
+def ingest_salon_data(full_rebuild=False, data_path='salon_data.txt', vector_client=None, model=None):
+    """
+    Sync salon data into the configured vector store (Upstash or local).
+
+    Runs incrementally against the manifest of the last run. A full rebuild (first run,
+    --full, a changed embedding model or an unknown live namespace) is built blue/green.
+    """
     load_dotenv()
+    vector_client = vector_client or get_vector_store()
     
     # Check environment variables
-    if not os.getenv("UPSTASH_VECTOR_REST_URL") or not os.getenv("UPSTASH_VECTOR_REST_TOKEN"):
+    if vector_client.name == "upstash" and (not os.getenv("UPSTASH_VECTOR_REST_URL") or not os.getenv("UPSTASH_VECTOR_REST_TOKEN")):
         print("ERROR: Missing Upstash environment variables")
         return
     
@@ -39,135 +369,52 @@ def ingest_salon_data():
         print("ERROR: Missing NAMESPACE environment variable")
         return
     
-    # Initialize embedding model
-    try:
-        print("INFO: Loading BAAI/bge-small-en-v1.5 model...")
-        model = SentenceTransformer('BAAI/bge-small-en-v1.5')
-        print("SUCCESS: Model loaded")
-    except Exception as e:
-        print(f"ERROR: Failed to load embedding model: {e}")
-        return
+    print(f"SUCCESS: Using {vector_client.name} vector store with namespace: {namespace}")
     
-    # Initialize Upstash Vector client
-    try:
-        vector_client = Index(
-            url=os.getenv("UPSTASH_VECTOR_REST_URL"),
-            token=os.getenv("UPSTASH_VECTOR_REST_TOKEN")
-        )
-        print(f"SUCCESS: Connected to Upstash Vector database with namespace: {namespace}")
-    except Exception as e:
-        print(f"ERROR: Failed to connect to vector database: {e}")
+    if not os.path.exists(data_path):
+        print(f"ERROR: Failed to read salon data file: {data_path} not found")
         return
-    
-    # Read salon data
+
+    manifest = load_manifest(namespace)
+    if not full_rebuild and (
+        manifest is None
+        or manifest.get('model') != EMBEDDING_MODEL
+        or manifest.get('canonical_answers', False) != CANONICAL_ANSWERS
+        or manifest.get('physical_namespace') != resolve_namespace(namespace)
+    ):
+        print("INFO: No usable manifest for the live namespace - doing a full rebuild")
+        full_rebuild = True
+
+    # Initialize embedding model
+    if model is None:
+        try:
+            print(f"INFO: Loading {EMBEDDING_MODEL} model...")
+            model = SentenceTransformer(EMBEDDING_MODEL)
+            print("SUCCESS: Model loaded")
+        except Exception as e:
+            print(f"ERROR: Failed to load embedding model: {e}")
+            return
+
+    answer_fn = chunk_answerer(namespace) if CANONICAL_ANSWERS else None
+
+    # Sections are read, chunked, embedded and uploaded as a stream
     try:
-        with open('salon_data.txt', 'r', encoding='utf-8') as file:
-            content = file.read()
-        print("SUCCESS: Loaded salon data file")
-    except Exception as e:
-        print(f"ERROR: Failed to read salon data file: {e}")
-        return
-    
-    # Split content into logical sections
-    sections = content.split('=== ')
-    processed_sections = []
-    
-    for section in sections:
-        if section.strip():
-            # Clean up section header
-            if section.startswith('LUXURY SPA'):
-                section_title = "General Information"
-                section_content = section
-            else:
-                lines = section.split('\n', 1)
-                section_title = lines[0].replace('===', '').strip()
-                section_content = lines[1] if len(lines) > 1 else ""
-            
-            # Further chunk large sections
-            if len(section_content) > 1000:
-                chunks = chunk_text(section_content, chunk_size=400, overlap=50)
-                for i, chunk in enumerate(chunks):
-                    processed_sections.append({
-                        'title': f"{section_title} - Part {i+1}",
-                        'content': chunk.strip(),
-                        'category': section_title
-                    })
+        with open(data_path, 'r', encoding='utf-8') as file:
+            sections = iter_sections(file)
+            if full_rebuild:
+                successful_inserts, failed_inserts = rebuild_namespace(vector_client, sections, model, namespace,
+                                                                       answer_fn=answer_fn)
             else:
-                processed_sections.append({
-                    'title': section_title,
-                    'content': section_content.strip(),
-                    'category': section_title
-                })
-    
-    print(f"INFO: Created {len(processed_sections)} sections for ingestion")
-    
-    # Reset/clear the namespace before inserting new data
-    try:
-        print(f"INFO: Resetting namespace '{namespace}'...")
-        vector_client.reset(namespace=namespace)
-        print("SUCCESS: Namespace reset completed")
+                successful_inserts, failed_inserts = sync_namespace(vector_client, sections, model, namespace, manifest,
+                                                                    answer_fn=answer_fn)
     except Exception as e:
-        print(f"WARNING: Failed to reset namespace (this is okay if namespace doesn't exist yet): {e}")
-    
-    # Prepare texts for embedding
-    texts_to_embed = [section['content'] for section in processed_sections]
-    
-    # Get embeddings using the model
-    try:
-        print("INFO: Generating embeddings...")
-        embeddings = get_embeddings(texts_to_embed, model)
-        print(f"SUCCESS: Generated {len(embeddings)} embeddings")
-    except Exception as e:
-        print(f"ERROR: Failed to get embeddings: {e}")
+        print(f"ERROR: Ingestion failed: {e}")
         return
-    
-    # Ingest data into vector database with batch processing
-    successful_inserts = 0
-    failed_inserts = 0
-    batch_size = 500
-    batch = []
-    
-    for i, section in enumerate(processed_sections):
-        try:
-            vector_id = create_vector_id(section['content'])
-            
-            # Create vector data in correct dictionary format for Upstash
-            vector_data = {
-                "id": vector_id,
-                "vector": embeddings[i],
-                "metadata": {
-                    'title': section['title'],
-                    'category': section['category'],
-                    'content': section['content']
-                },
-                "data": section['content']
-            }
-            
-            batch.append(vector_data)
-            
-            # Process batch when it reaches batch_size or is the last item
-            if len(batch) >= batch_size or i == len(processed_sections) - 1:
-                try:
-                    response = vector_client.upsert(
-                        vectors=batch,
-                        namespace=namespace
-                    )
-                    successful_inserts += len(batch)
-                    print(f"SUCCESS: Batch processed {len(batch)} vectors. Response: {response}")
-                    batch = []  # Clear batch
-                except Exception as batch_error:
-                    failed_inserts += len(batch)
-                    print(f"ERROR: Failed to process batch of {len(batch)} vectors: {batch_error}")
-                    batch = []  # Clear batch even on error
-            
-        except Exception as e:
-            failed_inserts += 1
-            print(f"ERROR: Failed to prepare vector for '{section['title']}': {e}")
-    
+
     print(f"\nINGESTION COMPLETE:")
     print(f"Successful inserts: {successful_inserts}")
     print(f"Failed inserts: {failed_inserts}")
     
 
 if __name__ == "__main__":
-    ingest_salon_data()
\ No newline at end of file
+    ingest_salon_data(full_rebuild="--full" in sys.argv[1:])
\ No newline at end of file
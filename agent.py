@@ -10,33 +10,50 @@ from livekit.plugins.turn_detector.english import EnglishModel
 from livekit.plugins import (groq, cartesia, deepgram, silero, google)
 import asyncio
 import os
-from upstash_vector import Index
 
-from tools import query_knowledge_base, text_supervisor
-from utils import get_huggingface_embedding, AGENT_INSTRUCTION, SESSION_INSTRUCTION, GREETING_MESSAGE, setup_logging
-import tools
-from dbDrivers.session_operations import SessionOperations
+from tools import query_knowledge_base, text_supervisor, CallState, bind_call, prefetch_retrieval, SUPERVISOR_FALLBACK_RESPONSE
+from utils import setup_logging, teardown_session_logging
+from clients import get_clients
+from query_cache import cache_gauges
+import latency_metrics
+from latency_metrics import span, bind_session, record_livekit_metrics
+from dbDrivers.session_writer import get_session_writer
+from tenants import get_tenant_registry
+from warmup import KeepWarm, load_shared_resources, loaded_namespaces, common_utterances
+from prefetch import RetrievalPrefetcher, prefetch_mode
+from tts_cache import TTSAudioCache, prepopulate_in_background
 
 
 
 
 load_dotenv()
 logger = logging.getLogger("groq-agent")
-Member = SessionOperations()
+latency_metrics.registry.add_gauge_source(cache_gauges)
+
+TTS_MODEL = "sonic-2"
+TTS_VOICE = "f786b574-daa5-4673-aa0c-cbe3e8534c02"
+TTS_SAMPLE_RATE = 24000
+
+
+def make_tts(http_session=None) -> cartesia.TTS:
+    """The agent's Cartesia voice; the TTS audio cache is keyed on the same model, voice and rate"""
+    return cartesia.TTS(model=TTS_MODEL, voice=TTS_VOICE, sample_rate=TTS_SAMPLE_RATE, http_session=http_session)
 
 
 class Assistant(Agent):
-    def __init__(self, instructions: str, room: rtc.Room) -> None:
+    def __init__(self, instructions: str, room: rtc.Room, vad=None, turn_detection=None) -> None:
         """
+        vad and turn_detection are the worker's shared models from prewarm(); they are
+        only loaded here if the process was started without the prewarm hook.
         """
         
         super().__init__(
             instructions=instructions,
             llm=groq.LLM(model="moonshotai/kimi-k2-instruct-0905"),
             stt=deepgram.STT(),
-            tts=cartesia.TTS(model="sonic-2", voice="f786b574-daa5-4673-aa0c-cbe3e8534c02"),
-            vad=silero.VAD.load(),
-            turn_detection=EnglishModel(),
+            tts=make_tts(),
+            vad=vad or silero.VAD.load(),
+            turn_detection=turn_detection or EnglishModel(),
             tools=[
                 query_knowledge_base,
                 text_supervisor
@@ -44,44 +61,42 @@ class Assistant(Agent):
 
         )
         self.session_id = str(uuid4())
-        setup_logging(self.session_id)
 
-    async def _pre_warm_services(self):
-        """Pre-warm HuggingFace and Upstash services to avoid cold starts"""
-        try:
-            logging.info("Pre-warming serverless functions...")
-
-            # Pre-warm HuggingFace embedding API
-            hf_api_key = os.getenv("HUGGINGFACE_API_KEY")
-            if hf_api_key:
-                test_embedding = get_huggingface_embedding("test query", hf_api_key)
-                logging.info("HuggingFace API pre-warmed successfully")
-            else:
-                logging.warning("HUGGINGFACE_API_KEY not found, skipping HF pre-warming")
-
-            # Pre-warm Upstash Vector DB
-            vector_client = Index(
-                url=os.getenv("UPSTASH_VECTOR_REST_URL"),
-                token=os.getenv("UPSTASH_VECTOR_REST_TOKEN")
-            )
-            # Make a simple test query with a dummy vector (384 dimensions for bge-small-en-v1.5)
-            dummy_vector = [0.1] * 384
-            test_results = vector_client.query(
-                vector=dummy_vector,
-                top_k=1,
-                namespace=os.getenv("NAMESPACE")
-            )
-            logging.info("Upstash Vector DB pre-warmed successfully")
 
+# Per-process keep-warm of the embedding backend and vector store for the tenants served here
+keep_warm = KeepWarm(loaded_namespaces)
+
+
+def prewarm(proc: agents.JobProcess):
+    """
+    Worker prewarm hook: runs once per job process before it accepts calls, so VAD,
+    the turn detector, the embedding model and service clients are loaded once and
+    shared by every job the process runs.
+    """
+    with span("prewarm"):
+        proc.userdata["vad"] = silero.VAD.load()
+        proc.userdata["turn_detection"] = EnglishModel()
+        try:
+            proc.userdata.update(load_shared_resources())
         except Exception as e:
-            logging.warning(f"Pre-warming failed (non-critical): {e}")
+            logging.warning(f"Pre-warming shared resources failed (non-critical): {e}")
 
+        # Fixed sentences (greetings, the supervisor hand-off, precomputed answers) are
+        # synthesized once into the shared on-disk cache, in the background
+        audio_cache = TTSAudioCache(voice=TTS_VOICE, model=TTS_MODEL, sample_rate=TTS_SAMPLE_RATE)
+        proc.userdata["tts_cache"] = audio_cache
+        if os.getenv("TTS_CACHE", "1") != "0":
+            prepopulate_in_background(audio_cache, make_tts,
+                                      lambda: common_utterances([SUPERVISOR_FALLBACK_RESPONSE]))
 
 
 async def entrypoint(ctx: agents.JobContext):
 
     await ctx.connect()
 
+    # Shared per-process client registry, reused across jobs in this worker
+    get_clients()
+
     # Caller's number
     phone_number = "+555-9183746"
 
@@ -93,12 +108,74 @@ async def entrypoint(ctx: agents.JobContext):
         return
     logger.info(f"Found {len(ctx.room.remote_participants)} remote participants")
 
+    # Telephony participants carry the caller's and the dialed number as SIP attributes
+    dialed_number = None
+    for participant in ctx.room.remote_participants.values():
+        attributes = participant.attributes or {}
+        phone_number = attributes.get("sip.phoneNumber", phone_number)
+        dialed_number = attributes.get("sip.trunkPhoneNumber", dialed_number)
+
+    # Which salon this call is for: job/room metadata or the dialed number. A tenant loaded on
+    # a miss opens (and may migrate) its SQLite database, so resolve it off the event loop
+    tenant = await asyncio.to_thread(get_tenant_registry().resolve, ctx.job.metadata or ctx.room.metadata, dialed_number)
+    logger.info(f"Serving tenant {tenant.tenant_id} (namespace {tenant.namespace})")
+
+    agent = Assistant(
+        # The session rules ride along with the persona since the greeting is no longer LLM-generated
+        instructions=tenant.agent_instruction + tenant.session_instruction,
+        room=ctx.room,
+        vad=ctx.proc.userdata.get("vad"),
+        turn_detection=ctx.proc.userdata.get("turn_detection")
+    )
+
+    # Per-call state lives on the session (and this task's context), never in module globals,
+    # so concurrent calls in one worker process cannot see each other's session
+    call = CallState(tenant=tenant, session_id=agent.session_id, phone_number=phone_number,
+                     audio_cache=ctx.proc.userdata.get("tts_cache") if os.getenv("TTS_CACHE", "1") != "0" else None)
+    session = AgentSession(userdata=call)
+    bind_call(call)
+
+    # Tag every latency span and log record of this call with its session_id; the call's
+    # log file only receives records from tasks bound to it
+    bind_session(agent.session_id)
+    setup_logging(agent.session_id)
+
+    async def _close_call_log():
+        teardown_session_logging(agent.session_id)
 
-    session = AgentSession()
-    agent = Assistant(instructions=AGENT_INSTRUCTION, room=ctx.room)
+    if os.getenv("METRICS_PORT"):
+        latency_metrics.start_metrics_server(int(os.getenv("METRICS_PORT")))
 
-    # Pre-warm serverless functions before starting session
-    await agent._pre_warm_services()
+    @session.on("metrics_collected")
+    def _on_metrics_collected(ev):
+        record_livekit_metrics(ev.metrics, agent.session_id)
+
+    async def _write_call_metrics():
+        latency_metrics.registry.write_session_summary(agent.session_id)
+        latency_metrics.registry.write_prometheus_textfile()
+
+    ctx.add_shutdown_callback(_write_call_metrics)
+    ctx.add_shutdown_callback(_close_call_log)
+
+    # Start knowledge-base retrieval from the caller's words while the agent LLM is still planning
+    mode = prefetch_mode()
+    if mode != "off":
+        call.prefetch = RetrievalPrefetcher(lambda text: prefetch_retrieval(tenant.namespace, text))
+
+        @session.on("user_input_transcribed")
+        def _on_user_input_transcribed(ev):
+            if ev.is_final or mode == "interim":
+                call.prefetch.on_transcript(ev.transcript, ev.is_final)
+
+        async def _close_prefetch():
+            logging.info(f"Speculative retrievals: {call.prefetch.started} started, "
+                         f"{call.prefetch.hits} used, {call.prefetch.misses} tool lookups missed")
+            call.prefetch.close()
+
+        ctx.add_shutdown_callback(_close_prefetch)
+
+    # Keep serverless backends warm in the background instead of awaiting a warm-up before pickup
+    keep_warm.ensure_running()
 
     room_input = RoomInputOptions(
             # - For telephony applications, use `BVCTelephony` for best results
@@ -110,32 +187,35 @@ async def entrypoint(ctx: agents.JobContext):
         audio_enabled=True,
         transcription_enabled=True
     )
-    
-    
-    # Store session_id in global variable for access in tools
-    tools.current_session_id = agent.session_id
-    tools.current_phone_number = phone_number
 
 
-    logging.info(f"Session ID stored globally: {agent.session_id}")
+    logging.info(f"Session ID stored on the call state: {agent.session_id}")
     
-    await session.start(
-        room=ctx.room,
-        agent=agent,
-        room_input_options=room_input,
-        room_output_options=room_output
-    )
+    with span("session_start"):
+        await session.start(
+            room=ctx.room,
+            agent=agent,
+            room_input_options=room_input,
+            room_output_options=room_output
+        )
     
-    MemberCreated = Member.add_member_session(phone_number, agent.session_id)
+    with span("db_write"):
+        MemberCreated = await get_session_writer(tenant.sessions).add_member_session(phone_number, agent.session_id)
     if not MemberCreated:
         logging.info(f"Failed to create session for: {agent.session_id}")
 
-    await session.generate_reply(
-        instructions=SESSION_INSTRUCTION,
-    )
+    # The greeting is the same on every call; play it from the TTS cache when it is there
+    greeting_audio = call.audio_cache.frames(tenant.greeting) if call.audio_cache is not None else None
+    if greeting_audio is not None:
+        await session.say(tenant.greeting, audio=greeting_audio)
+    else:
+        await session.say(tenant.greeting)
 
 
 if __name__ == "__main__":
     agents.cli.run_app(agents.WorkerOptions(
         entrypoint_fnc=entrypoint,
+        prewarm_fnc=prewarm,
+        # Loading a local embedding model can take longer than LiveKit's 10s default
+        initialize_process_timeout=float(os.getenv("PREWARM_TIMEOUT", "60")),
     ))
\ No newline at end of file
@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import os
+import threading
+from typing import Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from groq import Groq, AsyncGroq
+from upstash_vector import Index, AsyncIndex
+
+# Keep-alive pool sizing shared by every HTTP client in the registry
+HTTP_POOL_LIMITS = httpx.Limits(
+    max_connections=20,
+    max_keepalive_connections=10,
+    keepalive_expiry=120.0
+)
+HTTP_TIMEOUT = httpx.Timeout(30.0, connect=10.0)
+
+
+class ClientRegistry:
+    """
+    Process-wide registry of pooled service clients.
+
+    One registry is created per worker process and reused by the agent tools, the
+    pre-warm step and server.py, so connections (and their TLS sessions) stay open
+    between calls instead of being rebuilt on every spoken question.
+
+    Async clients are bound to the event loop that first uses them; if a different
+    loop asks for them (e.g. a new job loop or a test) they are rebuilt for that loop.
+    Their connection pools are closed on the loop that owns them: a task bound with the
+    clients closes them when the loop's runner cancels pending tasks at shutdown, and a
+    loop still running on another thread is asked to close them before the rebind.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._http: Optional[httpx.AsyncClient] = None
+        self._vector_index: Optional[AsyncIndex] = None
+        self._groq: Optional[AsyncGroq] = None
+        self._closer: Optional[asyncio.Task] = None
+        self._http_session: Optional[requests.Session] = None
+        self._vector_index_sync: Optional[Index] = None
+        self._groq_sync: Optional[Groq] = None
+
+    # ---- async clients (agent event loop) ----
+
+    def _ensure_loop(self):
+        """Retire async clients created on another event loop and bind to the running one"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            old_loop, closer = self._loop, self._closer
+            clients = self._detach()
+            if any(client is not None for client in clients):
+                if old_loop is not None and old_loop.is_running() and not old_loop.is_closed():
+                    asyncio.run_coroutine_threadsafe(_close_async_clients(*clients), old_loop)
+                else:
+                    # Only reachable if the old loop was stopped or closed without cancelling its tasks
+                    logging.warning("Async service clients of a stopped event loop could not be closed")
+            if closer is not None and old_loop is not None and not old_loop.is_closed():
+                old_loop.call_soon_threadsafe(closer.cancel)
+            self._loop = loop
+            # asyncio.run, pytest-asyncio and LiveKit's job process cancel pending tasks before closing the loop
+            self._closer = loop.create_task(self._close_on_shutdown(loop), name="client-registry-close")
+
+    async def _close_on_shutdown(self, loop: asyncio.AbstractEventLoop):
+        try:
+            await loop.create_future()
+        finally:
+            if self._loop is loop:
+                await _close_async_clients(*self._detach())
+                logging.info("Async service clients closed at event loop shutdown")
+
+    def _detach(self) -> tuple:
+        """Unbind the async clients and return them as (http, vector_index, groq)"""
+        clients = (self._http, self._vector_index, self._groq)
+        self._http = None
+        self._vector_index = None
+        self._groq = None
+        self._loop = None
+        self._closer = None
+        return clients
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """Shared keep-alive HTTP client, used for the HuggingFace Inference API"""
+        self._ensure_loop()
+        if self._http is None:
+            self._http = httpx.AsyncClient(limits=HTTP_POOL_LIMITS, timeout=HTTP_TIMEOUT)
+        return self._http
+
+    @property
+    def vector_index(self) -> AsyncIndex:
+        """Shared async Upstash Vector client"""
+        self._ensure_loop()
+        if self._vector_index is None:
+            self._vector_index = AsyncIndex(
+                url=os.getenv("UPSTASH_VECTOR_REST_URL"),
+                token=os.getenv("UPSTASH_VECTOR_REST_TOKEN")
+            )
+        return self._vector_index
+
+    @property
+    def groq(self) -> AsyncGroq:
+        """Shared async Groq client"""
+        self._ensure_loop()
+        if self._groq is None:
+            self._groq = AsyncGroq(
+                api_key=os.getenv("GROQ_API_KEY"),
+                http_client=httpx.AsyncClient(limits=HTTP_POOL_LIMITS, timeout=HTTP_TIMEOUT)
+            )
+        return self._groq
+
+    # ---- sync clients (Flask server, scripts) ----
+
+    @property
+    def http_session(self) -> requests.Session:
+        """Shared keep-alive requests session"""
+        with self._lock:
+            if self._http_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_LIMITS.max_keepalive_connections)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._http_session = session
+            return self._http_session
+
+    @property
+    def vector_index_sync(self) -> Index:
+        """Shared sync Upstash Vector client"""
+        with self._lock:
+            if self._vector_index_sync is None:
+                self._vector_index_sync = Index(
+                    url=os.getenv("UPSTASH_VECTOR_REST_URL"),
+                    token=os.getenv("UPSTASH_VECTOR_REST_TOKEN")
+                )
+            return self._vector_index_sync
+
+    @property
+    def groq_sync(self) -> Groq:
+        """Shared sync Groq client"""
+        with self._lock:
+            if self._groq_sync is None:
+                self._groq_sync = Groq(
+                    api_key=os.getenv("GROQ_API_KEY"),
+                    http_client=httpx.Client(limits=HTTP_POOL_LIMITS, timeout=HTTP_TIMEOUT)
+                )
+            return self._groq_sync
+
+    async def aclose(self):
+        """Close the async clients bound to the current loop"""
+        closer = self._closer
+        await _close_async_clients(*self._detach())
+        if closer is not None and closer is not asyncio.current_task():
+            closer.cancel()
+        logging.info("Async service clients closed")
+
+
+async def _close_async_clients(http: Optional[httpx.AsyncClient], vector_index: Optional[AsyncIndex],
+                               groq: Optional[AsyncGroq]):
+    if http is not None:
+        await http.aclose()
+    if groq is not None:
+        await groq.close()
+    # AsyncIndex has no close(); its pool is the httpx client it creates
+    index_http = getattr(vector_index, "_client", None)
+    if index_http is not None:
+        await index_http.aclose()
+
+
+_registry: Optional[ClientRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_clients() -> ClientRegistry:
+    """Return the process-wide client registry, creating it on first use"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ClientRegistry()
+                logging.info("Service client registry created")
+    return _registry
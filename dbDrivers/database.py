@@ -1,5 +1,6 @@
 import sqlite3
 import logging
+import queue
 from utils import setup_logging
 from typing import Optional
 from contextlib import contextmanager
@@ -8,17 +9,59 @@ from datetime import datetime
 
 
 class DatabaseDriver:
-    def __init__(self, db_path: str = "members.db"):
+    """
+    SQLite driver shared by the agent, the Flask dashboard and the scheduler.
+
+    Connections are persistent and pooled rather than opened per operation. Each one
+    runs in WAL mode with synchronous=NORMAL, so readers (dashboard, scheduler) and the
+    writer (live calls) no longer block each other, and waits on the write lock are
+    bounded by busy_timeout instead of failing immediately. Every connection keeps a
+    statement cache, so repeated queries reuse their prepared statements.
+    """
+
+    def __init__(self, db_path: str = "members.db", pool_size: int = 8, busy_timeout_ms: int = 5000):
         self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self._pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=pool_size)
         self._init_db()
 
+    def _connect(self) -> sqlite3.Connection:
+        """Open a tuned connection"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,
+            cached_statements=256
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+        return conn
+
     @contextmanager
     def _get_connection(self):
-        conn = sqlite3.connect(self.db_path)
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
         try:
             yield conn
         finally:
-            conn.close()
+            if conn.in_transaction:
+                # Never hand out a connection with an uncommitted transaction
+                conn.rollback()
+            try:
+                self._pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def close(self):
+        """Close every pooled connection"""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
 
     def _init_db(self):
         with self._get_connection() as conn:
@@ -41,7 +84,68 @@ class DatabaseDriver:
             cursor.execute("""
                 CREATE INDEX IF NOT EXISTS idx_member_sessions_status ON member_sessions(status)
             """)
+            # Create index for expiring overdue sessions of a status with one range scan
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_member_sessions_status_created_at ON member_sessions(status, created_at)
+            """)
+            # Create index for per-caller lookups
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_member_sessions_phone_number ON member_sessions(phone_number)
+            """)
+            # Create unique index for session_id point lookups and updates
+            try:
+                cursor.execute("""
+                    CREATE UNIQUE INDEX IF NOT EXISTS idx_member_sessions_session_id ON member_sessions(session_id)
+                """)
+            except sqlite3.IntegrityError:
+                # Older databases may already hold duplicate session_ids; index them without the constraint
+                logging.warning("Duplicate session_id rows found, creating non-unique session_id index")
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_member_sessions_session_id_nonunique ON member_sessions(session_id)
+                """)
+
+            self._init_change_tracking(cursor)
             
             conn.commit()
             logging.info("Database initialized successfully")
 
+    @staticmethod
+    def _init_change_tracking(cursor):
+        """
+        Give every row a monotonically increasing `version` (and `updated_at`), bumped by
+        triggers on insert and on any change to its data. Writes from every process and
+        code path are covered, so clients can ask for "rows changed since version N".
+        """
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(member_sessions)")}
+        for column, ddl in (("version", "INTEGER"), ("updated_at", "TIMESTAMP")):
+            if column not in columns:
+                try:
+                    cursor.execute(f"ALTER TABLE member_sessions ADD COLUMN {column} {ddl}")
+                except sqlite3.OperationalError as e:
+                    # Another process added it first
+                    if "duplicate column" not in str(e):
+                        raise
+        cursor.execute("UPDATE member_sessions SET version = id, updated_at = created_at WHERE version IS NULL")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_member_sessions_version ON member_sessions(version)
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_member_sessions_version_insert
+            AFTER INSERT ON member_sessions
+            BEGIN
+                UPDATE member_sessions
+                SET version = (SELECT COALESCE(MAX(version), 0) + 1 FROM member_sessions),
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = NEW.id;
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_member_sessions_version_update
+            AFTER UPDATE OF phone_number, session_id, question, status, answer ON member_sessions
+            BEGIN
+                UPDATE member_sessions
+                SET version = (SELECT COALESCE(MAX(version), 0) + 1 FROM member_sessions),
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = NEW.id;
+            END
+        """)
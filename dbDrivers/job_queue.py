@@ -0,0 +1,301 @@
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+
+from .database import DatabaseDriver
+
+JOB_COLUMNS = "id, kind, payload, status, attempts, max_attempts, last_error, created_at, run_at, finished_at, owner, lease_expires_at"
+
+
+class JobQueue(DatabaseDriver):
+    """
+    Durable background job queue stored in SQLite (a `jobs` table next to member_sessions).
+
+    Jobs are JSON payloads dispatched by `kind` to registered handlers on a pool of
+    worker threads. A handler that raises is retried with exponential backoff until
+    max_attempts, then marked FAILED with its last error. Status moves
+    QUEUED -> RUNNING -> DONE / FAILED.
+
+    A claimed job is leased to its queue (`owner`) until `lease_expires_at`, and the
+    lease is renewed while the handler runs. Only jobs whose lease has expired, i.e.
+    whose owner crashed or hung, are re-queued, so several server processes can share
+    one database without re-running each other's jobs. A worker that lost its lease
+    does not overwrite the outcome recorded by the new owner.
+
+    Kinds registered with register_batch() are run together: a new job waits up to
+    `linger` seconds (less once `batch_size` are queued), and the worker that claims it
+    also claims its queued siblings, so the handler gets one list of payloads.
+    """
+
+    def __init__(self, db_path: str = "members.db", workers: int = 2, max_attempts: int = 5,
+                 retry_backoff: float = 2.0, poll_interval: float = 1.0, lease_seconds: float = 60.0):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._handlers: dict[str, Callable[[dict], None]] = {}
+        self._batch_handlers: dict[str, tuple[Callable[[list[dict]], None], int, float]] = {}
+        self._wake = threading.Condition()
+        self._stopped = False
+        self._notified = False
+        self._threads: list[threading.Thread] = []
+        super().__init__(db_path)
+
+    def _init_db(self):
+        with self._get_connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'QUEUED',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    last_error TEXT,
+                    created_at REAL NOT NULL,
+                    run_at REAL NOT NULL,
+                    finished_at REAL,
+                    owner TEXT,
+                    lease_expires_at REAL
+                )
+            """)
+            # Databases created before leases existed
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, ddl in (("owner", "TEXT"), ("lease_expires_at", "REAL")):
+                if column not in columns:
+                    try:
+                        conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {ddl}")
+                    except sqlite3.OperationalError as e:
+                        # Another process added it first
+                        if "duplicate column" not in str(e):
+                            raise
+            # Create index for claiming the next runnable job
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_jobs_status_run_at ON jobs(status, run_at)
+            """)
+            conn.commit()
+
+    def register(self, kind: str, handler: Callable[[dict], None]):
+        """Register the function that runs jobs of this kind; it receives the payload dict"""
+        self._handlers[kind] = handler
+
+    def register_batch(self, kind: str, handler: Callable[[list[dict]], None], batch_size: int = 32, linger: float = 0.5):
+        """Register a function that runs up to batch_size jobs of this kind at once; it receives a list of payloads"""
+        self._batch_handlers[kind] = (handler, batch_size, linger)
+
+    def enqueue(self, kind: str, payload: dict, delay: float = 0.0, max_attempts: Optional[int] = None) -> int:
+        """Persist a job and wake a worker. Returns the job id."""
+        now = time.time()
+        with self._get_connection() as conn:
+            if kind in self._batch_handlers and not delay:
+                _, batch_size, linger = self._batch_handlers[kind]
+                queued = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'QUEUED' AND kind = ? AND attempts = 0", (kind,)
+                ).fetchone()[0]
+                # Linger so siblings can join the batch, unless this job fills it
+                delay = 0.0 if queued + 1 >= batch_size else linger
+            job_id = conn.execute(
+                "INSERT INTO jobs (kind, payload, max_attempts, created_at, run_at) VALUES (?, ?, ?, ?, ?)",
+                (kind, json.dumps(payload), max_attempts or self.max_attempts, now, now + delay)
+            ).lastrowid
+            conn.commit()
+        with self._wake:
+            self._notified = True
+            self._wake.notify()
+        return job_id
+
+    def get_job(self, job_id: int) -> Optional[dict]:
+        with self._get_connection() as conn:
+            row = conn.execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            return self._row_to_dict(row) if row else None
+
+    def status_counts(self) -> dict:
+        """Number of jobs per status"""
+        with self._get_connection() as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def start(self):
+        """Start the worker threads"""
+        self._stopped = False
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        with self._wake:
+            self._stopped = True
+            self._wake.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def recover_expired(self) -> int:
+        """Re-queue RUNNING jobs whose lease ran out (their owner crashed or hung)"""
+        with self._get_connection() as conn:
+            recovered = conn.execute("""
+                UPDATE jobs SET status = 'QUEUED', owner = NULL, lease_expires_at = NULL
+                WHERE status = 'RUNNING' AND (lease_expires_at IS NULL OR lease_expires_at < ?)
+            """, (time.time(),)).rowcount
+            conn.commit()
+        if recovered:
+            logging.warning(f"Re-queued {recovered} jobs whose worker lease expired")
+        return recovered
+
+    def _claim(self) -> Optional[dict]:
+        """Atomically move the next runnable job to RUNNING, leased to this queue"""
+        now = time.time()
+        with self._get_connection() as conn:
+            row = conn.execute(f"""
+                UPDATE jobs SET status = 'RUNNING', attempts = attempts + 1, owner = ?, lease_expires_at = ?
+                WHERE id = (
+                    SELECT id FROM jobs WHERE status = 'QUEUED' AND run_at <= ?
+                    ORDER BY run_at, id LIMIT 1
+                )
+                RETURNING {JOB_COLUMNS}
+            """, (self.owner, now + self.lease_seconds, now)).fetchone()
+            conn.commit()
+            return self._row_to_dict(row) if row else None
+
+    def _claim_siblings(self, kind: str, limit: int) -> list[dict]:
+        """Claim more queued jobs of a batch kind; new ones may still be lingering, retries must be due"""
+        if limit <= 0:
+            return []
+        now = time.time()
+        with self._get_connection() as conn:
+            rows = conn.execute(f"""
+                UPDATE jobs SET status = 'RUNNING', attempts = attempts + 1, owner = ?, lease_expires_at = ?
+                WHERE id IN (
+                    SELECT id FROM jobs
+                    WHERE status = 'QUEUED' AND kind = ? AND (attempts = 0 OR run_at <= ?)
+                    ORDER BY id LIMIT ?
+                )
+                RETURNING {JOB_COLUMNS}
+            """, (self.owner, now + self.lease_seconds, kind, now, limit)).fetchall()
+            conn.commit()
+            return [self._row_to_dict(row) for row in rows]
+
+    def run_pending(self) -> int:
+        """Run runnable jobs on the calling thread until none are left; returns how many ran"""
+        ran = 0
+        self.recover_expired()
+        while (job := self._claim()) is not None:
+            batch = [job]
+            if job['kind'] in self._batch_handlers:
+                _, batch_size, _ = self._batch_handlers[job['kind']]
+                batch.extend(self._claim_siblings(job['kind'], batch_size - 1))
+            self._run(batch)
+            ran += len(batch)
+        return ran
+
+    def _renew_leases(self, batch: list[dict], done: threading.Event):
+        """Extend the batch's leases every third of a lease until the handler returns"""
+        while not done.wait(self.lease_seconds / 3):
+            try:
+                with self._get_connection() as conn:
+                    conn.executemany(
+                        "UPDATE jobs SET lease_expires_at = ? WHERE id = ? AND owner = ? AND status = 'RUNNING'",
+                        [(time.time() + self.lease_seconds, job['id'], self.owner) for job in batch]
+                    )
+                    conn.commit()
+            except Exception as e:
+                logging.error(f"Failed to renew job leases: {e}")
+
+    def _run(self, batch: list[dict]):
+        kind = batch[0]['kind']
+        done = threading.Event()
+        threading.Thread(target=self._renew_leases, args=(batch, done), name="job-lease", daemon=True).start()
+        try:
+            if kind in self._batch_handlers:
+                self._batch_handlers[kind][0]([job['payload'] for job in batch])
+            elif kind in self._handlers:
+                self._handlers[kind](batch[0]['payload'])
+            else:
+                raise LookupError(f"No handler registered for job kind '{kind}'")
+        except Exception as e:
+            for job in batch:
+                self._fail(job, e)
+            return
+        finally:
+            done.set()
+        with self._get_connection() as conn:
+            for job in batch:
+                finished = conn.execute(
+                    "UPDATE jobs SET status = 'DONE', last_error = NULL, finished_at = ?, lease_expires_at = NULL "
+                    "WHERE id = ? AND owner = ? AND status = 'RUNNING'",
+                    (time.time(), job['id'], self.owner)
+                ).rowcount
+                if not finished:
+                    logging.warning(f"Job {job['id']} ({kind}) finished after its lease was taken over")
+            conn.commit()
+
+    def _fail(self, job: dict, error: Exception):
+        now = time.time()
+        with self._get_connection() as conn:
+            if job['attempts'] < job['max_attempts']:
+                delay = self.retry_backoff * 2 ** (job['attempts'] - 1)
+                updated = conn.execute(
+                    "UPDATE jobs SET status = 'QUEUED', last_error = ?, run_at = ?, owner = NULL, lease_expires_at = NULL "
+                    "WHERE id = ? AND owner = ? AND status = 'RUNNING'",
+                    (str(error), now + delay, job['id'], self.owner)
+                ).rowcount
+                if updated:
+                    logging.warning(f"Job {job['id']} ({job['kind']}) attempt {job['attempts']} failed, retrying in {delay:.1f}s: {error}")
+            else:
+                updated = conn.execute(
+                    "UPDATE jobs SET status = 'FAILED', last_error = ?, finished_at = ?, lease_expires_at = NULL "
+                    "WHERE id = ? AND owner = ? AND status = 'RUNNING'",
+                    (str(error), now, job['id'], self.owner)
+                ).rowcount
+                if updated:
+                    logging.error(f"Job {job['id']} ({job['kind']}) failed after {job['attempts']} attempts: {error}")
+            conn.commit()
+        if not updated:
+            logging.warning(f"Job {job['id']} ({job['kind']}) failed after its lease was taken over: {error}")
+
+    def _next_run_in(self) -> float:
+        """Seconds until the earliest queued job is due, capped at poll_interval"""
+        with self._get_connection() as conn:
+            row = conn.execute("SELECT MIN(run_at) FROM jobs WHERE status = 'QUEUED'").fetchone()
+        if row[0] is None:
+            return self.poll_interval
+        return max(0.0, min(self.poll_interval, row[0] - time.time()))
+
+    def _work(self):
+        while not self._stopped:
+            try:
+                self.run_pending()
+                wait = self._next_run_in()
+            except Exception as e:
+                logging.error(f"Job worker error: {e}")
+                wait = self.poll_interval
+            with self._wake:
+                # Don't sleep through a job enqueued while this worker was busy
+                if not self._stopped and not self._notified:
+                    self._wake.wait(wait)
+                self._notified = False
+
+    @staticmethod
+    def _row_to_dict(row) -> dict:
+        return {
+            'id': row[0],
+            'kind': row[1],
+            'payload': json.loads(row[2]),
+            'status': row[3],
+            'attempts': row[4],
+            'max_attempts': row[5],
+            'last_error': row[6],
+            'created_at': row[7],
+            'run_at': row[8],
+            'finished_at': row[9],
+            'owner': row[10],
+            'lease_expires_at': row[11]
+        }
@@ -0,0 +1,123 @@
+import logging
+import queue
+import threading
+from typing import Optional
+
+from .session_operations import SessionOperations
+
+
+class SessionEventBroadcaster:
+    """
+    Fan-out of member_sessions changes to any number of subscribers (e.g. SSE streams).
+
+    Writes come from other processes (the agent workers) as well as this one, so one
+    watcher thread follows the change feed: it checks MAX(version) (an index lookup)
+    every poll_interval, reads only the changed rows once and pushes them to every
+    subscriber queue. Cost is one cheap query per interval however many dashboards
+    are connected; notify() wakes the watcher immediately after a local write.
+    """
+
+    def __init__(self, sessions: SessionOperations, poll_interval: float = 0.5, max_queue: int = 1000):
+        self.sessions = sessions
+        self.poll_interval = poll_interval
+        self.max_queue = max_queue
+        self.version: Optional[int] = None
+        self._subscribers: set = set()
+        self._listeners: list = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the watcher thread (idempotent)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self.version = self.sessions.get_latest_version()
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="session-events", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def notify(self):
+        """Check for changes now instead of waiting for the next poll"""
+        self._wake.set()
+
+    def subscribe(self) -> "queue.Queue":
+        """Register a subscriber; it receives session dicts, or None if it fell behind and must resync"""
+        self.start()
+        subscription: "queue.Queue" = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def add_listener(self, callback):
+        """Call `callback(session)` on the watcher thread for every changed row"""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def unsubscribe(self, subscription: "queue.Queue"):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def _publish(self, session: dict):
+        with self._lock:
+            subscribers = list(self._subscribers)
+            listeners = list(self._listeners)
+        for callback in listeners:
+            try:
+                callback(session)
+            except Exception as e:
+                logging.error(f"Session event listener failed: {e}")
+        for subscription in subscribers:
+            try:
+                subscription.put_nowait(session)
+            except queue.Full:
+                # A stalled client: drop it and tell it to reload instead of buffering forever
+                self.unsubscribe(subscription)
+                try:
+                    subscription.get_nowait()
+                    subscription.put_nowait(None)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def poll_once(self) -> int:
+        """Publish every change since the last poll; returns the number of rows published"""
+        latest = self.sessions.get_latest_version()
+        if latest <= self.version:
+            return 0
+        with self._lock:
+            listening = bool(self._subscribers or self._listeners)
+        if not listening:
+            # Nobody is listening; skip the row fetch and just move the cursor
+            self.version = latest
+            return 0
+        published, has_more = 0, True
+        while has_more:
+            changed, self.version, has_more = self.sessions.get_member_sessions_changed_since(self.version)
+            for session in changed:
+                self._publish(session)
+            published += len(changed)
+        return published
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            if self._stopped.is_set():
+                return
+            try:
+                self.poll_once()
+            except Exception as e:
+                logging.error(f"Session event poll failed: {e}")
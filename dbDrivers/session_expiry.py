@@ -0,0 +1,116 @@
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime, timezone, timedelta
+from typing import Callable, Optional
+
+from .session_operations import SessionOperations
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _created_at_epoch(created_at: str) -> float:
+    """Parse SQLite's CURRENT_TIMESTAMP text (UTC) into epoch seconds"""
+    return datetime.fromisoformat(created_at).replace(tzinfo=timezone.utc).timestamp()
+
+
+def expiry_cutoff(timeout_seconds: float, now: Optional[float] = None) -> str:
+    """created_at value below which a PENDING session is overdue"""
+    now = time.time() if now is None else now
+    cutoff = datetime.fromtimestamp(now, tz=timezone.utc) - timedelta(seconds=timeout_seconds)
+    return cutoff.strftime(TIMESTAMP_FORMAT)
+
+
+class SessionExpiryScheduler:
+    """
+    Expires each PENDING session at its own deadline (created_at + timeout).
+
+    Deadlines sit in a min-heap; one thread sleeps until the earliest is due and then
+    expires everything due with a single UPDATE guarded by status = 'PENDING', so
+    sessions resolved in the meantime are left alone and need no heap removal. The heap
+    is seeded from the database on start() and fed by on_session_change, which the
+    server hooks up to the session change feed so PENDING writes from agent workers
+    are scheduled as they happen.
+    """
+
+    def __init__(self, sessions: SessionOperations, timeout_seconds: float,
+                 on_expired: Optional[Callable[[int], None]] = None):
+        self.sessions = sessions
+        self.timeout_seconds = timeout_seconds
+        self.on_expired = on_expired
+        self._heap: list = []
+        self._scheduled: set = set()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Seed the heap from the database and start the expiry thread"""
+        for session_id, created_at in self.sessions.get_pending_deadlines():
+            self.schedule(session_id, created_at)
+        self._thread = threading.Thread(target=self._run, name="session-expiry", daemon=True)
+        self._thread.start()
+        logging.info(f"Session expiry scheduler started with {len(self._heap)} pending sessions")
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def schedule(self, session_id: str, created_at: Optional[str]):
+        """Schedule a PENDING session's expiry; repeated calls for the same session are ignored"""
+        if not session_id or not created_at:
+            return
+        try:
+            # created_at has one-second resolution, so wait out the whole second to be past the timeout
+            deadline = _created_at_epoch(created_at) + self.timeout_seconds + 1
+        except (ValueError, TypeError) as e:
+            logging.warning(f"Cannot schedule expiry for session {session_id}: {e}")
+            return
+        with self._cond:
+            if session_id in self._scheduled:
+                return
+            self._scheduled.add(session_id)
+            heapq.heappush(self._heap, (deadline, session_id))
+            if self._heap[0][1] == session_id:
+                self._cond.notify()
+
+    def on_session_change(self, session: dict):
+        """Change-feed listener: schedule sessions that are (still) PENDING"""
+        if session.get('status') == "PENDING":
+            self.schedule(session.get('session_id'), session.get('created_at'))
+
+    @property
+    def pending_count(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+    def _next_due(self) -> Optional[list]:
+        """Block until at least one deadline has passed; returns the due session_ids, or None on stop"""
+        with self._cond:
+            while not self._stopped:
+                now = time.time()
+                if self._heap and self._heap[0][0] <= now:
+                    due = []
+                    while self._heap and self._heap[0][0] <= now:
+                        _, session_id = heapq.heappop(self._heap)
+                        self._scheduled.discard(session_id)
+                        due.append(session_id)
+                    return due
+                self._cond.wait(self._heap[0][0] - now if self._heap else None)
+            return None
+
+    def _run(self):
+        while True:
+            due = self._next_due()
+            if due is None:
+                return
+            try:
+                expired = self.sessions.expire_pending_sessions(expiry_cutoff(self.timeout_seconds), session_ids=due)
+                if expired and self.on_expired is not None:
+                    self.on_expired(expired)
+            except Exception as e:
+                logging.error(f"Session expiry failed for {len(due)} sessions: {e}")
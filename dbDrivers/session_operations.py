@@ -4,6 +4,8 @@ from datetime import datetime
 from .database import DatabaseDriver
 from dataclasses import dataclass
 
+SESSION_COLUMNS = "id, phone_number, session_id, created_at, question, status, answer, version, updated_at"
+
 
 @dataclass
 class MemberSession:
@@ -23,14 +25,20 @@ class SessionOperations(DatabaseDriver):
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute("INSERT INTO member_sessions (phone_number, session_id) VALUES (?, ?)", (phone_number, session_id))
+                self._insert_member_session(cursor, phone_number, session_id)
                 conn.commit()
-                logging.info(f"Added session entry for phone number {phone_number} with session_id {session_id}")
                 return True
         except Exception as e:
             logging.error(f"Error adding session entry for phone number {phone_number}: {e}")
             return False
 
+    @staticmethod
+    def _insert_member_session(cursor, phone_number: str, session_id: str) -> bool:
+        """Run the INSERT for add_member_session on an open cursor, without committing"""
+        cursor.execute("INSERT INTO member_sessions (phone_number, session_id) VALUES (?, ?)", (phone_number, session_id))
+        logging.info(f"Added session entry for phone number {phone_number} with session_id {session_id}")
+        return True
+
     def get_member_sessions(self, phone_number: str) -> list[MemberSession]:
         """Get all sessions for a phone number"""
         with self._get_connection() as conn:
@@ -64,86 +72,234 @@ class SessionOperations(DatabaseDriver):
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                
-                # Build dynamic query based on what fields are provided
-                update_fields = ["status = ?"]
-                params = [status]
-                
-                if question is not None:
-                    # Get current question to append to it
-                    cursor.execute("SELECT question FROM member_sessions WHERE session_id = ?", (session_id,))
-                    current_row = cursor.fetchone()
-                    current_question = current_row[0] if current_row and current_row[0] else ""
-
-                    # Append new question to existing question
-                    if current_question:
-                        combined_question = current_question + "," + question
-                    else:
-                        combined_question = question
-
-                    update_fields.append("question = ?")
-                    params.append(combined_question)
-                    
-                if answer is not None:
-                    update_fields.append("answer = ?")
-                    params.append(answer)
-                
-                params.append(session_id)  # Add session_id for WHERE clause
-                
-                query = f"UPDATE member_sessions SET {', '.join(update_fields)} WHERE session_id = ?"
-                cursor.execute(query, params)
+                updated = self._apply_member_session_update(cursor, session_id, status, question, answer)
                 conn.commit()
-                
-                if cursor.rowcount > 0:
-                    updated_fields = f"status: {status}"
-                    if question is not None:
-                        updated_fields += f", question: '{combined_question}'"
-                    if answer is not None:
-                        updated_fields += f", answer: '{answer}'"
-                    logging.info(f"Updated session {session_id} with {updated_fields}")
-                    return True
-                else:
-                    logging.warning(f"No session found with session_id: {session_id}")
-                    return False
+                return updated
                     
         except Exception as e:
             logging.error(f"Error updating session {session_id}: {e}")
             return False
 
+    @staticmethod
+    def _apply_member_session_update(cursor, session_id: str, status: str, question: Optional[str] = None, answer: Optional[str] = None) -> bool:
+        """Run the SELECT/UPDATE for update_member_session on an open cursor, without committing"""
+        # Build dynamic query based on what fields are provided
+        update_fields = ["status = ?"]
+        params = [status]
+        
+        if question is not None:
+            # Get current question to append to it
+            cursor.execute("SELECT question FROM member_sessions WHERE session_id = ?", (session_id,))
+            current_row = cursor.fetchone()
+            current_question = current_row[0] if current_row and current_row[0] else ""
+
+            # Append new question to existing question
+            if current_question:
+                combined_question = current_question + "," + question
+            else:
+                combined_question = question
+
+            update_fields.append("question = ?")
+            params.append(combined_question)
+            
+        if answer is not None:
+            update_fields.append("answer = ?")
+            params.append(answer)
+        
+        params.append(session_id)  # Add session_id for WHERE clause
+        
+        query = f"UPDATE member_sessions SET {', '.join(update_fields)} WHERE session_id = ?"
+        cursor.execute(query, params)
+        
+        if cursor.rowcount > 0:
+            updated_fields = f"status: {status}"
+            if question is not None:
+                updated_fields += f", question: '{combined_question}'"
+            if answer is not None:
+                updated_fields += f", answer: '{answer}'"
+            logging.info(f"Updated session {session_id} with {updated_fields}")
+            return True
+        else:
+            logging.warning(f"No session found with session_id: {session_id}")
+            return False
+
     def get_all_member_sessions(self, status: Optional[str] = None) -> list[dict]:
         """Get all member sessions from the database, optionally filtered by status"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
 
             if status is not None:
-                cursor.execute("""
-                    SELECT id, phone_number, session_id, created_at, question, status, answer
+                cursor.execute(f"""
+                    SELECT {SESSION_COLUMNS}
                     FROM member_sessions
                     WHERE status = ?
                     ORDER BY created_at DESC
                 """, (status,))
             else:
-                cursor.execute("""
-                    SELECT id, phone_number, session_id, created_at, question, status, answer
+                cursor.execute(f"""
+                    SELECT {SESSION_COLUMNS}
                     FROM member_sessions
                     WHERE status IS NOT NULL AND status != ''
                     ORDER BY created_at DESC
                 """)
             rows = cursor.fetchall()
 
-            sessions = []
-            for row in rows:
-                sessions.append({
-                    'id': row[0],
-                    'phone_number': row[1],
-                    'session_id': row[2],
-                    'created_at': row[3],
-                    'question': row[4],
-                    'status': row[5],
-                    'answer': row[6]
-                })
-
-            return sessions
+            return [self._row_to_dict(row) for row in rows]
+
+    def get_session_by_id(self, session_id: str) -> Optional[dict]:
+        """Get a single member session by session_id (indexed point lookup). Returns None if not found."""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT {SESSION_COLUMNS}
+                FROM member_sessions
+                WHERE session_id = ?
+                LIMIT 1
+            """, (session_id,))
+            row = cursor.fetchone()
+            return self._row_to_dict(row) if row else None
+
+    @staticmethod
+    def _session_filters(status: Optional[str], phone_number: Optional[str],
+                         created_from: Optional[str], created_to: Optional[str]) -> tuple[list, list]:
+        """WHERE clauses shared by the paginated and incremental queries"""
+        clauses, params = [], []
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        else:
+            clauses.append("status IS NOT NULL AND status != ''")
+        if phone_number:
+            clauses.append("phone_number = ?")
+            params.append(phone_number)
+        if created_from:
+            clauses.append("created_at >= ?")
+            params.append(created_from)
+        if created_to:
+            clauses.append("created_at < ?")
+            params.append(created_to)
+        return clauses, params
+
+    def get_member_sessions_page(
+        self,
+        status: Optional[str] = None,
+        phone_number: Optional[str] = None,
+        created_from: Optional[str] = None,
+        created_to: Optional[str] = None,
+        cursor: Optional[int] = None,
+        limit: int = 50
+    ) -> tuple[list[dict], Optional[int]]:
+        """
+        Keyset-paginated sessions, newest first. Pass the returned next_cursor back as
+        `cursor` to get the following page; next_cursor is None on the last page.
+        """
+        clauses, params = self._session_filters(status, phone_number, created_from, created_to)
+        if cursor is not None:
+            clauses.append("id < ?")
+            params.append(cursor)
+        params.append(limit + 1)
+
+        with self._get_connection() as conn:
+            rows = conn.execute(f"""
+                SELECT {SESSION_COLUMNS}
+                FROM member_sessions
+                WHERE {' AND '.join(clauses)}
+                ORDER BY id DESC
+                LIMIT ?
+            """, params).fetchall()
+
+        sessions = [self._row_to_dict(row) for row in rows[:limit]]
+        next_cursor = sessions[-1]['id'] if len(rows) > limit else None
+        return sessions, next_cursor
+
+    def get_member_sessions_changed_since(
+        self,
+        version: int,
+        phone_number: Optional[str] = None,
+        created_from: Optional[str] = None,
+        created_to: Optional[str] = None,
+        limit: int = 500
+    ) -> tuple[list[dict], int, bool]:
+        """
+        Sessions inserted or modified after `version`, oldest change first.
+        Returns (sessions, sync_cursor, has_more); pass sync_cursor back as `version`.
+        There is no status filter: a row that left a status must still reach the client
+        so it can drop it from a status-filtered view.
+        """
+        clauses, params = self._session_filters(None, phone_number, created_from, created_to)
+
+        with self._get_connection() as conn:
+            # Bound the read by the latest committed version so no concurrent change is skipped
+            latest = conn.execute("SELECT COALESCE(MAX(version), 0) FROM member_sessions").fetchone()[0]
+            clauses.append("version > ? AND version <= ?")
+            params.extend([version, latest, limit + 1])
+            rows = conn.execute(f"""
+                SELECT {SESSION_COLUMNS}
+                FROM member_sessions
+                WHERE {' AND '.join(clauses)}
+                ORDER BY version ASC
+                LIMIT ?
+            """, params).fetchall()
+
+        sessions = [self._row_to_dict(row) for row in rows[:limit]]
+        has_more = len(rows) > limit
+        sync_cursor = sessions[-1]['version'] if has_more else max(latest, version)
+        return sessions, sync_cursor, has_more
+
+    def get_latest_version(self) -> int:
+        """Highest change version in member_sessions (0 for an empty table)"""
+        with self._get_connection() as conn:
+            row = conn.execute("SELECT COALESCE(MAX(version), 0) FROM member_sessions").fetchone()
+            return row[0]
+
+    def get_pending_deadlines(self) -> list[tuple[str, str]]:
+        """(session_id, created_at) of every PENDING session, for seeding the expiry scheduler"""
+        with self._get_connection() as conn:
+            return conn.execute(
+                "SELECT session_id, created_at FROM member_sessions WHERE status = 'PENDING'"
+            ).fetchall()
+
+    def expire_pending_sessions(self, cutoff: str, session_ids: Optional[list[str]] = None) -> int:
+        """
+        Mark PENDING sessions created before `cutoff` ('YYYY-MM-DD HH:MM:SS' UTC) as UNRESOLVED
+        in one set-based UPDATE, optionally limited to the given session_ids.
+        Returns the number of sessions expired.
+        """
+        query = "UPDATE member_sessions SET status = 'UNRESOLVED' WHERE status = 'PENDING' AND created_at < ?"
+        try:
+            with self._get_connection() as conn:
+                if session_ids is None:
+                    expired = conn.execute(query, (cutoff,)).rowcount
+                else:
+                    expired = 0
+                    # Stay well below SQLite's bound-parameter limit
+                    for start in range(0, len(session_ids), 500):
+                        chunk = session_ids[start:start + 500]
+                        placeholders = ", ".join("?" * len(chunk))
+                        expired += conn.execute(
+                            f"{query} AND session_id IN ({placeholders})", (cutoff, *chunk)
+                        ).rowcount
+                conn.commit()
+            if expired:
+                logging.info(f"Expired {expired} PENDING sessions created before {cutoff}")
+            return expired
+        except Exception as e:
+            logging.error(f"Error expiring PENDING sessions: {e}")
+            return 0
+
+    @staticmethod
+    def _row_to_dict(row) -> dict:
+        return {
+            'id': row[0],
+            'phone_number': row[1],
+            'session_id': row[2],
+            'created_at': row[3],
+            'question': row[4],
+            'status': row[5],
+            'answer': row[6],
+            'version': row[7],
+            'updated_at': row[8]
+        }
 
     @staticmethod
     def clean_phone_number(phone_number: str) -> Optional[str]:
@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from typing import Optional
+
+from .session_operations import SessionOperations
+
+
+class AsyncSessionWriter:
+    """
+    Single-threaded, batching writer for member_sessions.
+
+    Agent code awaits add_member_session / update_member_session without touching
+    SQLite on the event loop. A dedicated thread owns one connection, drains whatever
+    writes are queued, applies them in one transaction (each in its own SAVEPOINT so
+    a failing write does not undo the others) and commits once per batch.
+    """
+
+    def __init__(self, sessions: SessionOperations, max_batch: int = 64):
+        self.sessions = sessions
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self.batches_committed = 0
+        self.writes_applied = 0
+        self._thread = threading.Thread(target=self._run, name="session-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, operation: str, *args) -> Future:
+        """Queue a write and return a future resolved with its bool result"""
+        future: Future = Future()
+        self._queue.put((operation, args, future))
+        return future
+
+    async def add_member_session(self, phone_number: str, session_id: str) -> bool:
+        return await asyncio.wrap_future(self.submit("add", phone_number, session_id))
+
+    async def update_member_session(self, session_id: str, status: str, question: Optional[str] = None, answer: Optional[str] = None) -> bool:
+        return await asyncio.wrap_future(self.submit("update", session_id, status, question, answer))
+
+    def close(self, timeout: Optional[float] = 5.0):
+        """Flush queued writes and stop the writer thread"""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _next_batch(self) -> tuple[list, bool]:
+        """Block for one write, then take whatever else is already queued"""
+        batch, stopping = [], False
+        item = self._queue.get()
+        while True:
+            if item is None:
+                stopping = True
+                break
+            batch.append(item)
+            if len(batch) >= self.max_batch:
+                break
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+        return batch, stopping
+
+    def _apply(self, cursor, operation: str, args: tuple) -> bool:
+        if operation == "add":
+            return self.sessions._insert_member_session(cursor, *args)
+        if operation == "update":
+            return self.sessions._apply_member_session_update(cursor, *args)
+        raise ValueError(f"Unknown session write: {operation}")
+
+    def _run(self):
+        # Same WAL/busy_timeout tuning as the driver's pool, but transactions are managed explicitly
+        conn = self.sessions._connect()
+        conn.isolation_level = None
+        try:
+            while True:
+                batch, stopping = self._next_batch()
+                if batch:
+                    self._write_batch(conn, batch)
+                if stopping:
+                    return
+        finally:
+            conn.close()
+
+    def _write_batch(self, conn: sqlite3.Connection, batch: list):
+        cursor = conn.cursor()
+        results = []
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            for operation, args, future in batch:
+                cursor.execute("SAVEPOINT write")
+                try:
+                    results.append((future, self._apply(cursor, operation, args)))
+                    cursor.execute("RELEASE write")
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO write")
+                    cursor.execute("RELEASE write")
+                    logging.error(f"Session write {operation}{args} failed: {e}")
+                    results.append((future, False))
+            cursor.execute("COMMIT")
+            self.batches_committed += 1
+            self.writes_applied += len(batch)
+        except Exception as e:
+            logging.error(f"Session write batch of {len(batch)} failed: {e}")
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            results = [(future, False) for _, _, future in batch]
+
+        for future, result in results:
+            if not future.done():
+                future.set_result(result)
+
+
+_writers: dict = {}
+_writers_lock = threading.Lock()
+
+
+def get_session_writer(sessions: SessionOperations) -> AsyncSessionWriter:
+    """Return the process-wide writer for a database file, starting it on first use"""
+    with _writers_lock:
+        writer = _writers.get(sessions.db_path)
+        if writer is None:
+            writer = AsyncSessionWriter(sessions)
+            _writers[sessions.db_path] = writer
+        return writer
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from utils import get_huggingface_embedding_async
+
+EMBEDDING_MODEL_NAME = "BAAI/bge-small-en-v1.5"
+EMBEDDING_DIM = 384
+
+# Local models are loaded once per process and shared by every backend instance
+_local_models = {}
+_local_models_lock = threading.Lock()
+
+
+def load_local_model(model_name: str = EMBEDDING_MODEL_NAME, backend: str = "torch"):
+    """
+    Load a SentenceTransformer once per process.
+
+    Args:
+        model_name: HuggingFace model id
+        backend: "torch" or "onnx" (ONNX needs `optimum[onnxruntime]`; set
+            EMBEDDING_ONNX_FILE to pick a quantized export such as onnx/model_qint8_avx2.onnx)
+
+    Returns:
+        The loaded SentenceTransformer
+    """
+    key = (model_name, backend)
+    with _local_models_lock:
+        if key not in _local_models:
+            from sentence_transformers import SentenceTransformer
+
+            if backend == "onnx":
+                model_kwargs = {}
+                if os.getenv("EMBEDDING_ONNX_FILE"):
+                    model_kwargs["file_name"] = os.getenv("EMBEDDING_ONNX_FILE")
+                model = SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+            else:
+                model = SentenceTransformer(model_name, device="cpu")
+            _local_models[key] = model
+            logging.info(f"Loaded local embedding model {model_name} ({backend})")
+        return _local_models[key]
+
+
+class EmbeddingBackend:
+    """Base class for query embedding backends used by the agent"""
+
+    name = "base"
+
+    async def embed(self, text: str) -> list[float]:
+        raise NotImplementedError
+
+
+class HuggingFaceAPIEmbedding(EmbeddingBackend):
+    """Remote embeddings from the HuggingFace Inference API"""
+
+    name = "huggingface"
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, api_key: Optional[str] = None):
+        self.model_name = model_name
+        self.api_key = api_key or os.getenv("HUGGINGFACE_API_KEY")
+
+    async def embed(self, text: str) -> list[float]:
+        if not self.api_key:
+            raise Exception("HUGGINGFACE_API_KEY not found")
+        return await get_huggingface_embedding_async(text, self.api_key, self.model_name)
+
+
+class LocalEmbedding(EmbeddingBackend):
+    """
+    In-process CPU embeddings with the same model used at ingest time.
+
+    Encoding runs on a small dedicated thread pool so the event loop keeps serving
+    audio while the model works.
+    """
+
+    name = "local"
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, backend: str = "torch", max_workers: int = 2):
+        self.model_name = model_name
+        self.backend = backend
+        self.name = "local" if backend == "torch" else backend
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="embedding")
+
+    @property
+    def model(self):
+        return load_local_model(self.model_name, self.backend)
+
+    def embed_sync(self, text: str) -> list[float]:
+        return self.model.encode([text])[0].tolist()
+
+    async def embed(self, text: str) -> list[float]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.embed_sync, text)
+
+
+def create_embedding_backend(name: Optional[str] = None) -> EmbeddingBackend:
+    """
+    Create an embedding backend by name: "huggingface" (default), "local" or "onnx".
+    Falls back to the local torch model if the ONNX runtime is not installed.
+    """
+    name = (name or os.getenv("EMBEDDING_BACKEND", "huggingface")).lower()
+    max_workers = int(os.getenv("EMBEDDING_THREADS", "2"))
+
+    if name == "local":
+        return LocalEmbedding(max_workers=max_workers)
+    if name == "onnx":
+        try:
+            load_local_model(EMBEDDING_MODEL_NAME, "onnx")
+            return LocalEmbedding(backend="onnx", max_workers=max_workers)
+        except Exception as e:
+            logging.warning(f"ONNX embedding backend unavailable, using local torch model: {e}")
+            return LocalEmbedding(max_workers=max_workers)
+    if name != "huggingface":
+        logging.warning(f"Unknown EMBEDDING_BACKEND '{name}', using huggingface")
+    return HuggingFaceAPIEmbedding()
+
+
+_embedder: Optional[EmbeddingBackend] = None
+_embedder_lock = threading.Lock()
+
+
+def get_embedder() -> EmbeddingBackend:
+    """Return the process-wide embedding backend selected by EMBEDDING_BACKEND"""
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                _embedder = create_embedding_backend()
+                logging.info(f"Using {_embedder.name} embedding backend")
+    return _embedder
@@ -0,0 +1,255 @@
+import bisect
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+# Histogram bucket upper bounds in milliseconds
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Recent samples kept per stage for percentile estimates
+RESERVOIR_SIZE = 2048
+
+# Session the current task belongs to; asyncio tasks started inside a call inherit it
+current_session_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_session_id", default=None)
+
+
+def _percentile(sorted_samples: list, pct: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[min(len(sorted_samples) - 1, int(len(sorted_samples) * pct))]
+
+
+class Histogram:
+    """Fixed-bucket latency histogram with a bounded reservoir of recent samples for p50/p95/p99"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, value_ms: float):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+        self.samples.append(value_ms)
+
+    def summary(self) -> dict:
+        ordered = sorted(self.samples)
+        return {
+            'count': self.count,
+            'total_ms': round(self.total, 3),
+            'p50_ms': round(_percentile(ordered, 0.50), 3),
+            'p95_ms': round(_percentile(ordered, 0.95), 3),
+            'p99_ms': round(_percentile(ordered, 0.99), 3),
+            'max_ms': round(ordered[-1], 3) if ordered else 0.0
+        }
+
+
+class MetricsRegistry:
+    """
+    Per-worker latency metrics.
+
+    Every stage of a turn (embedding, vector query, LLM formatting, DB writes, session
+    start, pre-warm, and LiveKit's own STT/LLM/TTS/EOU timings) records a span here.
+    Spans feed one histogram per stage for the whole worker and a per-session log that
+    is written out as a JSON summary when the call ends.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: dict[str, Histogram] = defaultdict(Histogram)
+        self._session_histograms: dict[str, dict[str, Histogram]] = defaultdict(lambda: defaultdict(Histogram))
+        self._session_spans: dict[str, list] = defaultdict(list)
+        self._counters: dict[str, float] = defaultdict(float)
+        self._gauge_sources: list = []
+
+    def record(self, stage: str, duration_ms: float, session_id: Optional[str] = None, **tags):
+        """Record one span"""
+        session_id = session_id or current_session_id.get()
+        with self._lock:
+            self._histograms[stage].observe(duration_ms)
+            if session_id:
+                self._session_histograms[session_id][stage].observe(duration_ms)
+                self._session_spans[session_id].append({
+                    'stage': stage,
+                    'duration_ms': round(duration_ms, 3),
+                    'at': time.time(),
+                    **tags
+                })
+
+    def increment(self, name: str, value: float = 1.0):
+        with self._lock:
+            self._counters[name] += value
+
+    def add_gauge_source(self, source):
+        """Register a callable returning {metric_name: value}, sampled on every export"""
+        self._gauge_sources.append(source)
+
+    def stage_summary(self, stage: str) -> dict:
+        with self._lock:
+            return self._histograms[stage].summary()
+
+    def session_summary(self, session_id: str, pop: bool = False) -> dict:
+        """Per-stage latency summary and raw spans for one call"""
+        with self._lock:
+            stages = self._session_histograms.get(session_id, {})
+            summary = {
+                'session_id': session_id,
+                'stages': {stage: histogram.summary() for stage, histogram in stages.items()},
+                'spans': list(self._session_spans.get(session_id, []))
+            }
+            if pop:
+                self._session_histograms.pop(session_id, None)
+                self._session_spans.pop(session_id, None)
+            return summary
+
+    def write_session_summary(self, session_id: str, log_dir: str = "logs") -> Optional[str]:
+        """Write the call's summary to logs/metrics_<session_id>.json and forget its spans"""
+        summary = self.session_summary(session_id, pop=True)
+        try:
+            os.makedirs(log_dir, exist_ok=True)
+            path = os.path.join(log_dir, f"metrics_{session_id}.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=2)
+            logging.info(f"Session metrics written to {path}")
+            return path
+        except Exception as e:
+            logging.warning(f"Failed to write session metrics for {session_id}: {e}")
+            return None
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = [
+            "# HELP ai_receptionist_stage_duration_seconds Latency of each stage of a voice turn",
+            "# TYPE ai_receptionist_stage_duration_seconds histogram",
+        ]
+        with self._lock:
+            histograms = dict(self._histograms)
+            summaries = {stage: h.summary() for stage, h in histograms.items()}
+            for stage, histogram in sorted(histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+                    cumulative += count
+                    lines.append(f'ai_receptionist_stage_duration_seconds_bucket{{stage="{stage}",le="{bound / 1000}"}} {cumulative}')
+                lines.append(f'ai_receptionist_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'ai_receptionist_stage_duration_seconds_sum{{stage="{stage}"}} {histogram.total / 1000}')
+                lines.append(f'ai_receptionist_stage_duration_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+            lines.append("# HELP ai_receptionist_stage_latency_seconds Recent latency percentiles of each stage")
+            lines.append("# TYPE ai_receptionist_stage_latency_seconds summary")
+            for stage, summary in sorted(summaries.items()):
+                for quantile, key in (("0.5", "p50_ms"), ("0.95", "p95_ms"), ("0.99", "p99_ms")):
+                    lines.append(f'ai_receptionist_stage_latency_seconds{{stage="{stage}",quantile="{quantile}"}} {summary[key] / 1000}')
+                lines.append(f'ai_receptionist_stage_latency_seconds_sum{{stage="{stage}"}} {summary["total_ms"] / 1000}')
+                lines.append(f'ai_receptionist_stage_latency_seconds_count{{stage="{stage}"}} {summary["count"]}')
+
+            for name, value in sorted(self._counters.items()):
+                lines.append(f"# TYPE ai_receptionist_{name} counter")
+                lines.append(f"ai_receptionist_{name} {value}")
+            sources = list(self._gauge_sources)
+
+        for source in sources:
+            try:
+                for name, value in sorted(source().items()):
+                    lines.append(f"# TYPE ai_receptionist_{name} gauge")
+                    lines.append(f"ai_receptionist_{name} {value}")
+            except Exception as e:
+                logging.warning(f"Metrics gauge source failed: {e}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus_textfile(self, directory: str = os.path.join("logs", "metrics")) -> Optional[str]:
+        """Write this worker's metrics as a node_exporter textfile (one file per process)"""
+        try:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"worker_{os.getpid()}.prom")
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.render_prometheus())
+            os.replace(tmp_path, path)
+            return path
+        except Exception as e:
+            logging.warning(f"Failed to write Prometheus metrics file: {e}")
+            return None
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._session_histograms.clear()
+            self._session_spans.clear()
+            self._counters.clear()
+
+
+registry = MetricsRegistry()
+
+
+@contextmanager
+def span(stage: str, session_id: Optional[str] = None, **tags):
+    """Time a block and record it under `stage` for the current (or given) session"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.record(stage, (time.perf_counter() - start) * 1000, session_id=session_id, **tags)
+
+
+def bind_session(session_id: str):
+    """Tag every span recorded from the current task (and tasks it starts) with session_id"""
+    return current_session_id.set(session_id)
+
+
+def record_livekit_metrics(event_metrics, session_id: Optional[str] = None):
+    """Feed LiveKit's metrics_collected events (STT, LLM, TTS, end-of-utterance) into the registry"""
+    kind = type(event_metrics).__name__
+    if kind == "STTMetrics":
+        registry.record("stt", event_metrics.duration * 1000, session_id=session_id)
+    elif kind == "LLMMetrics":
+        registry.record("agent_llm_ttft", event_metrics.ttft * 1000, session_id=session_id)
+        registry.record("agent_llm", event_metrics.duration * 1000, session_id=session_id)
+    elif kind == "TTSMetrics":
+        registry.record("tts_ttfb", event_metrics.ttfb * 1000, session_id=session_id)
+    elif kind == "EOUMetrics":
+        registry.record("end_of_utterance", event_metrics.end_of_utterance_delay * 1000, session_id=session_id)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = registry.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server: Optional[ThreadingHTTPServer] = None
+
+
+def start_metrics_server(port: int) -> bool:
+    """Serve /metrics on a background thread; returns False if the port is taken (e.g. by a sibling process)"""
+    global _server
+    if _server is not None:
+        return True
+    try:
+        _server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    except OSError as e:
+        logging.warning(f"Metrics server not started on port {port}: {e}")
+        return False
+    threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+    logging.info(f"Prometheus metrics served on :{port}/metrics")
+    return True
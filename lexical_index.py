@@ -0,0 +1,218 @@
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from vector_store import VectorMatch, file_lock
+
+# One JSON file of documents per physical namespace, written next to the vectors by ingest and server.py
+LEXICAL_INDEX_DIR = os.getenv(
+    "LEXICAL_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "lexical_index")
+)
+
+# Question filler that carries no meaning for matching ("what is your phone number" -> phone, number)
+STOPWORDS = frozenset("""
+a about am an and any are as at be can could do does for from get give have how i if in is it its
+know like me much my of on or our please say tell that the there this to us what whats when where
+which who will with would you your yours
+""".split())
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase word/number tokens without stopwords, with a plural 's' stripped ("facials" -> "facial")"""
+    tokens = []
+    for token in re.findall(r"[a-z0-9]+", text.lower().replace("'", "")):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+@dataclass
+class LexicalMatch(VectorMatch):
+    """A BM25 hit; coverage is the share of the query's distinct terms found in the document"""
+    coverage: float = 0.0
+
+
+class BM25Index:
+    """
+    In-memory Okapi BM25 index over knowledge-base chunks.
+
+    Documents are the same {title, category, content, ...} metadata stored with the
+    vectors, keyed by vector id, so lexical and vector hits can be fused by id. Title
+    and content are indexed. Only the documents are persisted; postings are rebuilt on
+    load, which takes milliseconds at knowledge-base sizes.
+    """
+
+    def __init__(self, documents: Optional[dict] = None, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.documents: dict[str, dict] = {}
+        self._postings: dict[str, dict[str, int]] = defaultdict(dict)
+        self._lengths: dict[str, int] = {}
+        self._total_length = 0
+        for doc_id, metadata in (documents or {}).items():
+            self.add(doc_id, metadata)
+
+    def add(self, doc_id: str, metadata: dict):
+        """Index a document, replacing any previous version with the same id"""
+        if doc_id in self.documents:
+            self.remove(doc_id)
+        terms = Counter(tokenize(f"{metadata.get('title', '')} {metadata.get('content', '')}"))
+        for term, count in terms.items():
+            self._postings[term][doc_id] = count
+        self.documents[doc_id] = metadata
+        self._lengths[doc_id] = sum(terms.values())
+        self._total_length += self._lengths[doc_id]
+
+    def remove(self, doc_id: str):
+        metadata = self.documents.pop(doc_id, None)
+        if metadata is None:
+            return
+        for term in set(tokenize(f"{metadata.get('title', '')} {metadata.get('content', '')}")):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._lengths.pop(doc_id)
+
+    def search(self, query: str, top_k: int = 3) -> list[LexicalMatch]:
+        """Top documents by BM25 score for the query's terms"""
+        terms = set(tokenize(query))
+        if not terms or not self.documents:
+            return []
+        count = len(self.documents)
+        average_length = self._total_length / count or 1.0
+        scores: dict[str, float] = defaultdict(float)
+        matched: dict[str, int] = defaultdict(int)
+        for term in terms:
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / average_length)
+                scores[doc_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+                matched[doc_id] += 1
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+        return [
+            LexicalMatch(
+                id=doc_id,
+                score=score,
+                metadata=self.documents[doc_id],
+                data=self.documents[doc_id].get('content'),
+                coverage=matched[doc_id] / len(terms)
+            )
+            for doc_id, score in ranked
+        ]
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+
+def reciprocal_rank_fusion(*rankings: Iterable, k: int = 60) -> list[VectorMatch]:
+    """
+    Merge ranked result lists by id with RRF: each list contributes 1 / (k + rank).
+    Scores from different retrievers are not comparable, ranks are. Returned matches
+    keep the metadata of their first occurrence and carry the fused score.
+    """
+    fused: dict[str, float] = defaultdict(float)
+    first: dict[str, VectorMatch] = {}
+    for ranking in rankings:
+        for rank, match in enumerate(ranking or [], start=1):
+            fused[match.id] += 1.0 / (k + rank)
+            first.setdefault(match.id, match)
+    ordered = sorted(fused, key=lambda doc_id: -fused[doc_id])
+    return [
+        VectorMatch(
+            id=doc_id,
+            score=fused[doc_id],
+            metadata=first[doc_id].metadata,
+            data=getattr(first[doc_id], 'data', None)
+        )
+        for doc_id in ordered
+    ]
+
+
+def _index_path(namespace: Optional[str]) -> str:
+    return os.path.join(LEXICAL_INDEX_DIR, f"{namespace or 'default'}.json")
+
+
+def load_lexical_index(namespace: Optional[str]) -> BM25Index:
+    """Read a namespace's index from disk (empty if it was never built)"""
+    try:
+        with open(_index_path(namespace), "r", encoding="utf-8") as f:
+            return BM25Index(json.load(f).get("documents", {}))
+    except FileNotFoundError:
+        return BM25Index()
+    except (OSError, json.JSONDecodeError) as e:
+        logging.error(f"Failed to read lexical index for namespace {namespace}: {e}")
+        return BM25Index()
+
+
+def _index_lock(namespace: Optional[str]):
+    """Exclusive lock on a namespace's index file across processes (ingest, server.py)"""
+    os.makedirs(LEXICAL_INDEX_DIR, exist_ok=True)
+    return file_lock(_index_path(namespace) + ".lock")
+
+
+def _write_index(namespace: Optional[str], index: BM25Index):
+    path = _index_path(namespace)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"documents": index.documents}, f)
+    os.replace(path + ".tmp", path)
+
+
+def save_lexical_index(namespace: Optional[str], index: BM25Index):
+    """Atomically replace a namespace's index file (for a namespace being built from scratch)"""
+    with _index_lock(namespace):
+        _write_index(namespace, index)
+
+
+def update_lexical_index(namespace: Optional[str], documents: dict, remove: Iterable[str] = ()):
+    """Add (or replace) documents and drop ids in a namespace's index file, merging with concurrent writers"""
+    with _index_lock(namespace):
+        index = load_lexical_index(namespace)
+        for doc_id in remove:
+            index.remove(doc_id)
+        for doc_id, metadata in documents.items():
+            index.add(doc_id, metadata)
+        _write_index(namespace, index)
+
+
+def delete_lexical_index(namespace: Optional[str]):
+    try:
+        os.remove(_index_path(namespace))
+    except FileNotFoundError:
+        pass
+
+
+_indexes: dict = {}
+_indexes_lock = threading.Lock()
+
+
+def get_lexical_index(namespace: Optional[str]) -> BM25Index:
+    """Cached index for a physical namespace, re-read when another process rewrites the file"""
+    try:
+        stat = os.stat(_index_path(namespace))
+        # Size as well as mtime, in case two rewrites land within the filesystem's timestamp granularity
+        signature = (stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        signature = None
+    with _indexes_lock:
+        cached = _indexes.get(namespace)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+    index = load_lexical_index(namespace) if signature is not None else BM25Index()
+    with _indexes_lock:
+        _indexes[namespace] = (signature, index)
+    return index
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from lexical_index import tokenize
+
+
+def prefetch_mode() -> str:
+    """
+    Which user transcripts start a speculative retrieval (KB_PREFETCH):
+    - "final": final transcripts, while the agent LLM plans its reply (default)
+    - "interim": interim transcripts too, starting even earlier at the cost of extra lookups
+    - "off": retrieve only when query_knowledge_base is called
+    """
+    return os.getenv("KB_PREFETCH", "final").lower()
+
+
+@dataclass
+class _Prefetch:
+    text: str
+    terms: frozenset
+    task: asyncio.Task
+    started_at: float
+    final: bool
+
+
+class RetrievalPrefetcher:
+    """
+    Per-call cache of retrievals started speculatively from the caller's transcripts.
+
+    `retrieve(text)` (query embedding + vector search) runs as a task as soon as a
+    transcript arrives, so by the time the agent LLM calls query_knowledge_base the
+    round-trips are done or under way. The tool's query is usually a rephrasing of what
+    the caller said, so lookup() matches on shared terms rather than exact text, and
+    only when the two term sets are nearly the same. An interim transcript superseded by
+    a newer one has its retrieval cancelled.
+    """
+
+    def __init__(self, retrieve: Callable[[str], Awaitable], ttl: float = 30.0,
+                 min_overlap: float = 0.75, max_entries: int = 4):
+        self.retrieve = retrieve
+        self.ttl = ttl
+        self.min_overlap = min_overlap
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[frozenset, _Prefetch]" = OrderedDict()
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+
+    def on_transcript(self, transcript: str, is_final: bool = True):
+        """Start retrieving for a user transcript (call from the event loop)"""
+        terms = frozenset(tokenize(transcript or ""))
+        if not terms:
+            return
+        self._expire()
+        existing = self._entries.get(terms)
+        if existing is not None and not existing.task.cancelled():
+            existing.final = existing.final or is_final
+            return
+
+        if self._entries:
+            latest = next(reversed(self._entries.values()))
+            if not latest.final and not latest.task.done():
+                # The caller kept talking; the older partial utterance is not worth finishing
+                latest.task.cancel()
+                self._entries.pop(latest.terms, None)
+
+        task = asyncio.get_running_loop().create_task(self.retrieve(transcript))
+        task.add_done_callback(self._log_failure)
+        self._entries[terms] = _Prefetch(transcript, terms, task, time.monotonic(), is_final)
+        self.started += 1
+        while len(self._entries) > self.max_entries:
+            _, evicted = self._entries.popitem(last=False)
+            evicted.task.cancel()
+
+    async def lookup(self, query: str):
+        """Result of the prefetch matching `query` (waiting for it if still running), or None"""
+        self._expire()
+        terms = set(tokenize(query or ""))
+        best, best_overlap = None, 0.0
+        for entry in reversed(self._entries.values()):
+            # Jaccard similarity: a short query contained in a longer transcript may be a different question
+            overlap = len(terms & entry.terms) / len(terms | entry.terms) if terms else 0.0
+            if overlap > best_overlap:
+                best, best_overlap = entry, overlap
+        if best is None or best_overlap < self.min_overlap:
+            self.misses += 1
+            return None
+        try:
+            result = await best.task
+        except asyncio.CancelledError:
+            if not best.task.cancelled():
+                raise
+            self.misses += 1
+            return None
+        except Exception:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def close(self):
+        """Cancel retrievals still in flight (at call shutdown)"""
+        for entry in self._entries.values():
+            entry.task.cancel()
+        self._entries.clear()
+
+    def _expire(self):
+        now = time.monotonic()
+        for terms in [terms for terms, entry in self._entries.items() if now - entry.started_at > self.ttl]:
+            self._entries.pop(terms).task.cancel()
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logging.warning(f"Speculative retrieval failed (non-critical): {task.exception()}")
@@ -0,0 +1,238 @@
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from lexical_index import tokenize
+
+# Version markers live next to the code so the agent, server.py and
+# IngestSalonData/ingest_data.py agree on them regardless of working directory
+KB_VERSION_DIR = os.getenv(
+    "KB_VERSION_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "kb_versions")
+)
+
+
+def normalize_query(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace so trivially different phrasings share a key"""
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return " ".join(text.split())
+
+
+def _version_path(namespace: Optional[str]) -> str:
+    return os.path.join(KB_VERSION_DIR, f"{namespace or 'default'}.version")
+
+
+def bump_namespace_version(namespace: Optional[str]) -> None:
+    """Mark a namespace as changed so every process's query cache drops its entries"""
+    try:
+        os.makedirs(KB_VERSION_DIR, exist_ok=True)
+        with open(_version_path(namespace), "w", encoding="utf-8") as f:
+            f.write(str(time.time_ns()))
+    except Exception as e:
+        logging.warning(f"Failed to bump knowledge base version for namespace {namespace}: {e}")
+
+
+def get_namespace_version(namespace: Optional[str]) -> Optional[str]:
+    """Return the current version marker for a namespace, or None if it was never bumped"""
+    try:
+        with open(_version_path(namespace), "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+@dataclass
+class CacheEntry:
+    answer: str
+    embedding: Optional[np.ndarray]
+    created_at: float
+    terms: frozenset = frozenset()
+
+
+class QueryCache:
+    """
+    Bounded LRU/TTL cache of formatted knowledge-base answers.
+
+    Tier 1 is keyed on the normalized query text. Tier 2 compares the query embedding
+    against the cached entries' embeddings so near-duplicate questions reuse an answer.
+    Embeddings of questions that differ only in the service asked about ("price of a
+    haircut" / "price of a manicure") are often closer than any threshold, so a tier 2
+    hit also needs the same content terms (stopwords, plurals and word order aside).
+    Entries are dropped when the namespace version marker changes (see
+    bump_namespace_version), i.e. whenever the knowledge base is re-ingested.
+    """
+
+    def __init__(
+        self,
+        namespace: Optional[str] = None,
+        max_entries: int = 256,
+        ttl_seconds: float = 3600,
+        similarity_threshold: float = 0.95
+    ):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: list = []
+        self._lock = threading.Lock()
+        self._version = get_namespace_version(namespace)
+        self._version_checked_at = time.monotonic()
+        self.hits_exact = 0
+        self.hits_semantic = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _check_version(self):
+        """Clear the cache if the namespace was re-ingested (checked at most every 100ms)"""
+        now = time.monotonic()
+        if now - self._version_checked_at < 0.1:
+            return
+        self._version_checked_at = now
+        version = get_namespace_version(self.namespace)
+        if version != self._version:
+            self._version = version
+            if self._entries:
+                self._entries.clear()
+                self._matrix = None
+                self.invalidations += 1
+                logging.info(f"Query cache invalidated for namespace {self.namespace}")
+
+    def _is_fresh(self, entry: CacheEntry) -> bool:
+        return time.monotonic() - entry.created_at < self.ttl_seconds
+
+    def get_exact(self, query: str) -> Optional[str]:
+        """Return the cached answer for this exact (normalized) query; does not count a miss"""
+        key = normalize_query(query)
+        with self._lock:
+            self._check_version()
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if not self._is_fresh(entry):
+                del self._entries[key]
+                self._matrix = None
+                return None
+            self._entries.move_to_end(key)
+            self.hits_exact += 1
+            return entry.answer
+
+    def get_similar(self, query: str, embedding) -> Optional[str]:
+        """
+        Return the answer of the most similar cached query above the threshold that asks
+        about the same terms, counting a miss otherwise
+        """
+        vector = self._unit(embedding)
+        terms = frozenset(tokenize(query))
+        with self._lock:
+            self._check_version()
+            if self._matrix is None:
+                self._rebuild_matrix()
+            if self._matrix_keys:
+                scores = self._matrix @ vector
+                for index in np.argsort(-scores):
+                    if scores[index] < self.similarity_threshold:
+                        break
+                    key = self._matrix_keys[index]
+                    entry = self._entries.get(key)
+                    if entry is not None and entry.terms == terms and self._is_fresh(entry):
+                        self._entries.move_to_end(key)
+                        self.hits_semantic += 1
+                        return entry.answer
+            self.misses += 1
+            return None
+
+    def _rebuild_matrix(self):
+        """Stack cached embeddings into one matrix so tier 2 is a single matrix-vector product"""
+        keys = [key for key, entry in self._entries.items() if entry.embedding is not None]
+        self._matrix_keys = keys
+        self._matrix = np.stack([self._entries[key].embedding for key in keys]) if keys else np.empty((0, 0))
+
+    def put(self, query: str, embedding, answer: str) -> None:
+        """Store a formatted answer for a query"""
+        key = normalize_query(query)
+        vector = self._unit(embedding) if embedding is not None else None
+        with self._lock:
+            self._entries[key] = CacheEntry(
+                answer=answer, embedding=vector, created_at=time.monotonic(), terms=frozenset(tokenize(query))
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._matrix = None
+
+    def invalidate(self) -> None:
+        """Drop every cached entry"""
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits_exact + self.hits_semantic + self.misses
+            return {
+                'namespace': self.namespace,
+                'size': len(self._entries),
+                'hits_exact': self.hits_exact,
+                'hits_semantic': self.hits_semantic,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': (self.hits_exact + self.hits_semantic) / lookups if lookups else 0.0
+            }
+
+    @staticmethod
+    def _unit(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+_caches: dict = {}
+_caches_lock = threading.Lock()
+
+
+def get_query_cache(namespace: Optional[str] = None) -> QueryCache:
+    """Return the process-wide query cache for a namespace (defaults to NAMESPACE)"""
+    namespace = namespace or os.getenv("NAMESPACE")
+    with _caches_lock:
+        if namespace not in _caches:
+            _caches[namespace] = QueryCache(
+                namespace=namespace,
+                max_entries=int(os.getenv("QUERY_CACHE_SIZE", "256")),
+                ttl_seconds=float(os.getenv("QUERY_CACHE_TTL", "3600")),
+                similarity_threshold=float(os.getenv("QUERY_CACHE_SIMILARITY", "0.95"))
+            )
+        return _caches[namespace]
+
+
+def drop_query_cache(namespace: Optional[str]) -> None:
+    """Forget a namespace's cache, e.g. when its tenant is unloaded"""
+    with _caches_lock:
+        _caches.pop(namespace, None)
+
+
+def cache_gauges() -> dict:
+    """Hit/miss counters summed over every namespace cache in this process, for metrics export"""
+    with _caches_lock:
+        caches = list(_caches.values())
+    totals = {'query_cache_hits_exact': 0, 'query_cache_hits_semantic': 0, 'query_cache_misses': 0, 'query_cache_size': 0}
+    for cache in caches:
+        stats = cache.stats()
+        totals['query_cache_hits_exact'] += stats['hits_exact']
+        totals['query_cache_hits_semantic'] += stats['hits_semantic']
+        totals['query_cache_misses'] += stats['misses']
+        totals['query_cache_size'] += stats['size']
+    return totals
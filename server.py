@@ -1,16 +1,32 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, jsonify, request, Response, stream_with_context
 from flask_apscheduler import APScheduler
 from dbDrivers.session_operations import SessionOperations
+from dbDrivers.session_events import SessionEventBroadcaster
+from dbDrivers.session_expiry import SessionExpiryScheduler, expiry_cutoff
+from dbDrivers.job_queue import JobQueue
+import queue
+import threading
 import os
 from datetime import datetime, timezone
 from dotenv import load_dotenv
 import hashlib
-from upstash_vector import Index
 from sentence_transformers import SentenceTransformer
 import json
+from vector_store import get_vector_store, resolve_namespace
+from query_cache import bump_namespace_version
+from lexical_index import update_lexical_index
+from utils import canonical_answer
+from tenants import get_tenant_registry, DEFAULT_TENANT_ID
+from concurrent.futures import ThreadPoolExecutor
+
+_vector_init_lock = threading.Lock()
 
 def initialize_vector_components():
-    """Initialize embedding model and vector client"""
+    """Initialize embedding model and vector client (once, even with several job workers)"""
+    with _vector_init_lock:
+        return _initialize_vector_components()
+
+def _initialize_vector_components():
     global embedding_model, vector_client
 
     try:
@@ -19,17 +35,15 @@ def initialize_vector_components():
             embedding_model = SentenceTransformer('BAAI/bge-small-en-v1.5')
             print("SUCCESS: Embedding model loaded")
 
-        # Initialize Upstash Vector client
+        # Initialize vector store (Upstash or the local embedded index)
         if vector_client is None:
-            if not os.getenv("UPSTASH_VECTOR_REST_URL") or not os.getenv("UPSTASH_VECTOR_REST_TOKEN"):
+            store = get_vector_store()
+            if store.name == "upstash" and (not os.getenv("UPSTASH_VECTOR_REST_URL") or not os.getenv("UPSTASH_VECTOR_REST_TOKEN")):
                 print("WARNING: Missing Upstash environment variables - vector ingestion disabled")
                 return False
 
-            vector_client = Index(
-                url=os.getenv("UPSTASH_VECTOR_REST_URL"),
-                token=os.getenv("UPSTASH_VECTOR_REST_TOKEN")
-            )
-            print("SUCCESS: Connected to Upstash Vector database")
+            vector_client = store
+            print(f"SUCCESS: Connected to {store.name} vector store")
 
         return True
     except Exception as e:
@@ -40,47 +54,87 @@ def create_vector_id(text):
     """Create a unique ID for each text"""
     return hashlib.md5(text.encode()).hexdigest()
 
-def ingest_qa_to_vector_db(question, answer, session_id):
+def ingest_qa_to_vector_db(question, answer, session_id, namespace=None):
     """Ingest question-answer pair into vector database"""
+    return ingest_qa_batch_to_vector_db([(question, answer, session_id)], namespace=namespace)
+
+def precompute_qa_answers(namespace, items):
+    """Canonical TTS-ready answer for each (question, answer, session_id, qa_content), "" where none was produced"""
+    if os.getenv("INGEST_CANONICAL_ANSWERS", "1") == "0":
+        return [""] * len(items)
+    system_message = get_tenant_registry().formatter_instruction(namespace)
+    # One Groq call per pair; run them side by side so a batch job takes about as long as one call
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        return list(pool.map(
+            lambda item: canonical_answer(item[3], item[0], system_message),
+            items
+        ))
+
+
+def ingest_qa_batch_to_vector_db(pairs, namespace=None):
+    """
+    Ingest (question, answer, session_id) pairs into a tenant's namespace (NAMESPACE by
+    default) with one batched encode and one bulk upsert
+    """
     if not initialize_vector_components():
         print("WARNING: Vector database components not available - skipping ingestion")
         return False
 
     try:
-        namespace = os.getenv("NAMESPACE")
+        namespace = namespace or os.getenv("NAMESPACE")
         if not namespace:
             print("WARNING: Missing NAMESPACE environment variable - skipping vector ingestion")
             return False
 
-        # Combine question and answer for better context
-        qa_content = f"Q: {question}\nA: {answer}"
+        # Combine question and answer for better context; identical content shares an md5 id, keep the latest
+        unique = {}
+        for question, answer, session_id in pairs:
+            qa_content = f"Q: {question}\nA: {answer}"
+            unique[create_vector_id(qa_content)] = (question, answer, session_id, qa_content)
+        if not unique:
+            return True
+
+        # Get embeddings
+        contents = [item[3] for item in unique.values()]
+        embeddings = embedding_model.encode(contents, batch_size=32).tolist()
 
-        # Get embedding
-        embedding = embedding_model.encode([qa_content]).tolist()[0]
+        # Precompute the spoken answers so the agent can serve these Q&As without a formatter call
+        answers = precompute_qa_answers(namespace, unique.values())
 
         # Create vector data
-        vector_id = create_vector_id(qa_content)
-        vector_data = {
-            "id": vector_id,
-            "vector": embedding,
-            "metadata": {
-                'title': f"Q&A - Session {session_id}",
-                'category': 'Customer_QA',
-                'question': question,
-                'answer': answer,
-                'session_id': session_id,
-                'content': qa_content
-            },
-            "data": qa_content
-        }
+        vectors = [
+            {
+                "id": vector_id,
+                "vector": embedding,
+                "metadata": {
+                    'title': f"Q&A - Session {session_id}",
+                    'category': 'Customer_QA',
+                    'question': question,
+                    'answer': answer,
+                    'session_id': session_id,
+                    'content': qa_content,
+                    **({'canonical_answer': spoken} if spoken else {})
+                },
+                "data": qa_content
+            }
+            for (vector_id, (question, answer, session_id, qa_content)), embedding, spoken
+            in zip(unique.items(), embeddings, answers)
+        ]
 
         # Upsert to vector database
+        physical_namespace = resolve_namespace(namespace)
         response = vector_client.upsert(
-            vectors=[vector_data],
-            namespace=namespace
+            vectors=vectors,
+            namespace=physical_namespace
         )
 
-        print(f"SUCCESS: Q&A ingested to vector database for session {session_id}")
+        # Keep the lexical index the agent fuses with vector search in step
+        update_lexical_index(physical_namespace, {vector['id']: vector['metadata'] for vector in vectors})
+
+        # Drop cached answers for this namespace in every agent worker
+        bump_namespace_version(namespace)
+
+        print(f"SUCCESS: {len(vectors)} Q&A pairs ingested to namespace '{namespace}' ({len(pairs) - len(vectors)} duplicates skipped)")
         return True
 
     except Exception as e:
@@ -90,7 +144,7 @@ def ingest_qa_to_vector_db(question, answer, session_id):
 
 app = Flask(__name__)
 scheduler = APScheduler()
-db = SessionOperations()
+tenants = get_tenant_registry()
 
 # Load environment variables
 load_dotenv()
@@ -103,70 +157,299 @@ request_resolution_time = int(os.getenv("REQUEST_RESOLUTION_TIME"))
 scheduler_interval = int(os.getenv("SCHEDULER_INTERVAL"))
 print(request_resolution_time, scheduler_interval)
 
+class SessionStore:
+    """
+    One session database the dashboard serves (tenants sharing a db_path share it): its
+    driver, its change feed and the scheduler expiring its PENDING sessions.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.db = SessionOperations(db_path)
+        self.events = SessionEventBroadcaster(self.db, poll_interval=float(os.getenv("SESSION_EVENTS_POLL_INTERVAL", "0.5")))
+        # Expires each PENDING session at its own deadline; fed by the session change feed
+        self.expiry = SessionExpiryScheduler(self.db, request_resolution_time, on_expired=self._sessions_expired)
+        self.events.add_listener(self.expiry.on_session_change)
+
+    def _sessions_expired(self, count):
+        print(f"Marked {count} sessions in {self.db_path} as UNRESOLVED")
+        self.events.notify()
+
+    def start(self):
+        self.events.start()
+        self.expiry.start()
+
+_session_stores = {}
+_session_stores_lock = threading.Lock()
+_background_started = False
+
+def session_store(db_path):
+    """The SessionStore of a database, created (and started with the background work) on first use"""
+    with _session_stores_lock:
+        store = _session_stores.get(db_path)
+        if store is None:
+            store = _session_stores[db_path] = SessionStore(db_path)
+            if _background_started:
+                store.start()
+        return store
+
+def session_stores():
+    """SessionStores of every configured tenant's database; tenants added to the config are picked up"""
+    for db_path in dict.fromkeys(tenant.db_path for tenant in tenants.configured()):
+        session_store(db_path)
+    with _session_stores_lock:
+        return list(_session_stores.values())
+
+def find_tenant(tenant_id=None):
+    """Configured tenant by id (the default tenant if none is given), or None if unknown"""
+    tenant_id = tenant_id or DEFAULT_TENANT_ID
+    return next((tenant for tenant in tenants.configured() if tenant.tenant_id == tenant_id), None)
+
+def start_background_work():
+    """Start the session stores' change feeds and expiry schedulers, the job queue and the bulk expiry job"""
+    global _background_started
+    with _session_stores_lock:
+        _background_started = True
+    for store in session_stores():
+        store.start()
+    jobs.start()
+    scheduler.init_app(app)
+    scheduler.start()
+
 @scheduler.task('interval', id='periodic_task', seconds=scheduler_interval)
 def scheduled_job():
-    print("runs every second")
-    """Task that runs every second"""
-    try:
-        current_time = datetime.now(timezone.utc)
-        pending_sessions = db.get_all_member_sessions("PENDING")
-        updated_count = 0
-        for session in pending_sessions:
-            # Parse the created_at timestamp
-            created_at_str = session.get('created_at')
-            if not created_at_str:
-                continue
-            try:
-                # Parse the timestamp and make it timezone-aware (UTC)
-                created_at = datetime.fromisoformat(created_at_str).replace(tzinfo=timezone.utc)
-
-                # Calculate time difference
-                time_diff = current_time - created_at
-
-                # If more than 60 seconds old, mark as UNRESOLVED
-                if time_diff.total_seconds() > request_resolution_time:
-                    session_id = session.get('session_id')
-                    if session_id:
-                        success = db.update_member_session(session_id, "UNRESOLVED")
-                        if success:
-                            updated_count += 1
-                            print(f"Marked session {session_id} as UNRESOLVED (age: {time_diff.total_seconds():.1f}s)")
-
-            except (ValueError, TypeError) as e:
-                print(f"Error parsing timestamp for session {session.get('session_id', 'unknown')}: {e}")
-                continue
-
-        if updated_count > 0:
-            print(f"Updated {updated_count} sessions to UNRESOLVED at {current_time}")
+    """Bulk fallback for the expiry schedulers: one set-based UPDATE per tenant database of every overdue PENDING session"""
+    for store in session_stores():
+        try:
+            updated_count = store.db.expire_pending_sessions(expiry_cutoff(request_resolution_time))
+            if updated_count > 0:
+                print(f"Updated {updated_count} sessions in {store.db_path} to UNRESOLVED at {datetime.now(timezone.utc)}")
+                store.events.notify()
 
-    except Exception as e:
-        print(f"ERROR in scheduled_job: {e}")
+        except Exception as e:
+            print(f"ERROR in scheduled_job for {store.db_path}: {e}")
+
+def log_follow_up(payload):
+    """Job: log follow-up text to the session-specific log file"""
+    session_id = payload['session_id']
+    log_filename = f"logs/ai_receptionist_{session_id}.log"
+    if not os.path.exists(log_filename):
+        print(f"WARNING: Log file {log_filename} not found")
+        return
+    timestamp = payload['resolved_at']
+    with open(log_filename, "a", encoding="utf-8") as log_file:
+        log_file.write(f"{timestamp} - Follow up text was sent to customer with phone number {payload['phone_number']}\n")
+        log_file.write(f"{timestamp} - Client's Query message: {payload['question']}\n")
+        log_file.write(f"{timestamp} - Follow up message: {payload['answer']}\n")
+    print(f"SUCCESS: Follow-up logged to {log_filename}")
+
+SALON_DATA_FILE = "IngestSalonData/salon_data.txt"
+# Session ids whose Q&A is already in salon_data.txt, one per line, so a re-run job appends nothing
+SALON_DATA_SESSIONS_FILE = "IngestSalonData/salon_data.sessions"
+_salon_data_lock = threading.Lock()
+
+def append_salon_data(payload):
+    """Job: append the Q&A to salon_data.txt, once per session"""
+    session_id = payload['session_id']
+    block = f"\nQ: {payload['question']}\nA: {payload['answer']}\n"
+    with _salon_data_lock:
+        try:
+            with open(SALON_DATA_SESSIONS_FILE, "r", encoding="utf-8") as f:
+                appended = set(f.read().split())
+        except FileNotFoundError:
+            appended = set()
+        if session_id in appended:
+            print(f"INFO: Q&A for session {session_id} already in salon_data.txt")
+            return
+        with open(SALON_DATA_FILE, "r+", encoding="utf-8") as f:
+            # A previous attempt may have appended the block and died before recording the session
+            if not f.read().endswith(block):
+                f.write(block)
+        with open(SALON_DATA_SESSIONS_FILE, "a", encoding="utf-8") as f:
+            f.write(f"{session_id}\n")
+    print(f"SUCCESS: Q&A for session {session_id} appended to salon_data.txt")
+
+def ingest_qa(payloads):
+    """Batch job: ingest resolved Q&A pairs into their tenants' namespaces (raises so the queue retries)"""
+    by_namespace = {}
+    for payload in payloads:
+        # Jobs queued before payloads carried a namespace belong to NAMESPACE
+        by_namespace.setdefault(payload.get('namespace') or os.getenv("NAMESPACE"), []).append(
+            (payload['question'], payload['answer'], payload['session_id'])
+        )
+    failed = [namespace for namespace, pairs in by_namespace.items() if not ingest_qa_batch_to_vector_db(pairs, namespace)]
+    if failed:
+        raise RuntimeError(f"Failed to ingest Q&A pairs into namespaces {failed}")
+
+jobs = JobQueue(
+    workers=int(os.getenv("JOB_WORKERS", "2")),
+    max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "5")),
+    lease_seconds=float(os.getenv("JOB_LEASE_SECONDS", "60"))
+)
+jobs.register('session_log', log_follow_up)
+jobs.register('salon_data', append_salon_data)
+# Resolutions arriving together (a supervisor clearing a backlog) are embedded and upserted as one batch
+jobs.register_batch(
+    'ingest_qa',
+    ingest_qa,
+    batch_size=int(os.getenv("INGEST_BATCH_SIZE", "32")),
+    linger=float(os.getenv("INGEST_BATCH_LINGER", "2.0"))
+)
+
+def _page(template):
+    tenant = find_tenant(request.args.get('tenant'))
+    return render_template(
+        template,
+        tenants=tenants.configured(),
+        tenant_id=tenant.tenant_id if tenant else DEFAULT_TENANT_ID
+    )
 
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return _page('index.html')
 
 @app.route('/resolved')
 def resolved():
-    return render_template('resolved.html')
-
-@app.route('/api/member-sessions')
-def get_member_sessions():
+    return _page('resolved.html')
+
+@app.route('/api/tenants')
+def get_tenants():
+    return jsonify([{'tenant_id': tenant.tenant_id, 'name': tenant.name} for tenant in tenants.configured()])
+
+def _request_store():
+    """SessionStore of the ?tenant= the request is for (the default tenant without one), or None if unknown"""
+    tenant = find_tenant(request.args.get('tenant'))
+    return session_store(tenant.db_path) if tenant else None
+
+def _session_filters():
+    """Phone and created_at range filters shared by the session listing endpoints"""
+    def timestamp(name):
+        value = request.args.get(name)
+        # Accept ISO-8601 from the browser; created_at is stored as 'YYYY-MM-DD HH:MM:SS' UTC
+        return value.replace('T', ' ').rstrip('Z') if value else None
+
+    return {
+        'phone_number': request.args.get('phone') or None,
+        'created_from': timestamp('from'),
+        'created_to': timestamp('to'),
+    }
+
+def _list_sessions(status=None):
+    """
+    Keyset-paginated session listing.
+
+    ?limit=&cursor=  a page of sessions, newest first, plus next_cursor for the next page
+    ?since=<cursor>  only rows changed after a previous response's sync_cursor
+    ?status=, ?phone=, ?from=, ?to=  filters
+    ?tenant=  the tenant whose sessions are listed (the default tenant without one)
+    """
+    store = _request_store()
+    if store is None:
+        return jsonify({'error': 'Unknown tenant'}), 404
+    db = store.db
     try:
-        sessions = db.get_all_member_sessions()
-        print(sessions)
-        return jsonify(sessions)
+        limit = max(1, min(int(request.args.get('limit', 50)), 500))
+        filters = _session_filters()
+
+        since = request.args.get('since')
+        if since is not None:
+            sessions, sync_cursor, has_more = db.get_member_sessions_changed_since(int(since), limit=limit, **filters)
+            return jsonify({'sessions': sessions, 'sync_cursor': sync_cursor, 'has_more': has_more})
+
+        cursor = request.args.get('cursor')
+        # Taken before the page is read so a following ?since= request cannot miss a change
+        sync_cursor = db.get_latest_version()
+        sessions, next_cursor = db.get_member_sessions_page(
+            status=status,
+            cursor=int(cursor) if cursor else None,
+            limit=limit,
+            **filters
+        )
+        return jsonify({'sessions': sessions, 'next_cursor': next_cursor, 'sync_cursor': sync_cursor})
+    except ValueError:
+        return jsonify({'error': 'limit, cursor and since must be integers'}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/member-sessions')
+def get_member_sessions():
+    status = request.args.get('status', '').strip().upper() or None
+    return _list_sessions(status)
+
 @app.route('/api/resolved-sessions')
 def get_resolved_sessions():
+    return _list_sessions("RESOLVED")
+
+def _sse(event, data, event_id=None):
+    message = f"id: {event_id}\n" if event_id is not None else ""
+    return message + f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/session-events')
+def stream_session_events():
+    """
+    Server-Sent Events stream of session changes.
+
+    Each `session` event carries one changed row; its id is the row's version, so a
+    reconnecting EventSource resumes via Last-Event-ID (or ?since=<sync_cursor>) without
+    missing changes. A `resync` event means the client fell behind and should reload.
+    Changes are those of the ?tenant= database (the default tenant's without one).
+    """
+    store = _request_store()
+    if store is None:
+        return jsonify({'error': 'Unknown tenant'}), 404
+    db, session_events = store.db, store.events
     try:
-        sessions = db.get_all_member_sessions("RESOLVED")
-        print(sessions)
-        return jsonify(sessions)
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        since = request.headers.get('Last-Event-ID') or request.args.get('since')
+        since = int(since) if since else None
+    except ValueError:
+        return jsonify({'error': 'since must be an integer'}), 400
+
+    # Subscribe before catching up so nothing written in between is lost
+    subscription = session_events.subscribe()
+
+    def stream():
+        last_version = since
+        try:
+            yield "retry: 3000\n\n"
+            if since is not None:
+                has_more = True
+                while has_more:
+                    sessions, cursor, has_more = db.get_member_sessions_changed_since(last_version)
+                    for session in sessions:
+                        yield _sse('session', session, session['version'])
+                    last_version = cursor
+            while True:
+                try:
+                    session = subscription.get(timeout=15)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if session is None:
+                    yield _sse('resync', {})
+                    return
+                if last_version is not None and session['version'] <= last_version:
+                    continue
+                last_version = session['version']
+                yield _sse('session', session, session['version'])
+        finally:
+            session_events.unsubscribe(subscription)
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/jobs')
+def get_job_counts():
+    return jsonify(jobs.status_counts())
+
+@app.route('/api/jobs/<int:job_id>')
+def get_job(job_id):
+    job = jobs.get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
 
 @app.route('/api/resolve-session', methods=['POST'])
 def resolve_session():
@@ -178,6 +461,10 @@ def resolve_session():
 
         session_id = data.get('session_id')
         answer = data.get('answer')
+        tenant = find_tenant(data.get('tenant'))
+
+        if tenant is None:
+            return jsonify({'error': 'Unknown tenant'}), 404
 
         if not session_id:
             return jsonify({'error': 'session_id is required'}), 400
@@ -185,14 +472,12 @@ def resolve_session():
         if not answer or not answer.strip():
             return jsonify({'error': 'answer is required'}), 400
 
+        store = session_store(tenant.db_path)
+        db, session_events = store.db, store.events
+
         # First, get the current session to retrieve the question
         try:
-            sessions = db.get_all_member_sessions()
-            current_session = None
-            for session in sessions:
-                if session['session_id'] == session_id:
-                    current_session = session
-                    break
+            current_session = db.get_session_by_id(session_id)
 
             if not current_session:
                 return jsonify({'error': 'Session not found'}), 404
@@ -207,38 +492,26 @@ def resolve_session():
         success = db.update_member_session(session_id, "RESOLVED", answer=answer.strip())
 
         if success:
-            # Log follow-up text to session-specific log file
-            try:
-                log_filename = f"logs/ai_receptionist_{session_id}.log"
-                if os.path.exists(log_filename):
-                    with open(log_filename, "a", encoding="utf-8") as log_file:
-                        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        log_file.write(f"{timestamp} - Follow up text was sent to customer with phone number {current_session['phone_number']}\n")
-                        log_file.write(f"{timestamp} - Client's Query message: {question.strip()}\n")
-                        log_file.write(f"{timestamp} - Follow up message: {answer.strip()}\n")
-                    print(f"SUCCESS: Follow-up logged to {log_filename}")
-                else:
-                    print(f"WARNING: Log file {log_filename} not found")
-            except Exception as e:
-                print(f"WARNING: Failed to log follow-up to session log file: {e}")
-            # Append Q&A to salon_data.txt
-            if question and question.strip():
-                try:
-                    with open("IngestSalonData/salon_data.txt", "a", encoding="utf-8") as f:
-                        f.write(f"\nQ: {question.strip()}\nA: {answer.strip()}\n")
-                    print(f"SUCCESS: Q&A for session {session_id} appended to salon_data.txt")
-                except Exception as e:
-                    print(f"WARNING: Failed to append Q&A to salon_data.txt: {e}")
-
-            # Ingest Q&A into vector database
-            if question and question.strip():
-                vector_success = ingest_qa_to_vector_db(question.strip(), answer.strip(), session_id)
-                if vector_success:
-                    print(f"SUCCESS: Q&A for session {session_id} ingested into vector database")
-                else:
-                    print(f"WARNING: Failed to ingest Q&A for session {session_id} into vector database")
-
-            return jsonify({'message': 'Session resolved successfully'})
+            session_events.notify()
+
+            # Follow-up logging and knowledge base updates run on the background job queue
+            payload = {
+                'tenant_id': tenant.tenant_id,
+                'namespace': tenant.namespace,
+                'session_id': session_id,
+                'phone_number': current_session['phone_number'],
+                'question': question.strip() if question else '',
+                'answer': answer.strip(),
+                'resolved_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            }
+            job_ids = [jobs.enqueue('session_log', payload)]
+            if payload['question']:
+                # salon_data.txt is NAMESPACE's source file; other tenants' Q&A lives in their own namespace only
+                if tenant.namespace == os.getenv("NAMESPACE"):
+                    job_ids.append(jobs.enqueue('salon_data', payload))
+                job_ids.append(jobs.enqueue('ingest_qa', payload))
+
+            return jsonify({'message': 'Session resolved successfully', 'jobs': job_ids})
         else:
             return jsonify({'error': 'Session not found or could not be updated'}), 404
 
@@ -247,6 +520,8 @@ def resolve_session():
         return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
-    scheduler.init_app(app)
-    scheduler.start()
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    debug = True
+    # With the debug reloader the parent only watches files; background work runs in the serving child
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_work()
+    app.run(debug=debug, host='0.0.0.0', port=5000, threaded=True)
\ No newline at end of file
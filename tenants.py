@@ -0,0 +1,213 @@
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+
+from dbDrivers.session_operations import SessionOperations
+from query_cache import drop_query_cache
+from utils import AGENT_INSTRUCTION, SESSION_INSTRUCTION, GREETING_MESSAGE, FORMATTER_SYSTEM_MESSAGE
+
+# Tenant definitions: {"tenants": {"<tenant_id>": {"name": ..., "namespace": ..., "phone_numbers": [...], ...}}}
+TENANTS_FILE = os.getenv(
+    "TENANTS_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "tenants.json")
+)
+DEFAULT_TENANT_ID = "default"
+TENANT_OPTIONS = ("agent_instruction", "session_instruction", "greeting", "formatter_instruction", "db_path", "phone_numbers")
+
+
+def normalize_phone_number(number: Optional[str]) -> str:
+    """Keep only digits and a leading '+', so '+1 (555) 010-0000' and '+15550100000' match"""
+    if not number:
+        return ""
+    number = number.strip()
+    if number.startswith("sip:"):
+        number = number[4:].split("@", 1)[0]
+    return re.sub(r"(?!^\+)[^\d]", "", number)
+
+
+@dataclass
+class Tenant:
+    """One salon served by the worker: its knowledge base, prompts and session database"""
+    tenant_id: str
+    name: str
+    namespace: Optional[str]
+    agent_instruction: str = AGENT_INSTRUCTION
+    session_instruction: str = SESSION_INSTRUCTION
+    greeting: str = GREETING_MESSAGE
+    formatter_instruction: str = FORMATTER_SYSTEM_MESSAGE
+    db_path: str = "members.db"
+    phone_numbers: list = field(default_factory=list)
+    sessions: Optional[SessionOperations] = field(default=None, repr=False)
+
+
+class TenantRegistry:
+    """
+    Resolves calls to tenants and keeps the most recently used ones loaded.
+
+    Tenant configs are read from TENANTS_FILE (re-read when it changes); only tenants
+    whose config changed or was removed are unloaded, to be rebuilt on their next call.
+    A loaded tenant holds its SessionOperations (shared by tenants on the same db_path)
+    and its query cache; at most max_tenants stay loaded. An LRU eviction drops the query
+    cache once no other loaded tenant uses it and closes database pools no loaded tenant
+    uses; a config change never closes a pool, since calls in progress may hold it.
+    Unknown tenants and a missing file fall back to the default tenant built from
+    NAMESPACE and utils' prompts.
+    """
+
+    def __init__(self, config_path: str = TENANTS_FILE, max_tenants: int = 128):
+        self.config_path = config_path
+        self.max_tenants = max_tenants
+        self._tenants: "OrderedDict[str, Tenant]" = OrderedDict()
+        self._drivers: dict[str, SessionOperations] = {}
+        self._configs: dict = {}
+        self._numbers: dict = {}
+        self._config_mtime = None
+        self._lock = threading.RLock()
+        self.loads = 0
+        self.evictions = 0
+
+    def _refresh_config(self):
+        """Re-read the tenants file if it changed; loaded tenants are rebuilt from the new config"""
+        try:
+            mtime = os.stat(self.config_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._config_mtime:
+            return
+        self._config_mtime = mtime
+
+        configs = {}
+        if mtime is not None:
+            try:
+                with open(self.config_path, "r", encoding="utf-8") as f:
+                    configs = json.load(f).get("tenants", {})
+            except (OSError, json.JSONDecodeError) as e:
+                logging.error(f"Failed to read tenants file {self.config_path}: {e}")
+                return
+        previous, self._configs = self._configs, configs
+        self._numbers = {
+            normalize_phone_number(number): tenant_id
+            for tenant_id, config in configs.items()
+            for number in config.get("phone_numbers", [])
+        }
+        changed = [tenant_id for tenant_id in self._tenants if previous.get(tenant_id) != configs.get(tenant_id)]
+        for tenant_id in changed:
+            self._evict(tenant_id, close_drivers=False)
+        logging.info(f"Loaded {len(configs)} tenant configs from {self.config_path} ({len(changed)} loaded tenants changed)")
+
+    def _from_config(self, tenant_id: str) -> Tenant:
+        config = self._configs.get(tenant_id)
+        if config is None:
+            return Tenant(tenant_id=DEFAULT_TENANT_ID, name="Default", namespace=os.getenv("NAMESPACE"))
+        options = {key: config[key] for key in TENANT_OPTIONS if key in config}
+        return Tenant(
+            tenant_id=tenant_id,
+            name=config.get("name", tenant_id),
+            namespace=config.get("namespace", tenant_id),
+            **options
+        )
+
+    def _build(self, tenant_id: str) -> Tenant:
+        tenant = self._from_config(tenant_id)
+        driver = self._drivers.get(tenant.db_path)
+        if driver is None:
+            driver = SessionOperations(tenant.db_path)
+            self._drivers[tenant.db_path] = driver
+        tenant.sessions = driver
+        return tenant
+
+    def _evict(self, tenant_id: str, close_drivers: bool = True):
+        tenant = self._tenants.pop(tenant_id)
+        self.evictions += 1
+        if close_drivers:
+            # Also closes pools left behind by tenants unloaded on a config change
+            in_use = {other.db_path for other in self._tenants.values()}
+            for db_path in [db_path for db_path in self._drivers if db_path not in in_use]:
+                self._drivers.pop(db_path).close()
+        if not any(other.namespace == tenant.namespace for other in self._tenants.values()):
+            drop_query_cache(tenant.namespace)
+
+    def get(self, tenant_id: Optional[str] = None) -> Tenant:
+        """Return a loaded tenant, loading it (and evicting the least recently used) on a miss"""
+        with self._lock:
+            self._refresh_config()
+            tenant_id = tenant_id if tenant_id in self._configs else DEFAULT_TENANT_ID
+            tenant = self._tenants.get(tenant_id)
+            if tenant is not None:
+                self._tenants.move_to_end(tenant_id)
+                return tenant
+
+            tenant = self._build(tenant_id)
+            self._tenants[tenant_id] = tenant
+            self.loads += 1
+            while len(self._tenants) > self.max_tenants:
+                self._evict(next(iter(self._tenants)))
+            return tenant
+
+    def resolve(self, metadata: Optional[str] = None, dialed_number: Optional[str] = None) -> Tenant:
+        """
+        Pick the tenant for a call: an explicit "tenant_id" in the job/room metadata, then
+        the dialed number (from the SIP participant or a "dialed_number" metadata field).
+        """
+        tenant_id = None
+        try:
+            data = json.loads(metadata) if metadata else {}
+        except json.JSONDecodeError:
+            data = {}
+        if isinstance(data, dict):
+            tenant_id = data.get("tenant_id")
+            dialed_number = dialed_number or data.get("dialed_number")
+
+        with self._lock:
+            self._refresh_config()
+            if tenant_id not in self._configs and dialed_number:
+                tenant_id = self._numbers.get(normalize_phone_number(dialed_number), tenant_id)
+        if tenant_id not in self._configs:
+            logging.info(f"No tenant configured for metadata={metadata!r} dialed_number={dialed_number!r}, using default")
+        return self.get(tenant_id)
+
+    def formatter_instruction(self, namespace: Optional[str]) -> str:
+        """Formatter persona of the tenant serving `namespace`, without loading the tenant"""
+        with self._lock:
+            self._refresh_config()
+            for tenant_id, config in self._configs.items():
+                if config.get("namespace", tenant_id) == namespace:
+                    return config.get("formatter_instruction", FORMATTER_SYSTEM_MESSAGE)
+        return FORMATTER_SYSTEM_MESSAGE
+
+    def configured(self) -> list:
+        """Every configured tenant (and the default), without loading them or opening their databases"""
+        with self._lock:
+            self._refresh_config()
+            tenant_ids = list(self._configs)
+            if DEFAULT_TENANT_ID not in self._configs:
+                tenant_ids.append(DEFAULT_TENANT_ID)
+            return [self._from_config(tenant_id) for tenant_id in tenant_ids]
+
+    def loaded(self) -> list:
+        """Currently loaded tenants, least recently used first"""
+        with self._lock:
+            return list(self._tenants.values())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._tenants)
+
+
+_registry: Optional[TenantRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_tenant_registry() -> TenantRegistry:
+    """Return the process-wide tenant registry (TENANT_CACHE_SIZE tenants kept loaded)"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = TenantRegistry(max_tenants=int(os.getenv("TENANT_CACHE_SIZE", "128")))
+    return _registry
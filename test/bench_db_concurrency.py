@@ -0,0 +1,105 @@
+"""
+Benchmark: members.db under concurrent calls and dashboard polling.
+
+N simulated calls each insert a session and then append questions (the
+text_supervisor write path) while a dashboard thread keeps polling
+get_all_member_sessions(). Runs once with the previous driver behaviour
+(a new rollback-journal connection per operation) and once with the pooled
+WAL driver, reporting write/read latency percentiles and lock errors.
+
+Usage:
+    python test/bench_db_concurrency.py [calls] [questions_per_call]
+"""
+import sys
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import statistics
+from contextlib import contextmanager
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dbDrivers.session_operations import SessionOperations
+
+
+class LegacySessionOperations(SessionOperations):
+    """The previous driver: one rollback-journal connection per operation, default timeout"""
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=DELETE")
+        return conn
+
+    @contextmanager
+    def _get_connection(self):
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct))] if samples else 0.0
+
+
+def run(driver_cls, calls, questions):
+    db_path = os.path.join(tempfile.mkdtemp(), "members.db")
+    db = driver_cls(db_path)
+    write_ms, read_ms, failures = [], [], []
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def call(i):
+        session_id = f"call-{i}"
+        start = time.perf_counter()
+        ok = db.add_member_session(f"+1555{i:04d}", session_id)
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            write_ms.append(elapsed)
+            if not ok:
+                failures.append(session_id)
+        for q in range(questions):
+            start = time.perf_counter()
+            ok = db.update_member_session(session_id, "PENDING", question=f"question {q}")
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                write_ms.append(elapsed)
+                if not ok:
+                    failures.append(session_id)
+
+    def dashboard():
+        while not done.is_set():
+            start = time.perf_counter()
+            try:
+                db.get_all_member_sessions()
+            except sqlite3.OperationalError:
+                failures.append("dashboard")
+            read_ms.append((time.perf_counter() - start) * 1000)
+
+    poller = threading.Thread(target=dashboard)
+    poller.start()
+    start = time.perf_counter()
+    workers = [threading.Thread(target=call, args=(i,)) for i in range(calls)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    poller.join()
+
+    print(f"{driver_cls.__name__:<26} wall={elapsed * 1000:8.1f}ms  "
+          f"write p50={statistics.median(write_ms):6.2f}ms p99={percentile(write_ms, 0.99):7.2f}ms  "
+          f"dashboard polls={len(read_ms):5d} p99={percentile(read_ms, 0.99):7.2f}ms  "
+          f"failures={len(failures)}")
+
+
+if __name__ == "__main__":
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    questions = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    print(f"=== MEMBERS.DB CONCURRENCY: {calls} calls x {questions} questions + dashboard polling ===")
+    run(LegacySessionOperations, calls, questions)
+    run(SessionOperations, calls, questions)
@@ -0,0 +1,69 @@
+"""
+Benchmark: query embedding latency per backend.
+
+Compares the HuggingFace Inference API (needs HUGGINGFACE_API_KEY) with the
+in-process local model and, if `optimum[onnxruntime]` is installed, its ONNX
+variant. Model load time is reported separately from per-query latency.
+
+Usage:
+    python test/bench_embedding_backends.py [iterations] [backend ...]
+"""
+import asyncio
+import sys
+import os
+import time
+import statistics
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from embeddings import create_embedding_backend
+
+QUERIES = [
+    "What are your opening hours?",
+    "How much is a haircut?",
+    "What is the phone number of your salon?",
+    "Do you offer hot stone massages?",
+    "What is your cancellation policy?",
+]
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct))]
+
+
+async def bench_backend(name, iterations):
+    backend = create_embedding_backend(name)
+
+    start = time.perf_counter()
+    try:
+        await backend.embed("warm up")
+    except Exception as e:
+        print(f"{name:<12} skipped: {e}")
+        return
+    first_call_ms = (time.perf_counter() - start) * 1000
+
+    latencies = []
+    for i in range(iterations):
+        query = QUERIES[i % len(QUERIES)]
+        start = time.perf_counter()
+        await backend.embed(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    print(f"{backend.name:<12} first={first_call_ms:9.1f}ms  "
+          f"p50={statistics.median(latencies):7.2f}ms  "
+          f"p95={percentile(latencies, 0.95):7.2f}ms  "
+          f"max={max(latencies):7.2f}ms")
+
+
+async def main(iterations, backends):
+    print(f"=== EMBEDDING BACKENDS: {iterations} queries each ===")
+    for name in backends:
+        await bench_backend(name, iterations)
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    backends = sys.argv[2:] or ["huggingface", "local", "onnx"]
+    asyncio.run(main(iterations, backends))
@@ -0,0 +1,112 @@
+"""
+Benchmark: event-loop lag while concurrent query_knowledge_base calls run.
+
+Compares the old blocking lookup path (sync HTTP, sync Upstash, sync Groq called
+inline from the async tool) with the async pipeline used by tools.py. External
+services are replaced by stand-ins with a fixed simulated latency so the
+benchmark runs without credentials.
+
+Usage:
+    python test/bench_event_loop_lag.py [concurrency] [service_latency_ms]
+"""
+import asyncio
+import sys
+import os
+import time
+import statistics
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tools
+from query_cache import QueryCache
+
+EMBEDDING_DIM = 384
+
+
+class MockRunContext:
+    pass
+
+
+class FakeResult:
+    def __init__(self, score, content):
+        self.id = content
+        self.score = score
+        self.metadata = {'content': content, 'category': 'Hours', 'title': 'Hours'}
+
+
+def install_async_fakes(latency):
+    """Replace the network calls used by tools.query_knowledge_base with async stand-ins"""
+    class FakeEmbedder:
+        async def embed(self, text):
+            await asyncio.sleep(latency)
+            return [0.1] * EMBEDDING_DIM
+
+    class FakeVectorStore:
+        async def query_async(self, vector, **kwargs):
+            await asyncio.sleep(latency)
+            return [FakeResult(0.9, "We are open 9am to 7pm.")]
+
+    async def fake_formatter(vectorstore_text, user_query, **kwargs):
+        await asyncio.sleep(latency)
+        return "We are open from 9am to 7pm."
+
+    tools.get_embedder = FakeEmbedder
+    tools.get_vector_store = FakeVectorStore
+    tools.format_response_with_ai_async = fake_formatter
+    # Every lookup must reach the stand-in services, so keep the answer cache empty
+    tools.get_query_cache = lambda namespace=None: QueryCache(max_entries=0)
+
+
+async def blocking_lookup(query, latency):
+    """Reproduces the previous tool body: three sync network calls inline in a coroutine"""
+    time.sleep(latency)  # requests.post to HuggingFace
+    time.sleep(latency)  # Index.query
+    time.sleep(latency)  # Groq chat completion
+    return "We are open from 9am to 7pm."
+
+
+async def async_lookup(query, latency):
+    return await tools.query_knowledge_base(MockRunContext(), query)
+
+
+async def measure_lag(lookup, concurrency, latency, tick=0.01):
+    """Run `concurrency` lookups while a ticker records how late each wake-up is"""
+    lags = []
+    stop = asyncio.Event()
+
+    async def ticker():
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(tick)
+            lags.append((time.perf_counter() - start - tick) * 1000)
+
+    ticker_task = asyncio.create_task(ticker())
+    await asyncio.sleep(tick * 2)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(lookup(f"What are your hours? {i}", latency) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await ticker_task
+    return elapsed, lags
+
+
+def report(name, elapsed, lags):
+    lags = sorted(lags)
+    p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))]
+    print(f"{name:<10} wall={elapsed * 1000:8.1f}ms  "
+          f"lag mean={statistics.mean(lags):7.2f}ms  p99={p99:7.2f}ms  max={lags[-1]:7.2f}ms")
+
+
+async def main(concurrency, latency):
+    install_async_fakes(latency)
+    print(f"=== EVENT LOOP LAG: {concurrency} concurrent lookups, {latency * 1000:.0f}ms per service call ===")
+    for name, lookup in (("blocking", blocking_lookup), ("async", async_lookup)):
+        elapsed, lags = await measure_lag(lookup, concurrency, latency)
+        report(name, elapsed, lags)
+
+
+if __name__ == "__main__":
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 50
+    asyncio.run(main(concurrency, latency_ms / 1000))
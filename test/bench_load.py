@@ -0,0 +1,454 @@
+"""
+Load test: concurrent calls against stand-in embedding, vector and LLM services.
+
+Starts three processes besides this one:
+- fake services: HuggingFace Inference (embeddings), Upstash Vector (query) and
+  Groq (chat completions) on one local HTTP server, each with its own latency,
+  jitter and injected failure rate
+- the Flask server (server.py) on a scratch members.db
+- a dashboard load generator: pollers listing /api/member-sessions and
+  supervisors resolving PENDING sessions through /api/resolve-session
+
+This process plays one agent worker: N concurrent calls each register a session
+and ask questions through tools.query_knowledge_base, escalating to
+tools.text_supervisor when the knowledge base has no answer, exactly as the
+agent LLM would. The real clients, query cache, session writer and database
+drivers are used; only the remote services are stand-ins, so the run needs no
+credentials.
+
+Fake embeddings are hashed bags of words, so a question scores high against the
+FAQ entry it was derived from and low against everything else: pool questions
+are answered, off-topic questions escalate, and the query cache sees realistic
+repeats. Server job workers are not started (their jobs write to the repo
+tree); resolutions still enqueue them.
+
+Reports throughput, per-tool and per-stage tail latency, event-loop lag for the
+worker, and request latency for the Flask server.
+
+Usage:
+    python test/bench_load.py [--sessions 20] [--turns 4] [--embed-ms 60] [--vector-ms 30]
+                              [--llm-ms 250] [--llm-fail 0.05] [--pollers 2] [--resolvers 1]
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import multiprocessing
+import os
+import random
+import re
+import socket
+import sys
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from latency_metrics import Histogram
+
+EMBEDDING_DIM = 384
+
+# The stand-in knowledge base: question the entry answers, and its content
+FAQ = [
+    ("What are your opening hours?", "Hours", "We are open Monday to Saturday from 9am to 7pm and closed on Sundays."),
+    ("How much does a haircut cost?", "Pricing", "Haircuts start at $45 for short hair and $65 for long hair."),
+    ("Do you offer facials?", "Services", "We offer classic, hydrating and anti-aging facials from $80."),
+    ("Where is the salon located?", "Location", "We are at 123 Main Street, next to the public library."),
+    ("What is your cancellation policy?", "Policies", "Please cancel at least 24 hours ahead to avoid a $20 fee."),
+    ("Do you do manicures and pedicures?", "Services", "Manicures are $30 and pedicures are $45, or $70 together."),
+    ("Is there parking available?", "Location", "Free parking is available behind the building."),
+    ("Can I buy a gift card?", "Gift cards", "Gift cards are sold at the front desk and online in any amount."),
+]
+# Questions the knowledge base cannot answer; these escalate to the supervisor
+UNKNOWN_QUESTIONS = [
+    "Do you groom dogs on weekends?",
+    "Can my band rehearse in the back room?",
+    "Will you sponsor the marathon next month?",
+    "Is the owner hiring a plumber?",
+]
+
+
+# ---- fake services ----
+
+@lru_cache(maxsize=4096)
+def _token_vector(token):
+    rng = random.Random(hashlib.sha256(token.encode("utf-8")).digest())
+    return [rng.gauss(0.0, 1.0) for _ in range(EMBEDDING_DIM)]
+
+
+def fake_embedding(text):
+    """Normalized sum of per-token random vectors: cosine similarity tracks shared words"""
+    vector = [0.0] * EMBEDDING_DIM
+    for token in re.findall(r"[a-z0-9]+", text.lower()):
+        for i, value in enumerate(_token_vector(token)):
+            vector[i] += value
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+class ServiceProfile:
+    """Latency (uniform +/- jitter around latency_ms) and failure rate of one stand-in service"""
+
+    def __init__(self, latency_ms, jitter, failure_rate):
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+
+    def delay(self):
+        return max(0.0, self.latency_ms * random.uniform(1 - self.jitter, 1 + self.jitter)) / 1000
+
+
+class FakeServiceHandler(BaseHTTPRequestHandler):
+    """/hf/models/<model>, /upstash/query[/<namespace>] and /groq/openai/v1/chat/completions"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        service = self.path.strip("/").split("/", 1)[0]
+        profile = self.server.profiles.get(service)
+        if profile is None:
+            return self._send(404, {"error": f"unknown service {self.path}"})
+
+        time.sleep(profile.delay())
+        failed = random.random() < profile.failure_rate
+        with self.server.stats_lock:
+            self.server.stats[f"{service}_requests"] += 1
+            self.server.stats[f"{service}_failures"] += failed
+        if failed:
+            return self._send(503, {"error": f"injected {service} failure"})
+
+        if service == "hf":
+            return self._send(200, fake_embedding(payload.get("inputs", "")))
+        if service == "upstash":
+            return self._send(200, {"result": self._query(payload)})
+        return self._send(200, self._completion(payload))
+
+    def do_GET(self):
+        with self.server.stats_lock:
+            self._send(200, dict(self.server.stats))
+
+    def _query(self, payload):
+        vector = payload.get("vector") or []
+        scored = []
+        for doc_id, (embedding, title, category, content) in self.server.documents.items():
+            cosine = sum(a * b for a, b in zip(vector, embedding))
+            # Upstash reports cosine similarity normalized to [0, 1]
+            scored.append({
+                "id": doc_id,
+                "score": (1 + cosine) / 2,
+                "metadata": {"title": title, "category": category, "content": content},
+            })
+        scored.sort(key=lambda match: -match["score"])
+        return scored[:payload.get("topK", 3)]
+
+    def _completion(self, payload):
+        prompt = payload.get("messages", [{}])[-1].get("content", "")
+        found = re.search(r"<salon_information>\s*(.*?)\s*</salon_information>", prompt, re.S)
+        info = found.group(1).split("\n")[0] if found else "How can I help you today?"
+        return {
+            "id": "chatcmpl-load",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": f"Happy to help! {info}"},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_fake_services(port, profiles, ready):
+    httpd = ThreadingHTTPServer(("127.0.0.1", port), FakeServiceHandler)
+    httpd.daemon_threads = True
+    httpd.profiles = profiles
+    httpd.stats = {f"{service}_{kind}": 0 for service in profiles for kind in ("requests", "failures")}
+    httpd.stats_lock = threading.Lock()
+    httpd.documents = {
+        f"faq-{i}": (fake_embedding(question), question, category, content)
+        for i, (question, category, content) in enumerate(FAQ)
+    }
+    ready.set()
+    httpd.serve_forever()
+
+
+# ---- Flask server and dashboard traffic ----
+
+def run_flask_server(port, workdir, ready):
+    """server.py on the scratch directory's members.db (expiry and SSE threads on, job workers off)"""
+    os.chdir(workdir)
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    import server
+    from werkzeug.serving import make_server
+    server.session_events.start()
+    server.session_expiry.start()
+    httpd = make_server("127.0.0.1", port, server.app, threaded=True)
+    ready.set()
+    httpd.serve_forever()
+
+
+def run_dashboard_load(base_url, pollers, resolvers, poll_interval, stop, results):
+    """Poll the session list and resolve PENDING sessions until `stop` is set; report latencies"""
+    import requests
+
+    histograms = {"list_sessions": Histogram(), "resolve_session": Histogram()}
+    counts = {"list_sessions_errors": 0, "resolve_session_errors": 0, "resolved": 0}
+    lock = threading.Lock()
+
+    def timed(name, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = method(base_url + path, timeout=30, **kwargs)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            response, ok = None, False
+        with lock:
+            histograms[name].observe((time.perf_counter() - start) * 1000)
+            if not ok:
+                counts[f"{name}_errors"] += 1
+        return response if ok else None
+
+    def poller():
+        http = requests.Session()
+        while not stop.is_set():
+            timed("list_sessions", http.get, "/api/member-sessions", params={"limit": 50})
+            stop.wait(poll_interval)
+
+    def resolver():
+        http = requests.Session()
+        while not stop.is_set():
+            response = timed("list_sessions", http.get, "/api/member-sessions", params={"status": "PENDING", "limit": 20})
+            for session in (response.json().get("sessions", []) if response is not None else []):
+                if timed("resolve_session", http.post, "/api/resolve-session",
+                         json={"session_id": session["session_id"], "answer": "The supervisor will call you back."}):
+                    with lock:
+                        counts["resolved"] += 1
+            stop.wait(poll_interval)
+
+    threads = [threading.Thread(target=poller) for _ in range(pollers)]
+    threads += [threading.Thread(target=resolver) for _ in range(resolvers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put({"histograms": {name: h.summary() for name, h in histograms.items()}, **counts})
+
+
+# ---- agent worker ----
+
+class SimulatedRunContext:
+    pass
+
+
+async def run_agent_worker(args):
+    """N concurrent calls on this process's event loop, with an event-loop lag ticker"""
+    # Imported here: the tools read their configuration from the environment at import time
+    import tools
+    import utils
+    from dbDrivers.session_writer import get_session_writer
+    from latency_metrics import registry
+    from tenants import get_tenant_registry
+
+    utils.HF_INFERENCE_URL = os.environ["LOAD_TEST_SERVICES_URL"] + "/hf/models/{model_name}"
+    tenant = get_tenant_registry().get()
+    writer = get_session_writer(tenant.sessions)
+    rng = random.Random(args.seed)
+
+    tool_latency = {"query_knowledge_base": Histogram(), "text_supervisor": Histogram()}
+    outcomes = {"answered": 0, "formatter_fallback": 0, "escalated": 0, "errors": 0}
+    lags = Histogram()
+    stop = asyncio.Event()
+
+    def question(call, turn):
+        if rng.random() < args.unknown_rate:
+            return rng.choice(UNKNOWN_QUESTIONS)
+        asked = rng.choice(FAQ)[0]
+        # Repeats are what the exact query cache is for; the rest are asked in the caller's own words
+        return asked if rng.random() < args.repeat_rate else f"{asked} (call {call}, turn {turn})"
+
+    async def timed(name, tool, context, query):
+        start = time.perf_counter()
+        try:
+            return await tool(context, query)
+        finally:
+            tool_latency[name].observe((time.perf_counter() - start) * 1000)
+
+    async def call(i):
+        await asyncio.sleep(rng.uniform(0, args.ramp_ms / 1000))
+        session_id = f"load-{i}"
+        phone_number = f"+1555{i:07d}"
+        await writer.add_member_session(phone_number, session_id)
+        context = SimulatedRunContext()
+        context.userdata = tools.CallState(tenant=tenant, session_id=session_id, phone_number=phone_number)
+        for turn in range(args.turns):
+            await asyncio.sleep(rng.uniform(0.5, 1.5) * args.think_ms / 1000)
+            query = question(i, turn)
+            try:
+                answer = await timed("query_knowledge_base", tools.query_knowledge_base, context, query)
+                if answer == tools.NO_RELEVANT_INFORMATION:
+                    # What the agent LLM does with this reply
+                    await timed("text_supervisor", tools.text_supervisor, context, query)
+                    outcomes["escalated"] += 1
+                elif answer == utils.FORMATTER_FALLBACK_RESPONSE:
+                    outcomes["formatter_fallback"] += 1
+                else:
+                    outcomes["answered"] += 1
+            except Exception:
+                outcomes["errors"] += 1
+
+    async def ticker(tick=0.01):
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(tick)
+            lags.observe((time.perf_counter() - start - tick) * 1000)
+
+    ticker_task = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    await asyncio.gather(*(call(i) for i in range(args.sessions)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker_task
+
+    stages = {stage: registry.stage_summary(stage)
+              for stage in ("embedding", "vector_query", "lexical_query", "llm_format", "db_write")}
+    return elapsed, tool_latency, outcomes, lags, stages
+
+
+# ---- report ----
+
+def format_summary(name, summary, elapsed=None):
+    rate = f"  {summary['count'] / elapsed:7.1f}/s" if elapsed else ""
+    return (f"  {name:<22} n={summary['count']:<6}{rate}  p50={summary['p50_ms']:8.1f}ms  "
+            f"p95={summary['p95_ms']:8.1f}ms  p99={summary['p99_ms']:8.1f}ms  max={summary['max_ms']:8.1f}ms")
+
+
+def report(args, elapsed, tool_latency, outcomes, lags, stages, dashboard, services):
+    turns = sum(outcomes.values())
+    print(f"=== LOAD TEST: {args.sessions} calls x {args.turns} turns, {args.pollers} pollers, "
+          f"{args.resolvers} resolvers, {elapsed:.1f}s ===")
+    print(f"Agent worker: {turns / elapsed:.1f} turns/s  " + "  ".join(f"{k}={v}" for k, v in outcomes.items()))
+    for name, histogram in tool_latency.items():
+        print(format_summary(name, histogram.summary(), elapsed))
+    print("Stages (latency_metrics spans):")
+    for stage, summary in stages.items():
+        if summary["count"]:
+            print(format_summary(stage, summary))
+    print("Event loop lag:")
+    print(format_summary("lag", lags.summary()))
+    print(f"Flask server: resolved={dashboard['resolved']}  list errors={dashboard['list_sessions_errors']}  "
+          f"resolve errors={dashboard['resolve_session_errors']}")
+    for name, summary in dashboard["histograms"].items():
+        print(format_summary(name, summary, elapsed))
+    print("Fake services: " + "  ".join(f"{k}={v}" for k, v in services.items()))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load-test the agent tools and the Flask server against fake services")
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent calls")
+    parser.add_argument("--turns", type=int, default=4, help="questions per call")
+    parser.add_argument("--think-ms", type=float, default=200, help="mean pause before each question")
+    parser.add_argument("--ramp-ms", type=float, default=1000, help="calls start spread over this window")
+    parser.add_argument("--unknown-rate", type=float, default=0.2, help="share of questions the KB cannot answer")
+    parser.add_argument("--repeat-rate", type=float, default=0.3, help="share of questions asked verbatim (cacheable)")
+    for service, latency in (("embed", 60), ("vector", 30), ("llm", 250)):
+        parser.add_argument(f"--{service}-ms", type=float, default=latency, help=f"{service} service latency")
+        parser.add_argument(f"--{service}-fail", type=float, default=0.0, help=f"{service} failure rate")
+    parser.add_argument("--jitter", type=float, default=0.3, help="latency varies uniformly by +/- this fraction")
+    parser.add_argument("--pollers", type=int, default=2, help="dashboard tabs polling the session list")
+    parser.add_argument("--resolvers", type=int, default=1, help="supervisors resolving PENDING sessions")
+    parser.add_argument("--poll-interval-ms", type=float, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix="load-test-")
+    services_port, server_port = free_port(), free_port()
+    services_url = f"http://127.0.0.1:{services_port}"
+    # Inherited by the spawned server process and read by this process's imports
+    os.environ.update({
+        "LOAD_TEST_SERVICES_URL": services_url,
+        "EMBEDDING_BACKEND": "huggingface",
+        "HUGGINGFACE_API_KEY": "load-test",
+        "VECTOR_BACKEND": "upstash",
+        "UPSTASH_VECTOR_REST_URL": f"{services_url}/upstash",
+        "UPSTASH_VECTOR_REST_TOKEN": "load-test",
+        "GROQ_API_KEY": "load-test",
+        "GROQ_BASE_URL": f"{services_url}/groq",
+        "NAMESPACE": "load-test",
+        "KB_RESPONSE_MODE": "format",
+        "KB_PREFETCH": "off",
+        "TENANTS_FILE": os.path.join(workdir, "tenants.json"),
+        "LEXICAL_INDEX_DIR": os.path.join(workdir, "lexical_index"),
+        "KB_ALIAS_DIR": os.path.join(workdir, "aliases"),
+        "KB_VERSION_DIR": os.path.join(workdir, "versions"),
+        "REQUEST_RESOLUTION_TIME": os.getenv("REQUEST_RESOLUTION_TIME", "600"),
+        "SCHEDULER_INTERVAL": os.getenv("SCHEDULER_INTERVAL", "60"),
+    })
+    logging.disable(logging.CRITICAL)
+
+    spawn = multiprocessing.get_context("spawn")
+    profiles = {
+        "hf": ServiceProfile(args.embed_ms, args.jitter, args.embed_fail),
+        "upstash": ServiceProfile(args.vector_ms, args.jitter, args.vector_fail),
+        "groq": ServiceProfile(args.llm_ms, args.jitter, args.llm_fail),
+    }
+    services_ready, server_ready, stop = spawn.Event(), spawn.Event(), spawn.Event()
+    dashboard_results = spawn.Queue()
+    processes = [
+        spawn.Process(target=run_fake_services, args=(services_port, profiles, services_ready), daemon=True),
+        spawn.Process(target=run_flask_server, args=(server_port, workdir, server_ready), daemon=True),
+    ]
+    for process in processes:
+        process.start()
+    if not services_ready.wait(30) or not server_ready.wait(120):
+        sys.exit("ERROR: fake services or Flask server did not start")
+
+    dashboard = spawn.Process(
+        target=run_dashboard_load,
+        args=(f"http://127.0.0.1:{server_port}", args.pollers, args.resolvers,
+              args.poll_interval_ms / 1000, stop, dashboard_results),
+        daemon=True
+    )
+    dashboard.start()
+
+    os.chdir(workdir)
+    elapsed, tool_latency, outcomes, lags, stages = asyncio.run(run_agent_worker(args))
+
+    stop.set()
+    dashboard_summary = dashboard_results.get(timeout=60)
+    import requests
+    services = requests.get(f"{services_url}/stats", timeout=10).json()
+    for process in processes + [dashboard]:
+        process.terminate()
+
+    report(args, elapsed, tool_latency, outcomes, lags, stages, dashboard_summary, services)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clients import ClientRegistry, get_clients
+
+
+def test_get_clients_returns_process_singleton():
+    assert get_clients() is get_clients()
+
+
+def test_sync_clients_are_reused():
+    registry = ClientRegistry()
+    assert registry.http_session is registry.http_session
+    assert registry.vector_index_sync is registry.vector_index_sync
+
+
+def test_async_clients_are_reused_within_a_loop_and_rebuilt_across_loops():
+    registry = ClientRegistry()
+
+    async def grab():
+        first = registry.http
+        assert registry.http is first
+        return first
+
+    first_loop_client = asyncio.run(grab())
+    second_loop_client = asyncio.run(grab())
+    assert first_loop_client is not second_loop_client
+
+
+def test_async_clients_are_closed_when_their_loop_shuts_down(monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    registry = ClientRegistry()
+
+    async def grab():
+        return registry.http, registry.vector_index, registry.groq
+
+    http, vector_index, groq = asyncio.run(grab())
+    assert http.is_closed
+    assert vector_index._client.is_closed
+    assert groq._client.is_closed
+    # The next loop gets fresh clients
+    assert asyncio.run(grab())[0] is not http
+
+
+def test_clients_of_a_loop_running_on_another_thread_are_closed_there_on_rebind():
+    registry = ClientRegistry()
+    other_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=other_loop.run_forever)
+    thread.start()
+    try:
+        async def grab():
+            return registry.http
+
+        old_client = asyncio.run_coroutine_threadsafe(grab(), other_loop).result(5)
+
+        async def rebind():
+            new_client = registry.http
+            for _ in range(100):
+                if old_client.is_closed:
+                    break
+                await asyncio.sleep(0.01)
+            return new_client
+
+        new_client = asyncio.run(rebind())
+        assert old_client.is_closed
+        assert new_client is not old_client
+    finally:
+        other_loop.call_soon_threadsafe(other_loop.stop)
+        thread.join(5)
+        other_loop.close()
+
+
+def test_aclose_closes_clients_and_rebinds_on_next_use():
+    registry = ClientRegistry()
+
+    async def run():
+        first = registry.http
+        await registry.aclose()
+        assert first.is_closed
+        second = registry.http
+        assert second is not first and not second.is_closed
+        return second
+
+    assert asyncio.run(run()).is_closed
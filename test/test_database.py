@@ -0,0 +1,28 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from dbDrivers.database import DatabaseDriver
+
+
+def test_connections_use_wal_and_are_reused(tmp_path):
+    driver = DatabaseDriver(str(tmp_path / "members.db"))
+    with driver._get_connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == driver.busy_timeout_ms
+        first = conn
+    with driver._get_connection() as conn:
+        assert conn is first
+    driver.close()
+
+
+def test_failed_operation_does_not_leak_uncommitted_writes(tmp_path):
+    driver = DatabaseDriver(str(tmp_path / "members.db"))
+    with pytest.raises(RuntimeError):
+        with driver._get_connection() as conn:
+            conn.execute("INSERT INTO member_sessions (phone_number, session_id) VALUES ('+1', 'x')")
+            raise RuntimeError("boom")
+    with driver._get_connection() as conn:
+        assert not conn.in_transaction
+        assert conn.execute("SELECT COUNT(*) FROM member_sessions").fetchone()[0] == 0
@@ -0,0 +1,25 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from embeddings import create_embedding_backend, HuggingFaceAPIEmbedding, LocalEmbedding
+
+
+def test_default_backend_is_huggingface(monkeypatch):
+    monkeypatch.delenv("EMBEDDING_BACKEND", raising=False)
+    assert isinstance(create_embedding_backend(), HuggingFaceAPIEmbedding)
+
+
+def test_local_backend_selected_from_env(monkeypatch):
+    monkeypatch.setenv("EMBEDDING_BACKEND", "local")
+    backend = create_embedding_backend()
+    assert isinstance(backend, LocalEmbedding)
+    assert backend.name == "local"
+
+
+async def test_huggingface_backend_requires_api_key():
+    backend = HuggingFaceAPIEmbedding(api_key="")
+    backend.api_key = None
+    with pytest.raises(Exception, match="HUGGINGFACE_API_KEY"):
+        await backend.embed("hello")
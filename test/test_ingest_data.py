@@ -0,0 +1,245 @@
+import sys
+import os
+import numpy as np
+import pytest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "IngestSalonData"))
+
+import ingest_data
+import lexical_index
+import query_cache
+import vector_store
+from vector_store import LocalVectorStore, resolve_namespace
+
+SALON_DATA = """LUXURY SPA & SALON
+Open every day.
+=== SERVICES ===
+Haircut $50.
+=== POLICIES ===
+Cancel 24 hours ahead.
+"""
+
+
+class FakeModel:
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts):
+        self.encoded.extend(texts)
+        return np.array([[len(text), 1.0, 0.5] for text in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    monkeypatch.setenv("NAMESPACE", "salon")
+    monkeypatch.setattr(ingest_data, "MANIFEST_DIR", str(tmp_path / "manifests"))
+    monkeypatch.setattr(vector_store, "KB_ALIAS_DIR", str(tmp_path / "aliases"))
+    monkeypatch.setattr(query_cache, "KB_VERSION_DIR", str(tmp_path / "versions"))
+    monkeypatch.setattr(lexical_index, "LEXICAL_INDEX_DIR", str(tmp_path / "lexical"))
+    monkeypatch.setattr(ingest_data, "CANONICAL_ANSWERS", False)
+    vector_store._aliases.clear()
+    data_path = tmp_path / "salon_data.txt"
+    data_path.write_text(SALON_DATA, encoding="utf-8")
+    return LocalVectorStore(str(tmp_path / "vectors")), data_path
+
+
+def _ids(store):
+    return sorted(match.id for match in store.query([1.0, 1.0, 1.0], top_k=100, namespace=resolve_namespace("salon")))
+
+
+def test_first_run_builds_blue_green(env):
+    store, data_path = env
+    model = FakeModel()
+    ingest_data.ingest_salon_data(data_path=str(data_path), vector_client=store, model=model)
+
+    assert resolve_namespace("salon") == "salon__blue"
+    assert len(_ids(store)) == 3
+    assert len(model.encoded) == 3
+
+
+def test_rerun_only_embeds_changed_chunks_and_deletes_stale(env):
+    store, data_path = env
+    ingest_data.ingest_salon_data(data_path=str(data_path), vector_client=store, model=FakeModel())
+    before = _ids(store)
+
+    model = FakeModel()
+    ingest_data.ingest_salon_data(data_path=str(data_path), vector_client=store, model=model)
+    assert model.encoded == []
+    assert _ids(store) == before
+
+    data_path.write_text(SALON_DATA.replace("Haircut $50.", "Haircut $55."), encoding="utf-8")
+    ingest_data.ingest_salon_data(data_path=str(data_path), vector_client=store, model=model)
+    assert model.encoded == ["Haircut $55."]
+    assert ingest_data.create_vector_id("Haircut $50.") not in _ids(store)
+    assert ingest_data.create_vector_id("Haircut $55.") in _ids(store)
+    assert resolve_namespace("salon") == "salon__blue"
+
+
+def test_full_rebuild_swaps_colors_and_keeps_old_until_next_rebuild(env):
+    store, data_path = env
+    ingest_data.ingest_salon_data(data_path=str(data_path), vector_client=store, model=FakeModel())
+    ingest_data.ingest_salon_data(full_rebuild=True, data_path=str(data_path), vector_client=store, model=FakeModel())
+
+    assert resolve_namespace("salon") == "salon__green"
+    assert len(_ids(store)) == 3
+    # Queries still running against the old color keep working
+    assert len(store.query([1.0, 1.0, 1.0], top_k=10, namespace="salon__blue")) == 3
+
+    data_path.write_text(SALON_DATA.replace("Haircut $50.", "Haircut $55."), encoding="utf-8")
+    ingest_data.ingest_salon_data(full_rebuild=True, data_path=str(data_path), vector_client=store, model=FakeModel())
+    assert resolve_namespace("salon") == "salon__blue"
+    assert ingest_data.create_vector_id("Haircut $50.") not in _ids(store)
+
+
+def test_full_rebuild_carries_server_ingested_qa_over(env):
+    store, data_path = env
+    ingest_data.ingest_salon_data(data_path=str(data_path), vector_client=store, model=FakeModel())
+
+    # What server.py's ingest_qa job stores when a supervisor resolves a session
+    content = "Q: Do you sell gift cards?\nA: Yes, at the front desk."
+    metadata = {'title': "Q&A - Session s1", 'category': "Customer_QA", 'question': "Do you sell gift cards?",
+                'answer': "Yes, at the front desk.", 'session_id': "s1", 'content': content,
+                'canonical_answer': "Yes, gift cards are sold at the front desk."}
+    qa_id = ingest_data.create_vector_id(content)
+    store.upsert([{"id": qa_id, "vector": [1.0, 1.0, 1.0], "metadata": metadata, "data": content}], namespace="salon__blue")
+    lexical_index.update_lexical_index("salon__blue", {qa_id: metadata})
+
+    model = FakeModel()
+    ingest_data.ingest_salon_data(full_rebuild=True, data_path=str(data_path), vector_client=store, model=model)
+    assert resolve_namespace("salon") == "salon__green"
+    assert content in model.encoded
+    matches = {match.id: match for match in store.query([1.0, 1.0, 1.0], top_k=10, namespace="salon__green")}
+    assert matches[qa_id].metadata == metadata
+    assert lexical_index.load_lexical_index("salon__green").documents[qa_id] == metadata
+    assert len(matches) == 4
+
+    # Incremental syncs leave it alone: it is not a chunk of salon_data.txt
+    ingest_data.ingest_salon_data(data_path=str(data_path), vector_client=store, model=FakeModel())
+    assert qa_id in _ids(store)
+
+
+def test_lexical_index_follows_rebuilds_and_syncs(env):
+    store, data_path = env
+    ingest_data.ingest_salon_data(data_path=str(data_path), vector_client=store, model=FakeModel())
+    index = lexical_index.load_lexical_index("salon__blue")
+    assert sorted(index.documents) == _ids(store)
+    assert index.search("haircut price")[0].metadata['content'] == "Haircut $50."
+
+    data_path.write_text(SALON_DATA.replace("Haircut $50.", "Haircut $55."), encoding="utf-8")
+    ingest_data.ingest_salon_data(data_path=str(data_path), vector_client=store, model=FakeModel())
+    index = lexical_index.load_lexical_index("salon__blue")
+    assert sorted(index.documents) == _ids(store)
+    assert index.search("haircut")[0].metadata['content'] == "Haircut $55."
+
+    ingest_data.ingest_salon_data(full_rebuild=True, data_path=str(data_path), vector_client=store, model=FakeModel())
+    assert sorted(lexical_index.load_lexical_index("salon__green").documents) == _ids(store)
+
+
+def test_sync_merges_lexical_writes_made_by_the_server_meanwhile(env):
+    store, data_path = env
+    ingest_data.ingest_salon_data(data_path=str(data_path), vector_client=store, model=FakeModel())
+    upsert = store.upsert
+
+    def upsert_while_server_ingests(vectors, namespace=None):
+        upsert(vectors, namespace=namespace)
+        # server.py resolving a session between the sync's read and write of the index
+        lexical_index.update_lexical_index("salon__blue", {"qa": {'title': "Q&A", 'category': "Customer_QA", 'content': "Q: Parking?"}})
+
+    store.upsert = upsert_while_server_ingests
+    data_path.write_text(SALON_DATA.replace("Haircut $50.", "Haircut $55."), encoding="utf-8")
+    ingest_data.ingest_salon_data(data_path=str(data_path), vector_client=store, model=FakeModel())
+    documents = lexical_index.load_lexical_index("salon__blue").documents
+    assert "qa" in documents
+    assert ingest_data.create_vector_id("Haircut $55.") in documents
+    assert ingest_data.create_vector_id("Haircut $50.") not in documents
+
+
+def test_sync_indexes_changed_chunks_only_once_stored(env):
+    store, data_path = env
+    ingest_data.ingest_salon_data(data_path=str(data_path), vector_client=store, model=FakeModel())
+
+    def failing_upsert(vectors, namespace=None):
+        raise RuntimeError("vector store unavailable")
+
+    store.upsert = failing_upsert
+    data_path.write_text(SALON_DATA.replace("Haircut $50.", "Haircut $55."), encoding="utf-8")
+    ingest_data.ingest_salon_data(data_path=str(data_path), vector_client=store, model=FakeModel())
+    documents = lexical_index.load_lexical_index("salon__blue").documents
+    assert ingest_data.create_vector_id("Haircut $55.") not in documents
+
+
+def test_canonical_answers_are_precomputed_for_changed_single_question_chunks_only(env, monkeypatch):
+    store, data_path = env
+    questions = []
+
+    def fake_canonical_answer(content, question, system_message):
+        questions.append(question)
+        return f"**{content}**"
+
+    monkeypatch.setattr(ingest_data, "CANONICAL_ANSWERS", True)
+    monkeypatch.setattr(ingest_data, "canonical_answer", fake_canonical_answer)
+    gift_cards = "=== GIFT CARDS ===\nQ: Do you sell gift cards?\nA: Yes, at the front desk.\n"
+    data_path.write_text(SALON_DATA + gift_cards, encoding="utf-8")
+    ingest_data.ingest_salon_data(data_path=str(data_path), vector_client=store, model=FakeModel())
+    # Chunks covering several topics get no summary; only the single Q&A is answered, for its own question
+    assert questions == ["Do you sell gift cards?"]
+
+    documents = lexical_index.load_lexical_index("salon__blue").documents
+    answered = [document for document in documents.values() if document.get('canonical_answer')]
+    assert len(answered) == 1
+    assert answered[0]['question'] == "Do you sell gift cards?"
+
+    data_path.write_text(SALON_DATA.replace("Haircut $50.", "Haircut $55.") + gift_cards, encoding="utf-8")
+    ingest_data.ingest_salon_data(data_path=str(data_path), vector_client=store, model=FakeModel())
+    data_path.write_text(SALON_DATA + gift_cards.replace("front desk", "reception"), encoding="utf-8")
+    ingest_data.ingest_salon_data(data_path=str(data_path), vector_client=store, model=FakeModel())
+    assert questions == ["Do you sell gift cards?", "Do you sell gift cards?"]
+    assert resolve_namespace("salon") == "salon__blue"
+
+
+def test_single_question_needs_exactly_one_pair():
+    assert ingest_data.single_question("Q: Do you sell gift cards?\nA: Yes.") == "Do you sell gift cards?"
+    assert ingest_data.single_question("Q: Is parking free?\nA: Yes.\n\nQ: Do you sell gift cards?\nA: Yes.") is None
+    assert ingest_data.single_question("Haircut $50.") is None
+
+
+def test_enabling_canonical_answers_forces_a_rebuild(env, monkeypatch):
+    store, data_path = env
+    ingest_data.ingest_salon_data(data_path=str(data_path), vector_client=store, model=FakeModel())
+    monkeypatch.setattr(ingest_data, "CANONICAL_ANSWERS", True)
+    monkeypatch.setattr(ingest_data, "canonical_answer", lambda content, question, system_message: content)
+    ingest_data.ingest_salon_data(data_path=str(data_path), vector_client=store, model=FakeModel())
+    assert resolve_namespace("salon") == "salon__green"
+
+
+def test_streamed_sections_match_whole_file_split():
+    path = os.path.join(os.path.dirname(ingest_data.__file__), "salon_data.txt")
+    with open(path, encoding="utf-8") as f:
+        content = f.read()
+
+    expected = []
+    for section in content.split('=== '):
+        expected.extend(ingest_data.process_section(section))
+    with open(path, encoding="utf-8") as f:
+        assert list(ingest_data.iter_sections(f)) == expected
+
+
+def test_upsert_sections_streams_fixed_size_batches(tmp_path):
+    store = LocalVectorStore(str(tmp_path / "vectors"))
+    batch_sizes = []
+
+    class CountingModel(FakeModel):
+        def encode(self, texts):
+            batch_sizes.append(len(texts))
+            return super().encode(texts)
+
+    sections = (
+        {'id': f"id{i}", 'title': f"t{i}", 'category': "c", 'content': f"chunk {i}"}
+        for i in range(10)
+    )
+    stored, attempted = ingest_data.upsert_sections(store, sections, CountingModel(), "ns", batch_size=4, workers=2)
+
+    assert attempted == 10
+    assert sorted(stored) == sorted(f"id{i}" for i in range(10))
+    assert sorted(batch_sizes) == [2, 4, 4]
+    assert len(store.query([1.0, 1.0, 1.0], top_k=20, namespace="ns")) == 10
@@ -0,0 +1,172 @@
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dbDrivers.job_queue import JobQueue
+
+
+def test_worker_pool_runs_enqueued_jobs(tmp_path):
+    jobs = JobQueue(str(tmp_path / "members.db"), workers=2)
+    seen = []
+    jobs.register("echo", lambda payload: seen.append(payload['n']))
+    jobs.start()
+    try:
+        ids = [jobs.enqueue("echo", {'n': n}) for n in range(5)]
+        deadline = time.time() + 2
+        while len(seen) < 5 and time.time() < deadline:
+            time.sleep(0.01)
+        assert sorted(seen) == list(range(5))
+        assert all(jobs.get_job(job_id)['status'] == "DONE" for job_id in ids)
+    finally:
+        jobs.stop()
+
+
+def test_failed_job_is_retried_then_succeeds(tmp_path):
+    jobs = JobQueue(str(tmp_path / "members.db"), retry_backoff=0)
+    calls = []
+
+    def flaky(payload):
+        calls.append(payload)
+        if len(calls) < 3:
+            raise RuntimeError("upstream unavailable")
+
+    jobs.register("flaky", flaky)
+    job_id = jobs.enqueue("flaky", {})
+    assert jobs.run_pending() == 3
+
+    job = jobs.get_job(job_id)
+    assert job['status'] == "DONE"
+    assert job['attempts'] == 3
+    assert job['last_error'] is None
+
+
+def test_job_fails_after_max_attempts(tmp_path):
+    jobs = JobQueue(str(tmp_path / "members.db"), retry_backoff=0, max_attempts=2)
+    jobs.register("broken", lambda payload: 1 / 0)
+    job_id = jobs.enqueue("broken", {})
+    jobs.run_pending()
+
+    job = jobs.get_job(job_id)
+    assert job['status'] == "FAILED"
+    assert job['attempts'] == 2
+    assert "division by zero" in job['last_error']
+    assert jobs.status_counts() == {'FAILED': 1}
+
+
+def test_retry_waits_for_backoff(tmp_path):
+    jobs = JobQueue(str(tmp_path / "members.db"), retry_backoff=60)
+    jobs.register("broken", lambda payload: 1 / 0)
+    job_id = jobs.enqueue("broken", {})
+    assert jobs.run_pending() == 1
+    assert jobs.get_job(job_id)['status'] == "QUEUED"
+    assert jobs.run_pending() == 0
+
+
+def test_jobs_with_an_expired_lease_are_requeued(tmp_path):
+    path = str(tmp_path / "members.db")
+    crashed = JobQueue(path, lease_seconds=0.05)
+    job_id = crashed.enqueue("echo", {})
+    crashed._claim()
+    assert crashed.get_job(job_id)['status'] == "RUNNING"
+    time.sleep(0.06)
+
+    seen = []
+    jobs = JobQueue(path)
+    jobs.register("echo", seen.append)
+    jobs.start()
+    try:
+        deadline = time.time() + 2
+        while not seen and time.time() < deadline:
+            time.sleep(0.01)
+        assert seen == [{}]
+    finally:
+        jobs.stop()
+
+
+def test_running_job_of_a_live_worker_is_not_requeued(tmp_path):
+    path = str(tmp_path / "members.db")
+    live = JobQueue(path, lease_seconds=60)
+    job_id = live.enqueue("append", {})
+    live._claim()
+
+    # A second server process (e.g. the debug reloader's child) starting on the same database
+    other = JobQueue(path)
+    other.register("append", lambda payload: None)
+    assert other.recover_expired() == 0
+    assert other.run_pending() == 0
+    job = other.get_job(job_id)
+    assert job['status'] == "RUNNING"
+    assert job['owner'] == live.owner
+
+
+def test_worker_that_lost_its_lease_does_not_overwrite_the_new_owner(tmp_path):
+    path = str(tmp_path / "members.db")
+    stale = JobQueue(path, lease_seconds=0.01)
+    job_id = stale.enqueue("echo", {})
+    job = stale._claim()
+    time.sleep(0.02)
+
+    current = JobQueue(path, retry_backoff=60)
+    current.register("echo", lambda payload: 1 / 0)
+    assert current.run_pending() == 1
+    assert current.get_job(job_id)['status'] == "QUEUED"
+
+    stale.register("echo", lambda payload: None)
+    stale._run([job])
+    assert stale.get_job(job_id)['status'] == "QUEUED"
+
+
+def test_lease_is_renewed_while_a_long_job_runs(tmp_path):
+    path = str(tmp_path / "members.db")
+    jobs = JobQueue(path, lease_seconds=0.1)
+    other = JobQueue(path)
+    taken = []
+
+    def slow(payload):
+        time.sleep(0.3)
+        # Past the original lease, another queue still cannot take the job
+        taken.append(other.recover_expired())
+
+    jobs.register("slow", slow)
+    job_id = jobs.enqueue("slow", {})
+    assert jobs.run_pending() == 1
+    assert taken == [0]
+    assert jobs.get_job(job_id)['status'] == "DONE"
+
+
+def test_batch_kind_runs_queued_siblings_together(tmp_path):
+    jobs = JobQueue(str(tmp_path / "members.db"), retry_backoff=0)
+    batches = []
+    jobs.register_batch("ingest", lambda payloads: batches.append([p['n'] for p in payloads]), batch_size=3, linger=60)
+
+    jobs.enqueue("ingest", {'n': 0})
+    jobs.enqueue("ingest", {'n': 1})
+    # Still lingering for more work
+    assert jobs.run_pending() == 0
+    # The third job fills the batch and makes it runnable
+    jobs.enqueue("ingest", {'n': 2})
+    assert jobs.run_pending() == 3
+    assert batches == [[2, 0, 1]]
+    assert jobs.status_counts() == {'DONE': 3}
+
+
+def test_failed_batch_retries_every_job(tmp_path):
+    jobs = JobQueue(str(tmp_path / "members.db"), retry_backoff=60)
+    sizes = []
+
+    def broken(payloads):
+        sizes.append(len(payloads))
+        raise RuntimeError("upsert failed")
+
+    jobs.register_batch("ingest", broken, batch_size=2, linger=60)
+    first = jobs.enqueue("ingest", {})
+    second = jobs.enqueue("ingest", {})
+    assert jobs.run_pending() == 2
+    assert sizes == [2]
+    # Backed-off retries are not pulled into a batch early
+    jobs.enqueue("ingest", {})
+    jobs.enqueue("ingest", {})
+    jobs.run_pending()
+    assert sizes == [2, 2]
+    assert {jobs.get_job(first)['status'], jobs.get_job(second)['status']} == {"QUEUED"}
@@ -0,0 +1,57 @@
+import sys
+import os
+import json
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+from latency_metrics import MetricsRegistry, Histogram, bind_session, current_session_id
+
+
+def test_histogram_percentiles():
+    histogram = Histogram()
+    for value in range(1, 101):
+        histogram.observe(float(value))
+    summary = histogram.summary()
+    assert summary['count'] == 100
+    assert summary['p50_ms'] == 51.0
+    assert summary['p95_ms'] == 96.0
+    assert summary['p99_ms'] == 100.0
+
+
+def test_prometheus_export_has_cumulative_buckets():
+    registry = MetricsRegistry()
+    registry.record("embedding", 7.0)
+    registry.record("embedding", 300.0)
+    registry.add_gauge_source(lambda: {'query_cache_misses': 3})
+    text = registry.render_prometheus()
+    assert 'ai_receptionist_stage_duration_seconds_bucket{stage="embedding",le="0.01"} 1' in text
+    assert 'ai_receptionist_stage_duration_seconds_bucket{stage="embedding",le="+Inf"} 2' in text
+    assert 'ai_receptionist_stage_duration_seconds_count{stage="embedding"} 2' in text
+    assert 'ai_receptionist_query_cache_misses 3' in text
+
+
+def test_session_summary_written_and_forgotten(tmp_path):
+    registry = MetricsRegistry()
+    registry.record("vector_query", 12.0, session_id="abc")
+    registry.record("vector_query", 30.0, session_id="other")
+    path = registry.write_session_summary("abc", log_dir=str(tmp_path))
+    with open(path) as f:
+        summary = json.load(f)
+    assert summary['stages']['vector_query']['count'] == 1
+    assert registry.session_summary("abc")['spans'] == []
+    assert registry.stage_summary("vector_query")['count'] == 2
+
+
+def test_bound_session_is_inherited_by_child_tasks():
+    async def call(session_id):
+        bind_session(session_id)
+        await asyncio.sleep(0)
+        return await asyncio.create_task(read())
+
+    async def read():
+        return current_session_id.get()
+
+    async def main():
+        return await asyncio.gather(call("a"), call("b"))
+
+    assert asyncio.run(main()) == ["a", "b"]
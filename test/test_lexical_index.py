@@ -0,0 +1,77 @@
+import sys
+import os
+import threading
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import lexical_index
+from lexical_index import BM25Index, tokenize, reciprocal_rank_fusion, get_lexical_index, update_lexical_index
+from vector_store import VectorMatch
+
+DOCUMENTS = {
+    "contact": {'title': "Contact", 'category': "Contact", 'content': "Call us at phone number (555) 010-2030."},
+    "hours": {'title': "Hours", 'category': "Hours", 'content': "We are open 9am to 7pm every day."},
+    "facials": {'title': "Facials", 'category': "Services", 'content': "Hydrating facial $85. Deep cleansing facials $95."},
+}
+
+
+def test_tokenize_drops_question_filler_and_plurals():
+    assert tokenize("What is your phone number?") == ["phone", "number"]
+    assert tokenize("How much are facials?") == ["facial"]
+
+
+def test_exact_terms_rank_the_matching_chunk_first():
+    index = BM25Index(DOCUMENTS)
+    top = index.search("What's your phone number?")[0]
+    assert top.id == "contact"
+    assert top.coverage == 1.0
+    assert index.search("facial prices")[0].id == "facials"
+    assert index.search("distance to the moon") == []
+
+
+def test_partial_match_reports_coverage():
+    top = BM25Index(DOCUMENTS).search("facial gift card")[0]
+    assert top.id == "facials"
+    assert abs(top.coverage - 1 / 3) < 1e-9
+
+
+def test_remove_and_replace_keep_postings_consistent():
+    index = BM25Index(DOCUMENTS)
+    index.remove("contact")
+    assert index.search("phone number") == []
+    index.add("hours", {'title': "Hours", 'content': "Open 10am to 6pm"})
+    assert index.search("10am")[0].id == "hours"
+    assert index.search("every day") == []
+    assert len(index) == 2
+
+
+def test_rrf_promotes_ids_found_by_both_retrievers():
+    vector = [VectorMatch("a", 0.6), VectorMatch("b", 0.5), VectorMatch("c", 0.4)]
+    lexical = [VectorMatch("c", 7.0), VectorMatch("d", 3.0)]
+    fused = reciprocal_rank_fusion(vector, lexical)
+    assert [match.id for match in fused] == ["c", "a", "b", "d"]
+
+
+def test_cached_index_follows_file_updates(tmp_path, monkeypatch):
+    monkeypatch.setattr(lexical_index, "LEXICAL_INDEX_DIR", str(tmp_path))
+    assert len(get_lexical_index("salon__blue")) == 0
+
+    update_lexical_index("salon__blue", DOCUMENTS)
+    index = get_lexical_index("salon__blue")
+    assert len(index) == 3
+    assert get_lexical_index("salon__blue") is index
+
+    update_lexical_index("salon__blue", {}, remove=["hours"])
+    assert sorted(get_lexical_index("salon__blue").documents) == ["contact", "facials"]
+
+
+def test_concurrent_updates_keep_every_document(tmp_path, monkeypatch):
+    monkeypatch.setattr(lexical_index, "LEXICAL_INDEX_DIR", str(tmp_path))
+    writers = [
+        threading.Thread(target=update_lexical_index, args=("salon__blue", {f"doc{i}": {'title': f"Doc {i}", 'content': "text"}}))
+        for i in range(20)
+    ]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+    assert len(lexical_index.load_lexical_index("salon__blue")) == 20
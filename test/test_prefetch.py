@@ -0,0 +1,77 @@
+import asyncio
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prefetch import RetrievalPrefetcher
+
+
+def recording_retrieve(delay=0.01):
+    calls = []
+
+    async def retrieve(text):
+        calls.append(text)
+        await asyncio.sleep(delay)
+        return f"results for {text}"
+
+    return retrieve, calls
+
+
+async def test_lookup_matches_rephrased_query():
+    retrieve, calls = recording_retrieve()
+    prefetcher = RetrievalPrefetcher(retrieve)
+    prefetcher.on_transcript("um what are your opening hours on saturday", is_final=True)
+
+    result = await prefetcher.lookup("opening hours Saturday")
+    assert result == "results for um what are your opening hours on saturday"
+    assert prefetcher.hits == 1
+    assert await prefetcher.lookup("price of a facial") is None
+    assert prefetcher.misses == 1
+    assert len(calls) == 1
+
+
+async def test_lookup_waits_for_a_retrieval_in_flight():
+    retrieve, _ = recording_retrieve(delay=0.05)
+    prefetcher = RetrievalPrefetcher(retrieve)
+    prefetcher.on_transcript("what is the price of a haircut")
+    assert await prefetcher.lookup("haircut price") == "results for what is the price of a haircut"
+
+
+async def test_superseded_interim_is_cancelled_and_duplicates_ignored():
+    retrieve, calls = recording_retrieve(delay=0.05)
+    prefetcher = RetrievalPrefetcher(retrieve)
+    prefetcher.on_transcript("do you do hair", is_final=False)
+    await asyncio.sleep(0)
+    prefetcher.on_transcript("do you do hair coloring", is_final=False)
+    prefetcher.on_transcript("Do you do hair coloring?", is_final=True)
+    await asyncio.sleep(0)
+
+    assert prefetcher.started == 2
+    assert await prefetcher.lookup("hair coloring") == "results for do you do hair coloring"
+    assert calls == ["do you do hair", "do you do hair coloring"]
+
+
+async def test_query_covering_only_part_of_the_transcript_misses():
+    retrieve, _ = recording_retrieve()
+    prefetcher = RetrievalPrefetcher(retrieve)
+    prefetcher.on_transcript("what do manicures pedicures and haircuts cost on weekends", is_final=True)
+    # Every query term is in the transcript, but the retrieval was for a broader question
+    assert await prefetcher.lookup("haircut cost") is None
+    assert prefetcher.misses == 1
+    prefetcher.close()
+
+
+async def test_failed_or_expired_prefetch_falls_back():
+    async def failing(text):
+        raise ConnectionError("upstash timeout")
+
+    prefetcher = RetrievalPrefetcher(failing)
+    prefetcher.on_transcript("what is your address")
+    assert await prefetcher.lookup("address") is None
+
+    retrieve, _ = recording_retrieve()
+    prefetcher = RetrievalPrefetcher(retrieve, ttl=0.0)
+    prefetcher.on_transcript("what is your address")
+    await asyncio.sleep(0.01)
+    assert await prefetcher.lookup("address") is None
+    prefetcher.close()
@@ -0,0 +1,58 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import query_cache
+from query_cache import QueryCache, normalize_query, bump_namespace_version
+
+
+def test_normalize_query_ignores_case_and_punctuation():
+    assert normalize_query("  What are your HOURS?? ") == "what are your hours"
+
+
+def test_exact_hit_after_put():
+    cache = QueryCache()
+    cache.put("What are your hours?", [1.0, 0.0], "9am to 7pm")
+    assert cache.get_exact("what are your hours") == "9am to 7pm"
+    assert cache.stats()['hits_exact'] == 1
+
+
+def test_similar_embedding_hits_and_dissimilar_misses():
+    cache = QueryCache(similarity_threshold=0.9)
+    cache.put("What are your hours?", [1.0, 0.0], "9am to 7pm")
+    assert cache.get_similar("What are your hours", [0.99, 0.05]) == "9am to 7pm"
+    assert cache.get_similar("What are your hours", [0.0, 1.0]) is None
+    stats = cache.stats()
+    assert stats['hits_semantic'] == 1
+    assert stats['misses'] == 1
+
+
+def test_similar_embedding_about_a_different_service_misses():
+    cache = QueryCache(similarity_threshold=0.95)
+    cache.put("How much is a haircut?", [1.0, 0.0], "Haircuts start at $45.")
+    # Near-paraphrases embed almost identically even though they ask about different services
+    assert cache.get_similar("How much is a manicure?", [0.99, 0.02]) is None
+    assert cache.get_similar("haircuts, how much?", [0.99, 0.02]) == "Haircuts start at $45."
+    assert cache.stats()['hits_semantic'] == 1
+
+
+def test_lru_eviction_and_ttl():
+    cache = QueryCache(max_entries=2, ttl_seconds=0.05)
+    cache.put("a", [1.0, 0.0], "A")
+    cache.put("b", [0.0, 1.0], "B")
+    cache.put("c", [1.0, 1.0], "C")
+    assert cache.get_exact("a") is None
+    assert cache.stats()['evictions'] == 1
+    time.sleep(0.06)
+    assert cache.get_exact("b") is None
+
+
+def test_namespace_version_bump_invalidates(tmp_path, monkeypatch):
+    monkeypatch.setattr(query_cache, "KB_VERSION_DIR", str(tmp_path))
+    cache = QueryCache(namespace="salon")
+    cache.put("hours", [1.0, 0.0], "9am to 7pm")
+    bump_namespace_version("salon")
+    cache._version_checked_at = 0
+    assert cache.get_exact("hours") is None
+    assert cache.stats()['invalidations'] == 1
@@ -0,0 +1,56 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dbDrivers.session_operations import SessionOperations
+from dbDrivers.session_events import SessionEventBroadcaster
+
+
+def test_changes_are_pushed_to_every_subscriber(tmp_path):
+    db = SessionOperations(str(tmp_path / "members.db"))
+    events = SessionEventBroadcaster(db, poll_interval=0.05)
+    first, second = events.subscribe(), events.subscribe()
+    try:
+        db.add_member_session("+1555", "abc")
+        db.update_member_session("abc", "PENDING", question="hours?")
+        events.notify()
+
+        for subscription in (first, second):
+            session = subscription.get(timeout=2)
+            assert session['session_id'] == "abc"
+            assert session['status'] == "PENDING"
+    finally:
+        events.stop()
+
+
+def test_poll_reads_only_new_changes(tmp_path):
+    db = SessionOperations(str(tmp_path / "members.db"))
+    db.add_member_session("+1555", "old")
+    db.update_member_session("old", "PENDING", question="q")
+    events = SessionEventBroadcaster(db, poll_interval=60)
+    subscription = events.subscribe()
+    try:
+        assert events.poll_once() == 0
+        db.update_member_session("old", "RESOLVED", answer="a")
+        assert events.poll_once() == 1
+        assert subscription.get_nowait()['status'] == "RESOLVED"
+        assert events.poll_once() == 0
+    finally:
+        events.stop()
+
+
+def test_stalled_subscriber_is_dropped_with_resync(tmp_path):
+    db = SessionOperations(str(tmp_path / "members.db"))
+    events = SessionEventBroadcaster(db, poll_interval=60, max_queue=2)
+    subscription = events.subscribe()
+    try:
+        for i in range(3):
+            db.add_member_session("+1555", f"s{i}")
+            db.update_member_session(f"s{i}", "PENDING", question="q")
+        events.poll_once()
+
+        assert events.subscriber_count == 0
+        drained = [subscription.get_nowait() for _ in range(subscription.qsize())]
+        assert drained[-1] is None
+    finally:
+        events.stop()
@@ -0,0 +1,75 @@
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dbDrivers.session_operations import SessionOperations
+from dbDrivers.session_expiry import SessionExpiryScheduler, expiry_cutoff
+
+
+def _pending(db, session_id, age_seconds):
+    db.add_member_session("+1555", session_id)
+    db.update_member_session(session_id, "PENDING", question="q")
+    with db._get_connection() as conn:
+        conn.execute(
+            "UPDATE member_sessions SET created_at = datetime('now', ?) WHERE session_id = ?",
+            (f"-{age_seconds} seconds", session_id)
+        )
+        conn.commit()
+
+
+def _status(db, session_id):
+    return db.get_session_by_id(session_id)['status']
+
+
+def test_bulk_expiry_is_one_set_based_update(tmp_path):
+    db = SessionOperations(str(tmp_path / "members.db"))
+    _pending(db, "old", 120)
+    _pending(db, "new", 0)
+    _pending(db, "done", 120)
+    db.update_member_session("done", "RESOLVED", answer="a")
+
+    assert db.expire_pending_sessions(expiry_cutoff(60)) == 1
+    assert [_status(db, s) for s in ("old", "new", "done")] == ["UNRESOLVED", "PENDING", "RESOLVED"]
+    with db._get_connection() as conn:
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM member_sessions WHERE status = 'PENDING' AND created_at < ?", ("x",)
+        ).fetchall()
+    assert "idx_member_sessions_status_created_at" in str(plan)
+
+
+def test_scheduler_seeds_from_db_and_expires_at_deadline(tmp_path):
+    db = SessionOperations(str(tmp_path / "members.db"))
+    _pending(db, "overdue", 120)
+    _pending(db, "fresh", 0)
+    expired = []
+    expiry = SessionExpiryScheduler(db, timeout_seconds=60, on_expired=expired.append)
+    expiry.start()
+    try:
+        deadline = time.time() + 2
+        while not expired and time.time() < deadline:
+            time.sleep(0.01)
+        assert expired == [1]
+        assert _status(db, "overdue") == "UNRESOLVED"
+        assert _status(db, "fresh") == "PENDING"
+        assert expiry.pending_count == 1
+    finally:
+        expiry.stop()
+
+
+def test_change_feed_schedules_new_pending_sessions(tmp_path):
+    db = SessionOperations(str(tmp_path / "members.db"))
+    expiry = SessionExpiryScheduler(db, timeout_seconds=60)
+    expiry.start()
+    try:
+        _pending(db, "late", 120)
+        expiry.on_session_change(db.get_session_by_id("late"))
+        expiry.on_session_change(db.get_session_by_id("late"))
+
+        deadline = time.time() + 2
+        while _status(db, "late") == "PENDING" and time.time() < deadline:
+            time.sleep(0.01)
+        assert _status(db, "late") == "UNRESOLVED"
+        assert expiry.pending_count == 0
+    finally:
+        expiry.stop()
@@ -0,0 +1,128 @@
+import sys
+import os
+import sqlite3
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dbDrivers.session_operations import SessionOperations
+
+
+def test_get_session_by_id_point_lookup(tmp_path):
+    db = SessionOperations(str(tmp_path / "members.db"))
+    db.add_member_session("+1555", "abc")
+    db.update_member_session("abc", "PENDING", question="hours?")
+
+    session = db.get_session_by_id("abc")
+    assert session['phone_number'] == "+1555"
+    assert session['question'] == "hours?"
+    assert db.get_session_by_id("missing") is None
+
+
+def test_session_id_and_phone_lookups_use_indexes(tmp_path):
+    db = SessionOperations(str(tmp_path / "members.db"))
+    with db._get_connection() as conn:
+        plan = conn.execute("EXPLAIN QUERY PLAN SELECT * FROM member_sessions WHERE session_id = ?", ("x",)).fetchall()
+        assert "idx_member_sessions_session_id" in str(plan)
+        plan = conn.execute("EXPLAIN QUERY PLAN SELECT * FROM member_sessions WHERE phone_number = ?", ("x",)).fetchall()
+        assert "idx_member_sessions_phone_number" in str(plan)
+
+
+def test_session_id_is_unique(tmp_path):
+    db = SessionOperations(str(tmp_path / "members.db"))
+    assert db.add_member_session("+1555", "abc")
+    assert not db.add_member_session("+1555", "abc")
+
+
+def test_existing_duplicates_fall_back_to_non_unique_index(tmp_path):
+    path = str(tmp_path / "members.db")
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE member_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, phone_number TEXT NOT NULL, session_id TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, question TEXT, status TEXT, answer TEXT
+        )
+    """)
+    conn.execute("INSERT INTO member_sessions (phone_number, session_id) VALUES ('+1', 'dup'), ('+1', 'dup')")
+    conn.commit()
+    conn.close()
+
+    db = SessionOperations(path)
+    assert db.get_session_by_id("dup")['session_id'] == "dup"
+
+
+def _seed(db, count):
+    for i in range(count):
+        db.add_member_session(f"+1555{i % 2}", f"s{i}")
+        db.update_member_session(f"s{i}", "PENDING", question=f"q{i}")
+
+
+def test_keyset_pagination_walks_every_session_once(tmp_path):
+    db = SessionOperations(str(tmp_path / "members.db"))
+    _seed(db, 7)
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = db.get_member_sessions_page(status="PENDING", cursor=cursor, limit=3)
+        seen.extend(session['session_id'] for session in page)
+        if cursor is None:
+            break
+    assert seen == [f"s{i}" for i in reversed(range(7))]
+
+
+def test_page_filters_by_status_and_phone(tmp_path):
+    db = SessionOperations(str(tmp_path / "members.db"))
+    _seed(db, 4)
+    db.update_member_session("s0", "RESOLVED", answer="9am")
+    db.add_member_session("+1999", "no-question")
+
+    resolved, _ = db.get_member_sessions_page(status="RESOLVED")
+    assert [s['session_id'] for s in resolved] == ["s0"]
+    by_phone, _ = db.get_member_sessions_page(phone_number="+15551")
+    assert [s['session_id'] for s in by_phone] == ["s3", "s1"]
+    # Sessions without a question never show on the dashboard
+    everything, _ = db.get_member_sessions_page()
+    assert "no-question" not in [s['session_id'] for s in everything]
+
+
+def test_changed_since_returns_only_modified_rows(tmp_path):
+    db = SessionOperations(str(tmp_path / "members.db"))
+    _seed(db, 3)
+    sync_cursor = db.get_latest_version()
+
+    db.update_member_session("s1", "RESOLVED", answer="done")
+    changed, sync_cursor, has_more = db.get_member_sessions_changed_since(sync_cursor)
+    assert [(s['session_id'], s['status']) for s in changed] == [("s1", "RESOLVED")]
+    assert not has_more
+
+    changed, _, _ = db.get_member_sessions_changed_since(sync_cursor)
+    assert changed == []
+
+
+def test_changed_since_pages_through_large_deltas(tmp_path):
+    db = SessionOperations(str(tmp_path / "members.db"))
+    _seed(db, 5)
+
+    seen, sync_cursor, has_more = [], 0, True
+    while has_more:
+        changed, sync_cursor, has_more = db.get_member_sessions_changed_since(sync_cursor, limit=2)
+        seen.extend(session['session_id'] for session in changed)
+    assert seen == [f"s{i}" for i in range(5)]
+    assert sync_cursor == db.get_latest_version()
+
+
+def test_existing_rows_are_backfilled_with_versions(tmp_path):
+    path = str(tmp_path / "members.db")
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE member_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, phone_number TEXT NOT NULL, session_id TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, question TEXT, status TEXT, answer TEXT
+        )
+    """)
+    conn.execute("INSERT INTO member_sessions (phone_number, session_id, status) VALUES ('+1', 'old', 'PENDING')")
+    conn.commit()
+    conn.close()
+
+    db = SessionOperations(path)
+    assert db.get_session_by_id("old")['version'] == 1
+    db.add_member_session("+1", "new")
+    assert db.get_session_by_id("new")['version'] == 2
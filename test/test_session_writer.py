@@ -0,0 +1,42 @@
+import asyncio
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dbDrivers.session_operations import SessionOperations
+from dbDrivers.session_writer import AsyncSessionWriter
+
+
+async def test_writes_are_applied_off_loop_and_batched(tmp_path):
+    db = SessionOperations(str(tmp_path / "members.db"))
+    writer = AsyncSessionWriter(db)
+    try:
+        added = await asyncio.gather(*(writer.add_member_session("+1555", f"s{i}") for i in range(20)))
+        assert all(added)
+
+        updated = await asyncio.gather(
+            *(writer.update_member_session(f"s{i}", "PENDING", question=f"q{i}") for i in range(20))
+        )
+        assert all(updated)
+        assert writer.writes_applied == 40
+        assert writer.batches_committed < 40
+    finally:
+        writer.close()
+
+    pending = db.get_all_member_sessions("PENDING")
+    assert sorted(row['question'] for row in pending) == sorted(f"q{i}" for i in range(20))
+
+
+async def test_update_of_unknown_session_returns_false_without_failing_batch(tmp_path):
+    db = SessionOperations(str(tmp_path / "members.db"))
+    writer = AsyncSessionWriter(db)
+    try:
+        await writer.add_member_session("+1555", "known")
+        results = await asyncio.gather(
+            writer.update_member_session("missing", "PENDING", question="q"),
+            writer.update_member_session("known", "PENDING", question="hours?")
+        )
+        assert results == [False, True]
+    finally:
+        writer.close()
+    assert db.get_all_member_sessions("PENDING")[0]['question'] == "hours?"
@@ -0,0 +1,115 @@
+import sys
+import os
+import json
+import pytest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import query_cache
+from tenants import TenantRegistry, DEFAULT_TENANT_ID, normalize_phone_number
+from utils import AGENT_INSTRUCTION
+
+
+@pytest.fixture(autouse=True)
+def working_directory(tmp_path, monkeypatch):
+    """The default tenant's members.db is relative to the working directory; keep it out of the repo"""
+    monkeypatch.chdir(tmp_path)
+
+
+def _write_config(tmp_path, tenants):
+    path = tmp_path / "tenants.json"
+    path.write_text(json.dumps({'tenants': tenants}), encoding="utf-8")
+    return str(path)
+
+
+def _config(tmp_path, count=3):
+    return _write_config(tmp_path, {
+        f"salon{i}": {
+            'name': f"Salon {i}",
+            'namespace': f"ns{i}",
+            'phone_numbers': [f"+1 (555) 000-000{i}"],
+            'db_path': str(tmp_path / "members.db"),
+            'agent_instruction': f"You work at Salon {i}"
+        }
+        for i in range(count)
+    })
+
+
+def test_resolves_by_metadata_then_dialed_number(tmp_path):
+    registry = TenantRegistry(_config(tmp_path))
+
+    assert registry.resolve('{"tenant_id": "salon1"}').namespace == "ns1"
+    assert registry.resolve(None, "+15550000002").tenant_id == "salon2"
+    assert registry.resolve('{"dialed_number": "sip:+15550000000@trunk"}').tenant_id == "salon0"
+    assert registry.resolve("not json", "+19999999999").tenant_id == DEFAULT_TENANT_ID
+
+
+def test_default_tenant_uses_env_namespace_and_builtin_prompts(tmp_path, monkeypatch):
+    monkeypatch.setenv("NAMESPACE", "bliss")
+    registry = TenantRegistry(str(tmp_path / "missing.json"))
+    tenant = registry.resolve()
+    assert tenant.namespace == "bliss"
+    assert tenant.agent_instruction == AGENT_INSTRUCTION
+
+
+def test_lru_keeps_a_bounded_number_of_tenants_loaded(tmp_path):
+    registry = TenantRegistry(_config(tmp_path), max_tenants=2)
+    query_cache.get_query_cache("ns0")
+
+    first = registry.get("salon0")
+    registry.get("salon1")
+    assert registry.get("salon0") is first
+    registry.get("salon2")
+
+    assert len(registry) == 2
+    assert registry.evictions == 1
+    # salon1 was least recently used; salon0 is still the same loaded object
+    assert registry.get("salon0") is first
+    assert registry.loads == 3
+    # Tenants on one database share a driver
+    assert registry.get("salon2").sessions is first.sessions
+
+
+def test_evicted_tenant_drops_its_query_cache(tmp_path):
+    registry = TenantRegistry(_config(tmp_path, count=2), max_tenants=1)
+    registry.get("salon0")
+    query_cache.get_query_cache("ns0").put("hours?", None, "9 to 5")
+    registry.get("salon1")
+    assert query_cache.get_query_cache("ns0").get_exact("hours?") is None
+
+
+def test_config_changes_are_picked_up(tmp_path):
+    path = _config(tmp_path, count=1)
+    registry = TenantRegistry(path)
+    assert registry.get("salon0").name == "Salon 0"
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({'tenants': {'salon0': {'name': "Renamed", 'db_path': str(tmp_path / "members.db")}}}, f)
+    os.utime(path, ns=(0, 10**18))
+    assert registry.get("salon0").name == "Renamed"
+
+
+def test_config_change_only_unloads_changed_tenants_and_keeps_pools_open(tmp_path):
+    path = _config(tmp_path, count=2)
+    registry = TenantRegistry(path)
+    unchanged = registry.get("salon0")
+    changed = registry.get("salon1")
+    sessions = changed.sessions
+
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    config['tenants']['salon1']['name'] = "Renamed"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(config, f)
+    os.utime(path, ns=(0, 10**18))
+
+    assert registry.get("salon1").name == "Renamed"
+    assert registry.get("salon0") is unchanged
+    # A call still holding the old tenant keeps a working pool, shared with the rebuilt tenant
+    assert registry.get("salon1").sessions is sessions
+    assert not sessions._pool.empty()
+    assert sessions.add_member_session("+15550000001", "in-progress")
+
+
+def test_normalize_phone_number():
+    assert normalize_phone_number("+1 (555) 010-0000") == "+15550100000"
+    assert normalize_phone_number("sip:15550100000@example.com") == "15550100000"
@@ -0,0 +1,410 @@
+import asyncio
+import json
+import sys
+import threading
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from livekit.agents.llm import StopResponse
+
+import tools
+from query_cache import QueryCache
+from tenants import Tenant, TenantRegistry
+from lexical_index import BM25Index
+from prefetch import RetrievalPrefetcher
+from tts_cache import TTSAudioCache
+
+
+class MockRunContext:
+    pass
+
+
+@pytest.fixture(autouse=True)
+def default_tenant(tmp_path, monkeypatch):
+    """Calls without a session get the default tenant; keep its session database out of the working directory"""
+    config = tmp_path / "tenants.json"
+    config.write_text(json.dumps({"tenants": {"default": {
+        "name": "Default", "namespace": None, "db_path": str(tmp_path / "members.db")
+    }}}), encoding="utf-8")
+    monkeypatch.setattr(tools, "get_tenant_registry", lambda: TenantRegistry(str(config)))
+
+
+class FakeResult:
+    def __init__(self, score, content, canonical_answer=None, question=None):
+        self.id = content
+        self.score = score
+        self.metadata = {'content': content, 'category': 'Hours', 'title': 'Hours'}
+        if canonical_answer:
+            self.metadata['canonical_answer'] = canonical_answer
+        if question:
+            self.metadata['question'] = question
+
+
+def install_fakes(monkeypatch, score, formatted="We are open from 9am to 7pm."):
+    class FakeEmbedder:
+        async def embed(self, text):
+            await asyncio.sleep(0.05)
+            return [0.1] * 384
+
+    class FakeVectorStore:
+        async def query_async(self, vector, **kwargs):
+            await asyncio.sleep(0.05)
+            return [FakeResult(score, "Open 9am to 7pm")]
+
+    async def fake_formatter(vectorstore_text, user_query, **kwargs):
+        await asyncio.sleep(0.05)
+        return formatted
+
+    monkeypatch.setattr(tools, "get_embedder", FakeEmbedder)
+    monkeypatch.setattr(tools, "get_vector_store", FakeVectorStore)
+    monkeypatch.setattr(tools, "format_response_with_ai_async", fake_formatter)
+    monkeypatch.setattr(tools, "get_lexical_index", lambda namespace: BM25Index())
+    cache = QueryCache()
+    monkeypatch.setattr(tools, "get_query_cache", lambda namespace=None: cache)
+    return cache
+
+
+async def test_query_knowledge_base_returns_formatted_answer(monkeypatch):
+    install_fakes(monkeypatch, score=0.9)
+    result = await tools.query_knowledge_base(MockRunContext(), "What are your hours?")
+    assert result == "We are open from 9am to 7pm."
+
+
+async def test_default_tenant_is_loaded_off_the_event_loop(monkeypatch):
+    install_fakes(monkeypatch, score=0.9)
+    threads = []
+
+    class RecordingRegistry:
+        def get(self):
+            threads.append(threading.current_thread())
+            return Tenant(tenant_id="default", name="Default", namespace=None)
+
+    monkeypatch.setattr(tools, "get_tenant_registry", RecordingRegistry)
+    await tools.query_knowledge_base(MockRunContext(), "What are your hours?")
+    assert threads and threads[0] is not threading.current_thread()
+
+
+async def test_query_knowledge_base_low_score_falls_back(monkeypatch):
+    install_fakes(monkeypatch, score=0.2)
+    result = await tools.query_knowledge_base(MockRunContext(), "Distance to the moon?")
+    assert result == "No relevant information found"
+
+
+async def test_concurrent_lookups_do_not_block_event_loop(monkeypatch):
+    """Ten lookups with three 50ms service calls each should overlap rather than serialize"""
+    install_fakes(monkeypatch, score=0.9)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    results = await asyncio.gather(
+        *(tools.query_knowledge_base(MockRunContext(), f"hours {i}") for i in range(10))
+    )
+    assert len(results) == 10
+    assert loop.time() - start < 1.0
+
+
+async def test_repeated_query_is_served_from_cache(monkeypatch):
+    cache = install_fakes(monkeypatch, score=0.9)
+    await tools.query_knowledge_base(MockRunContext(), "What are your hours?")
+    result = await tools.query_knowledge_base(MockRunContext(), "what are your hours")
+    assert result == "We are open from 9am to 7pm."
+    assert cache.stats()['hits_exact'] == 1
+
+
+class FakeSession:
+    def __init__(self):
+        self.spoken = []
+
+    def say(self, text):
+        self.spoken.append(text)
+
+
+class SessionRunContext:
+    def __init__(self):
+        self.session = FakeSession()
+
+
+async def test_raw_mode_skips_formatter(monkeypatch):
+    install_fakes(monkeypatch, score=0.9)
+    monkeypatch.setenv("KB_RESPONSE_MODE", "raw")
+
+    async def fail_formatter(*args, **kwargs):
+        raise AssertionError("formatter must not be called in raw mode")
+
+    monkeypatch.setattr(tools, "format_response_with_ai_async", fail_formatter)
+    result = await tools.query_knowledge_base(MockRunContext(), "What are your hours?")
+    assert "Open 9am to 7pm" in result
+
+
+async def test_stream_mode_speaks_sentences_and_stops_agent_reply(monkeypatch):
+    cache = install_fakes(monkeypatch, score=0.9)
+    monkeypatch.setenv("KB_RESPONSE_MODE", "stream")
+
+    async def fake_stream(vectorstore_text, user_query, **kwargs):
+        for sentence in ["We open at 9am. ", "We close at 7pm."]:
+            yield sentence
+
+    monkeypatch.setattr(tools, "stream_response_with_ai", fake_stream)
+    context = SessionRunContext()
+    with pytest.raises(StopResponse):
+        await tools.query_knowledge_base(context, "What are your hours?")
+
+    spoken = [sentence async for sentence in context.session.spoken[0]]
+    assert spoken == ["We open at 9am. ", "We close at 7pm."]
+    assert cache.get_exact("What are your hours?") == "We open at 9am. We close at 7pm."
+
+
+async def test_stream_mode_with_blank_answer_falls_back(monkeypatch):
+    install_fakes(monkeypatch, score=0.9)
+    monkeypatch.setenv("KB_RESPONSE_MODE", "stream")
+
+    async def empty_stream(vectorstore_text, user_query, **kwargs):
+        return
+        yield
+
+    monkeypatch.setattr(tools, "stream_response_with_ai", empty_stream)
+    context = SessionRunContext()
+    result = await tools.query_knowledge_base(context, "What are your hours?")
+    assert result == "No relevant information found"
+    assert context.session.spoken == []
+
+
+async def test_stream_mode_formatter_failure_returns_raw_results(monkeypatch):
+    install_fakes(monkeypatch, score=0.9)
+    monkeypatch.setenv("KB_RESPONSE_MODE", "stream")
+
+    async def failing_stream(vectorstore_text, user_query, **kwargs):
+        raise RuntimeError("Groq unavailable")
+        yield
+
+    monkeypatch.setattr(tools, "stream_response_with_ai", failing_stream)
+    context = SessionRunContext()
+    result = await tools.query_knowledge_base(context, "What are your hours?")
+    assert "Open 9am to 7pm" in result
+    assert context.session.spoken == []
+
+
+async def test_tenant_from_userdata_selects_namespace_and_persona(monkeypatch):
+    install_fakes(monkeypatch, score=0.9)
+    namespaces, personas = [], []
+
+    class TenantVectorStore:
+        async def query_async(self, vector, namespace=None, **kwargs):
+            namespaces.append(namespace)
+            return [FakeResult(0.9, "Open 10am to 6pm")]
+
+    async def tenant_formatter(vectorstore_text, user_query, system_message=None, **kwargs):
+        personas.append(system_message)
+        return "We open at 10am."
+
+    monkeypatch.setattr(tools, "get_vector_store", TenantVectorStore)
+    monkeypatch.setattr(tools, "format_response_with_ai_async", tenant_formatter)
+
+    context = MockRunContext()
+    context.userdata = tools.CallState(
+        tenant=Tenant(tenant_id="glow", name="Glow", namespace="glow", formatter_instruction="You are Ava at Glow.")
+    )
+    result = await tools.query_knowledge_base(context, "When do you open?")
+    assert result == "We open at 10am."
+    assert namespaces == ["glow"]
+    assert personas == ["You are Ava at Glow."]
+
+
+async def test_interleaved_calls_record_questions_on_their_own_sessions(tmp_path):
+    """Two calls in one process escalate questions in turn; each lands on its own session row"""
+    from dbDrivers.session_operations import SessionOperations
+
+    sessions = SessionOperations(str(tmp_path / "members.db"))
+    tenant = Tenant(tenant_id="default", name="Default", namespace="salon", sessions=sessions)
+    calls = {}
+    for session_id, phone_number in (("call-a", "+15550000001"), ("call-b", "+15550000002")):
+        sessions.add_member_session(phone_number, session_id)
+        context = MockRunContext()
+        context.userdata = tools.CallState(tenant=tenant, session_id=session_id, phone_number=phone_number)
+        calls[session_id] = context
+
+    async def caller(session_id, delay):
+        for i in range(3):
+            await asyncio.sleep(delay)
+            await tools.text_supervisor(calls[session_id], f"{session_id} question {i}")
+
+    # Staggered sleeps interleave the two calls' tool invocations
+    await asyncio.gather(caller("call-a", 0.01), caller("call-b", 0.015))
+
+    for session_id in calls:
+        questions = sessions.get_session_by_id(session_id)['question'].split(",")
+        assert questions == [f"{session_id} question {i}" for i in range(3)]
+    sessions.close()
+
+
+async def test_bound_call_is_task_local():
+    """Without userdata, each task sees the call it bound, not the one bound last"""
+    seen = {}
+
+    async def call(session_id):
+        tools.bind_call(tools.CallState(tenant=Tenant(tenant_id="default", name="Default", namespace="salon"),
+                                        session_id=session_id))
+        await asyncio.sleep(0.01)
+        seen[session_id] = tools._call_state(MockRunContext()).session_id
+
+    await asyncio.gather(call("call-a"), call("call-b"))
+    assert seen == {"call-a": "call-a", "call-b": "call-b"}
+    assert tools.current_call.get() is None
+
+
+async def test_strong_lexical_match_answers_below_vector_threshold(monkeypatch):
+    """An exact-term question answers from the BM25 hit instead of escalating to the supervisor"""
+    install_fakes(monkeypatch, score=0.55)
+    contents = []
+
+    async def fake_formatter(vectorstore_text, user_query, **kwargs):
+        contents.append(vectorstore_text)
+        return "You can reach us at (555) 010-2030."
+
+    index = BM25Index({"contact": {'title': "Contact", 'content': "Phone number: (555) 010-2030"}})
+    monkeypatch.setattr(tools, "get_lexical_index", lambda namespace: index)
+    monkeypatch.setattr(tools, "format_response_with_ai_async", fake_formatter)
+
+    result = await tools.query_knowledge_base(MockRunContext(), "What is your phone number?")
+    assert result == "You can reach us at (555) 010-2030."
+    assert "Phone number: (555) 010-2030" in contents[0]
+
+
+async def test_weak_lexical_match_still_falls_back(monkeypatch):
+    install_fakes(monkeypatch, score=0.55)
+    index = BM25Index({"contact": {'title': "Contact", 'content': "Phone number: (555) 010-2030"}})
+    monkeypatch.setattr(tools, "get_lexical_index", lambda namespace: index)
+
+    result = await tools.query_knowledge_base(MockRunContext(), "Do you validate parking for the number 9 garage?")
+    assert result == "No relevant information found"
+
+
+def install_canonical_store(monkeypatch, score):
+    class CanonicalVectorStore:
+        async def query_async(self, vector, **kwargs):
+            return [FakeResult(score, "Q: What are your hours?\nA: Mon-Sun 9am-7pm",
+                               canonical_answer="We are open every day from 9am to 7pm.", question="What are your hours?")]
+
+    monkeypatch.setattr(tools, "get_vector_store", CanonicalVectorStore)
+
+
+async def test_query_asking_the_stored_question_serves_precomputed_answer_without_llm(monkeypatch):
+    install_fakes(monkeypatch, score=0.75)
+    install_canonical_store(monkeypatch, score=0.75)
+
+    async def fail_formatter(*args, **kwargs):
+        raise AssertionError("formatter must not be called for a precomputed answer")
+
+    monkeypatch.setattr(tools, "format_response_with_ai_async", fail_formatter)
+    result = await tools.query_knowledge_base(MockRunContext(), "what are the hours")
+    assert result == "We are open every day from 9am to 7pm."
+
+
+async def test_different_question_on_a_strong_match_still_goes_through_formatter(monkeypatch):
+    install_fakes(monkeypatch, score=0.95)
+    install_canonical_store(monkeypatch, score=0.95)
+    result = await tools.query_knowledge_base(MockRunContext(), "Are you open late on holidays?")
+    assert result == "We are open from 9am to 7pm."
+
+
+@pytest.mark.parametrize("query", [
+    "How much is a deep tissue massage?",
+    "Can I bring my children to the spa?",
+    "How much is the no-show fee?",
+])
+async def test_multi_topic_chunk_summary_is_not_served_for_its_full_lexical_matches(monkeypatch, query):
+    """Every query term appears in one chunk of the real salon data, but its summary does not answer the query"""
+    sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "IngestSalonData"))
+    import ingest_data
+
+    with open(os.path.join(os.path.dirname(ingest_data.__file__), "salon_data.txt"), encoding="utf-8") as f:
+        sections = list(ingest_data.iter_unique_sections(ingest_data.iter_sections(f), {}))
+    index = BM25Index({
+        section['id']: {**section, 'canonical_answer': f"A summary of {section['category']}."}
+        for section in sections
+    })
+    top = index.search(query, top_k=1)[0]
+    assert top.coverage == 1.0
+
+    install_fakes(monkeypatch, score=0.9, formatted="The formatter answered.")
+
+    class ChunkVectorStore:
+        async def query_async(self, vector, **kwargs):
+            return [top]
+
+    monkeypatch.setattr(tools, "get_vector_store", ChunkVectorStore)
+    monkeypatch.setattr(tools, "get_lexical_index", lambda namespace: index)
+    assert await tools.query_knowledge_base(MockRunContext(), query) == "The formatter answered."
+
+
+async def test_tool_uses_speculative_retrieval_from_transcript(monkeypatch):
+    install_fakes(monkeypatch, score=0.9)
+    embedded = []
+
+    class CountingEmbedder:
+        async def embed(self, text):
+            embedded.append(text)
+            await asyncio.sleep(0.05)
+            return [0.1] * 384
+
+    monkeypatch.setattr(tools, "get_embedder", CountingEmbedder)
+    context = MockRunContext()
+    context.userdata = tools.CallState(
+        tenant=Tenant(tenant_id="default", name="Default", namespace="salon"),
+        prefetch=RetrievalPrefetcher(lambda text: tools.prefetch_retrieval("salon", text))
+    )
+    context.userdata.prefetch.on_transcript("what time do you open", is_final=True)
+    await asyncio.sleep(0.2)
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    result = await tools.query_knowledge_base(context, "What time do you open?")
+    assert result == "We are open from 9am to 7pm."
+    assert embedded == ["what time do you open"]
+    # Only the formatter call remains on the tool's critical path
+    assert loop.time() - start < 0.09
+    # The transcript's embedding does not key the semantic cache; the answer is kept for exact repeats
+    cache = tools.get_query_cache("salon")
+    assert cache.get_similar("What time do you open?", [0.1] * 384) is None
+    assert cache.get_exact("What time do you open?") == "We are open from 9am to 7pm."
+
+
+class AudioSession:
+    def __init__(self):
+        self.said = []
+
+    def say(self, text, audio=None):
+        self.said.append((text, audio))
+
+
+async def test_pre_synthesized_answer_is_played_from_tts_cache(monkeypatch, tmp_path):
+    install_fakes(monkeypatch, score=0.9)
+    install_canonical_store(monkeypatch, score=0.9)
+    audio_cache = TTSAudioCache(voice="freya", model="sonic-2", root=str(tmp_path))
+    audio_cache.put("We are open every day from 9am to 7pm.", b"\x00\x01" * 960)
+
+    context = MockRunContext()
+    context.session = AudioSession()
+    context.userdata = tools.CallState(
+        tenant=Tenant(tenant_id="default", name="Default", namespace="salon"), audio_cache=audio_cache
+    )
+    with pytest.raises(StopResponse):
+        await tools.query_knowledge_base(context, "What are your hours?")
+    text, audio = context.session.said[0]
+    assert text == "We are open every day from 9am to 7pm."
+    assert len([frame async for frame in audio]) == 2
+
+
+async def test_supervisor_fallback_plays_cached_clip_or_returns_text(tmp_path):
+    audio_cache = TTSAudioCache(voice="freya", model="sonic-2", root=str(tmp_path))
+    context = MockRunContext()
+    context.session = AudioSession()
+    context.userdata = tools.CallState(
+        tenant=Tenant(tenant_id="default", name="Default", namespace="salon"), audio_cache=audio_cache
+    )
+    assert await tools.text_supervisor(context, "Do you sell gift cards?") == tools.SUPERVISOR_FALLBACK_RESPONSE
+
+    audio_cache.put(tools.SUPERVISOR_FALLBACK_RESPONSE, b"\x00\x01" * 480)
+    with pytest.raises(StopResponse):
+        await tools.text_supervisor(context, "Do you sell gift cards?")
+    assert context.session.said[0][0] == tools.SUPERVISOR_FALLBACK_RESPONSE
@@ -0,0 +1,95 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from livekit import rtc
+
+from tts_cache import TTSAudioCache
+
+GREETING = "Hi my name is Freya, this is Bliss Salon, how may I help you?"
+
+
+class FakeSynthesizedAudio:
+    def __init__(self, frame):
+        self.frame = frame
+
+
+class FakeStream:
+    def __init__(self, frames):
+        self.frames = frames
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for frame in self.frames:
+            yield FakeSynthesizedAudio(frame)
+
+
+class FakeTTS:
+    """Produces 25ms of a constant sample per character, at 24kHz mono"""
+
+    def __init__(self, sample_rate=24000):
+        self.sample_rate = sample_rate
+        self.synthesized = []
+
+    def synthesize(self, text):
+        self.synthesized.append(text)
+        samples = 600
+        frames = [
+            rtc.AudioFrame(data=bytes([i % 256, 0]) * samples, sample_rate=self.sample_rate,
+                           num_channels=1, samples_per_channel=samples)
+            for i in range(len(text))
+        ]
+        return FakeStream(frames)
+
+
+async def collect(frames):
+    return [frame async for frame in frames]
+
+
+def test_key_depends_on_voice_model_and_text_not_whitespace(tmp_path):
+    cache = TTSAudioCache(voice="freya", model="sonic-2", root=str(tmp_path))
+    assert cache.key("Hello  there") == cache.key(" Hello there ")
+    assert cache.key("Hello there") != cache.key("Hello there!")
+    assert cache.key("Hello") != TTSAudioCache(voice="ava", model="sonic-2", root=str(tmp_path)).key("Hello")
+    assert cache.key("Hello") != TTSAudioCache(voice="freya", model="sonic-3", root=str(tmp_path)).key("Hello")
+
+
+async def test_cached_clip_plays_back_as_20ms_frames(tmp_path):
+    cache = TTSAudioCache(voice="freya", model="sonic-2", root=str(tmp_path))
+    assert cache.frames(GREETING) is None
+
+    pcm = bytes(range(256)) * 30  # 7680 bytes = 3840 samples = 160ms at 24kHz
+    cache.put(GREETING, pcm)
+    frames = await collect(cache.frames(GREETING))
+
+    assert [frame.samples_per_channel for frame in frames] == [480] * 8
+    assert b"".join(bytes(frame.data.cast("B")) for frame in frames) == pcm
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert len(await collect(cache.frames(GREETING))) == 8
+
+
+async def test_prepopulate_synthesizes_only_missing_clips(tmp_path):
+    cache = TTSAudioCache(voice="freya", model="sonic-2", root=str(tmp_path))
+    tts = FakeTTS()
+
+    added = await cache.prepopulate(tts, [GREETING, "Let me check with my supervisor.", GREETING, " "])
+    assert added == 2
+    assert await cache.prepopulate(tts, [GREETING, "We open at 9am."]) == 1
+    assert tts.synthesized == [GREETING, "Let me check with my supervisor.", "We open at 9am."]
+
+    frames = await collect(cache.frames("We open at 9am."))
+    assert sum(frame.samples_per_channel for frame in frames) == 600 * len("We open at 9am.")
+
+
+async def test_mismatched_sample_rate_is_not_cached(tmp_path):
+    cache = TTSAudioCache(voice="freya", model="sonic-2", root=str(tmp_path))
+    assert await cache.prepopulate(FakeTTS(sample_rate=16000), [GREETING]) == 0
+    assert not cache.contains(GREETING)
@@ -0,0 +1,100 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils
+
+
+class FakeDelta:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeChoice:
+    def __init__(self, content):
+        self.delta = FakeDelta(content)
+
+
+class FakeChunk:
+    def __init__(self, content):
+        self.choices = [FakeChoice(content)]
+
+
+def fake_groq(tokens):
+    async def token_stream():
+        for token in tokens:
+            yield FakeChunk(token)
+
+    class FakeCompletions:
+        async def create(self, **kwargs):
+            assert kwargs["stream"] is True
+            return token_stream()
+
+    class FakeChat:
+        completions = FakeCompletions()
+
+    class FakeGroq:
+        chat = FakeChat()
+
+    class FakeClients:
+        groq = FakeGroq()
+
+    return lambda: FakeClients
+
+
+async def test_stream_response_yields_complete_sentences(monkeypatch):
+    monkeypatch.setattr(utils, "get_clients", fake_groq(["We open", " at 9am.", " We close", " at 7pm", "!", None]))
+    sentences = [s async for s in utils.stream_response_with_ai("hours", "When are you open?")]
+    assert sentences == ["We open at 9am. ", "We close at 7pm!"]
+
+
+async def test_stream_response_yields_nothing_for_blank_answer(monkeypatch):
+    monkeypatch.setattr(utils, "get_clients", fake_groq(["", None]))
+    sentences = [s async for s in utils.stream_response_with_ai("hours", "Distance to the moon?")]
+    assert sentences == []
+
+
+def test_canonical_answer_is_tts_ready(monkeypatch):
+    monkeypatch.setattr(utils, "format_response_with_ai", lambda *args, **kwargs: "**Hours:**\n- Open 9am to 7pm daily.")
+    assert utils.canonical_answer("Hours: 9-7", "When are you open?") == "Hours: Open 9am to 7pm daily."
+
+
+def test_canonical_answer_skips_formatter_failures(monkeypatch):
+    monkeypatch.setattr(utils, "format_response_with_ai", lambda *args, **kwargs: utils.FORMATTER_FALLBACK_RESPONSE)
+    assert utils.canonical_answer("Hours: 9-7", "When are you open?") == ""
+
+
+async def test_concurrent_calls_log_to_their_own_files(tmp_path, monkeypatch):
+    import asyncio
+    import logging
+    from latency_metrics import bind_session
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(utils, "_console_handler", None)
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+
+    async def call(session_id, started, other_started):
+        bind_session(session_id)
+        utils.setup_logging(session_id)
+        started.set()
+        # Both calls are set up before either logs, as when two calls overlap in one worker
+        await other_started.wait()
+        logging.info(f"question from {session_id}")
+        await asyncio.sleep(0)
+        logging.info(f"answer for {session_id}")
+        utils.teardown_session_logging(session_id)
+
+    a_started, b_started = asyncio.Event(), asyncio.Event()
+    try:
+        await asyncio.gather(call("call-a", a_started, b_started), call("call-b", b_started, a_started))
+        logging.info("logged after both calls ended")
+    finally:
+        root.handlers[:] = handlers
+        root.setLevel(level)
+
+    for session_id, other in (("call-a", "call-b"), ("call-b", "call-a")):
+        log = (tmp_path / "logs" / f"ai_receptionist_{session_id}.log").read_text(encoding="utf-8")
+        assert f"question from {session_id}" in log and f"answer for {session_id}" in log
+        assert other not in log
+        assert "after both calls ended" not in log
@@ -0,0 +1,67 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vector_store import LocalVectorStore
+
+
+def make_vector(id, vector, content):
+    return {"id": id, "vector": vector, "metadata": {'content': content}, "data": content}
+
+
+def test_local_store_returns_cosine_top_k(tmp_path):
+    store = LocalVectorStore(str(tmp_path))
+    store.upsert([
+        make_vector("hours", [1.0, 0.0, 0.0], "Open 9am to 7pm"),
+        make_vector("phone", [0.0, 1.0, 0.0], "Call 555-0100"),
+        make_vector("prices", [0.0, 0.0, 1.0], "Haircut $40"),
+    ], namespace="salon")
+
+    results = store.query([0.9, 0.1, 0.0], top_k=2, namespace="salon")
+    assert [r.id for r in results] == ["hours", "phone"]
+    assert results[0].score > 0.99
+    assert results[0].metadata['content'] == "Open 9am to 7pm"
+
+
+def test_local_store_upsert_replaces_and_delete_removes(tmp_path):
+    store = LocalVectorStore(str(tmp_path))
+    store.upsert([make_vector("hours", [1.0, 0.0], "old")], namespace="salon")
+    store.upsert([make_vector("hours", [1.0, 0.0], "new"), make_vector("phone", [0.0, 1.0], "555")], namespace="salon")
+    assert store.query([1.0, 0.0], top_k=1, namespace="salon")[0].metadata['content'] == "new"
+
+    assert store.delete(["hours"], namespace="salon") == 1
+    assert [r.id for r in store.query([1.0, 0.0], top_k=5, namespace="salon")] == ["phone"]
+
+
+def test_other_process_writes_are_visible_and_reset_clears(tmp_path):
+    reader = LocalVectorStore(str(tmp_path))
+    writer = LocalVectorStore(str(tmp_path))
+    assert reader.query([1.0, 0.0], namespace="salon") == []
+
+    writer.upsert([make_vector("hours", [1.0, 0.0], "Open 9am")], namespace="salon")
+    assert reader.query([1.0, 0.0], namespace="salon")[0].id == "hours"
+
+    writer.reset(namespace="salon")
+    assert reader.query([1.0, 0.0], namespace="salon") == []
+
+
+def test_writers_in_separate_processes_keep_every_vector(tmp_path):
+    """Each store instance stands in for a process (ingest, server.py): only the file lock orders their writes"""
+    import threading
+
+    LocalVectorStore(str(tmp_path)).upsert([make_vector("seed", [1.0, 0.0], "seed")], namespace="salon")
+
+    def writer(i):
+        store = LocalVectorStore(str(tmp_path))
+        for j in range(5):
+            store.upsert([make_vector(f"doc{i}-{j}", [float(i + 1), float(j)], "text")], namespace="salon")
+        store.delete(["seed"], namespace="salon")
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ids = {match.id for match in LocalVectorStore(str(tmp_path)).query([1.0, 1.0], top_k=100, namespace="salon")}
+    assert ids == {f"doc{i}-{j}" for i in range(4) for j in range(5)}
@@ -0,0 +1,103 @@
+import asyncio
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import warmup
+from warmup import KeepWarm
+
+
+class FakeEmbedder:
+    name = "fake"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def embed(self, text):
+        self.calls += 1
+        return [0.1] * 384
+
+
+class FakeVectorStore:
+    name = "fake"
+
+    def __init__(self):
+        self.namespaces = []
+
+    async def query_async(self, vector, top_k=3, namespace=None, **kwargs):
+        self.namespaces.append(namespace)
+        return []
+
+
+def install_fakes(monkeypatch):
+    embedder, store = FakeEmbedder(), FakeVectorStore()
+    monkeypatch.setattr(warmup, "get_embedder", lambda: embedder)
+    monkeypatch.setattr(warmup, "get_vector_store", lambda: store)
+    monkeypatch.setattr(warmup, "resolve_namespace", lambda namespace: namespace)
+    return embedder, store
+
+
+async def test_keep_warm_runs_immediately_and_repeats(monkeypatch):
+    embedder, store = install_fakes(monkeypatch)
+    keep_warm = KeepWarm(lambda: ["salon", "glow", "salon"], interval=0.02)
+    keep_warm.ensure_running()
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert embedder.calls == 1
+    assert sorted(store.namespaces) == ["glow", "salon"]
+
+    await asyncio.sleep(0.07)
+    keep_warm.stop()
+    assert keep_warm.rounds >= 3
+
+
+async def test_keep_warm_starts_once_per_loop(monkeypatch):
+    install_fakes(monkeypatch)
+    keep_warm = KeepWarm(lambda: ["salon"], interval=10)
+    first = keep_warm.ensure_running()
+    assert keep_warm.ensure_running() is first
+    keep_warm.stop()
+
+
+async def test_keep_warm_survives_backend_errors(monkeypatch):
+    embedder, store = install_fakes(monkeypatch)
+
+    async def failing_embed(text):
+        raise ConnectionError("cold start timeout")
+
+    monkeypatch.setattr(embedder, "embed", failing_embed)
+    keep_warm = KeepWarm(lambda: ["salon"], interval=0.01)
+    keep_warm.ensure_running()
+    await asyncio.sleep(0.05)
+    keep_warm.stop()
+    assert keep_warm.rounds >= 2
+    assert store.namespaces
+
+
+def test_common_utterances_collects_greetings_and_precomputed_answers(tmp_path, monkeypatch):
+    import json
+    from tenants import TenantRegistry
+    from lexical_index import BM25Index
+
+    config = tmp_path / "tenants.json"
+    config.write_text(json.dumps({"tenants": {
+        "bliss": {"namespace": "bliss", "greeting": "Welcome to Bliss."},
+        "glow": {"namespace": "glow", "greeting": "Welcome to Glow."},
+    }}), encoding="utf-8")
+    indexes = {
+        "bliss": BM25Index({
+            "hours": {'content': "9-7", 'question': "When do you open?", 'canonical_answer': "We open at 9am."},
+            "raw": {'content': "x"},
+            "chunk": {'content': "9-7, $50", 'canonical_answer': "We have hours and prices."},
+        }),
+        "glow": BM25Index({"hours": {'content': "10-6", 'question': "When do you open?", 'canonical_answer': "We open at 10am."}}),
+    }
+    monkeypatch.setattr(warmup, "get_tenant_registry", lambda: TenantRegistry(config_path=str(config)))
+    monkeypatch.setattr(warmup, "get_lexical_index", lambda namespace: indexes.get(namespace, BM25Index()))
+    monkeypatch.setattr(warmup, "resolve_namespace", lambda namespace: namespace)
+
+    utterances = warmup.common_utterances(["Let me check with my supervisor."])
+    assert utterances[0] == "Let me check with my supervisor."
+    assert {"Welcome to Bliss.", "Welcome to Glow.", "We open at 9am.", "We open at 10am."} <= set(utterances)
+    assert "We have hours and prices." not in utterances
+    assert len(warmup.common_utterances(["Let me check with my supervisor."], limit=2)) == 2
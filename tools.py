@@ -1,16 +1,195 @@
+import asyncio
+import contextvars
 import logging
+from dataclasses import dataclass
+from typing import Optional
 from livekit.agents import function_tool, RunContext
-from dbDrivers.session_operations import SessionOperations
+from livekit.agents.llm import StopResponse
+from dbDrivers.session_writer import get_session_writer
 import os
-from upstash_vector import Index
 import json
-from utils import format_response_with_ai, setup_logging, get_huggingface_embedding
+from vector_store import get_vector_store, resolve_namespace
+from utils import format_response_with_ai_async, stream_response_with_ai, setup_logging, FORMATTER_FALLBACK_RESPONSE
+from embeddings import get_embedder
+from query_cache import get_query_cache
+from latency_metrics import span
+from lexical_index import get_lexical_index, reciprocal_rank_fusion, tokenize
+from tenants import Tenant, get_tenant_registry
+from prefetch import RetrievalPrefetcher
+from tts_cache import TTSAudioCache
 
-db = SessionOperations()
+NO_RELEVANT_INFORMATION = "No relevant information found"
+SUPERVISOR_FALLBACK_RESPONSE = "I don't have specific information about that in our spa knowledge base. Let me check with my supervisor, I will get back to you over text message."
 
-# Global variable to store current session_id
-current_session_id = None
-current_phone_number = None
+
+@dataclass
+class CallState:
+    """Per-call state carried on AgentSession.userdata and read by the tools"""
+    tenant: Tenant
+    session_id: Optional[str] = None
+    phone_number: Optional[str] = None
+    prefetch: Optional[RetrievalPrefetcher] = None
+    audio_cache: Optional[TTSAudioCache] = None
+
+
+# Fallback for code paths without a RunContext; tasks started by a call inherit it
+current_call: contextvars.ContextVar[Optional[CallState]] = contextvars.ContextVar("current_call", default=None)
+
+
+def bind_call(state: CallState):
+    """Make `state` the call state of the current task (and tasks it starts)"""
+    return current_call.set(state)
+
+
+def _call_state(context: RunContext) -> Optional[CallState]:
+    """State of the call behind a tool invocation: the session's userdata, else the task's bound call"""
+    try:
+        state = context.userdata
+    except (AttributeError, ValueError):
+        state = None
+    if isinstance(state, CallState):
+        return state
+    return current_call.get()
+
+
+async def _tenant(context: RunContext) -> Tenant:
+    """Tenant of the call behind a tool invocation (the default tenant outside an agent session)"""
+    state = _call_state(context)
+    if state is not None:
+        return state.tenant
+    # Loading a tenant opens (and may migrate) its SQLite database; keep that off the event loop
+    return await asyncio.to_thread(get_tenant_registry().get)
+
+
+def _response_mode() -> str:
+    """
+    How knowledge-base answers reach the caller (KB_RESPONSE_MODE):
+    - "format": Groq formats the answer and the agent LLM relays it (default)
+    - "stream": Groq's answer is streamed sentence by sentence straight to TTS
+    - "raw": the retrieved chunks go to the agent LLM without a second LLM hop
+    """
+    return os.getenv("KB_RESPONSE_MODE", "format").lower()
+
+
+def _lexical_min_coverage() -> float:
+    """Share of the query's terms a lexical hit must contain to count as relevant (LEXICAL_MIN_COVERAGE)"""
+    return float(os.getenv("LEXICAL_MIN_COVERAGE", "0.75"))
+
+
+def _question_overlap(query: str, question: str) -> float:
+    """Jaccard similarity of the query's and a stored question's terms"""
+    terms, question_terms = set(tokenize(query)), set(tokenize(question))
+    if not terms or not question_terms:
+        return 0.0
+    return len(terms & question_terms) / len(terms | question_terms)
+
+
+def _canonical_answer(query: str, vector_results, lexical_results) -> Optional[str]:
+    """
+    Precomputed answer of a top match holding a single question (a resolved Q&A pair)
+    when the query asks that question: their terms overlap by at least
+    CANONICAL_MIN_QUESTION_OVERLAP. A knowledge-base chunk covers many topics, so a
+    summary of it would leave out the price or policy the caller asked about.
+    """
+    min_overlap = float(os.getenv("CANONICAL_MIN_QUESTION_OVERLAP", "0.75"))
+    for results in (vector_results, lexical_results):
+        top = results[0] if results else None
+        if top is None or not top.metadata:
+            continue
+        question, answer = top.metadata.get('question'), top.metadata.get('canonical_answer')
+        if question and answer and _question_overlap(query, question) >= min_overlap:
+            return answer
+    return None
+
+
+def _raw_response(results, limit: int = 2) -> str:
+    """Plain-text rendering of the top vector results"""
+    response = "Based on our spa information:\n\n"
+    for result in results[:limit]:
+        if result.metadata:
+            content = result.metadata.get('content', 'No content available')
+            category = result.metadata.get('category', '')
+            title = result.metadata.get('title', '')
+
+            # Add some structure to the response
+            if title and title != category:
+                response += f"{title}\n"
+            response += f"{content}\n\n"
+    return response.strip()
+
+
+def _cached_audio(context: RunContext, text: str):
+    """Pre-synthesized frames for `text` from the call's TTS cache, or None"""
+    state = _call_state(context)
+    if state is None or state.audio_cache is None:
+        return None
+    return state.audio_cache.frames(text)
+
+
+def _deliver(context: RunContext, answer: str) -> str:
+    """
+    Return an answer to the agent LLM, or speak it directly and end the turn: from the
+    TTS cache when the exact sentence is pre-synthesized, and always in stream mode.
+    """
+    audio = _cached_audio(context, answer)
+    if audio is not None:
+        context.session.say(answer, audio=audio)
+        raise StopResponse()
+    if _response_mode() == "stream":
+        context.session.say(answer)
+        raise StopResponse()
+    return answer
+
+
+async def _speak_streamed_answer(context: RunContext, cache, query: str, query_embedding, combined_content: str,
+                                 system_message: str) -> bool:
+    """
+    Stream the formatter's answer to TTS sentence by sentence.
+    Returns False without speaking if the formatter had nothing to say.
+    """
+    sentences = stream_response_with_ai(combined_content, query, system_message=system_message)
+    with span("llm_format_first_sentence"):
+        first_sentence = await anext(sentences, None)
+    if first_sentence is None:
+        return False
+
+    async def playout():
+        spoken = [first_sentence]
+        yield first_sentence
+        try:
+            async for sentence in sentences:
+                spoken.append(sentence)
+                yield sentence
+        except Exception as e:
+            logging.error(f"Streaming AI response interrupted: {e}")
+            return
+        answer = "".join(spoken).strip()
+        logging.info(f"Ai's streamed response: {answer}")
+        cache.put(query, query_embedding, answer)
+
+    context.session.say(playout())
+    return True
+
+
+async def _vector_search(physical_namespace: Optional[str], query_embedding) -> list:
+    """Top knowledge-base matches from the configured vector store (pooled Upstash client or the local index)"""
+    return await get_vector_store().query_async(
+        vector=query_embedding,
+        top_k=3,
+        include_metadata=True,
+        include_vectors=False,
+        namespace=physical_namespace
+    )
+
+
+async def prefetch_retrieval(namespace: Optional[str], text: str) -> tuple:
+    """
+    Speculative half of query_knowledge_base for a caller transcript: the embedding and
+    vector matches, computed while the agent LLM is still deciding to call the tool.
+    """
+    with span("prefetch_retrieval"):
+        embedding = await get_embedder().embed(text)
+        return embedding, await _vector_search(resolve_namespace(namespace), embedding)
 
 
 @function_tool()
@@ -27,76 +206,129 @@ async def query_knowledge_base(
     """
     try:
         logging.info(f"query_knowledge_base called with query: {query}")
-        # Initialize Upstash Vector client
-        vector_client = Index(
-            url=os.getenv("UPSTASH_VECTOR_REST_URL"),
-            token=os.getenv("UPSTASH_VECTOR_REST_TOKEN")
+        tenant = await _tenant(context)
+        namespace = tenant.namespace
+        response_mode = _response_mode()
+        cache = get_query_cache(namespace)
+
+        # Repeated questions (hours, prices, phone number) are answered from the cache
+        cached_response = cache.get_exact(query) if response_mode != "raw" else None
+        if cached_response:
+            logging.info(f"Query cache hit (exact) for query: {query}")
+            return _deliver(context, cached_response)
+
+        # A retrieval started from the caller's transcript may already be done (or in flight)
+        state = _call_state(context)
+        prefetched = await state.prefetch.lookup(query) if state is not None and state.prefetch is not None else None
+        if prefetched is not None:
+            logging.info(f"Using speculative retrieval for query: {query}")
+            # The prefetch embedded the caller's transcript, not this query: its matches are reused, but its
+            # embedding must not key the semantic cache, so the answer is cached for exact repeats only
+            _, results = prefetched
+            query_embedding = None
+        else:
+            # Get embedding for the query from the configured backend (HF API or local model)
+            with span("embedding"):
+                query_embedding = await get_embedder().embed(query)
+
+        cached_response = (
+            cache.get_similar(query, query_embedding)
+            if response_mode != "raw" and query_embedding is not None else None
         )
-        
-        # Get embedding for the query using HuggingFace API
-        hf_api_key = os.getenv("HUGGINGFACE_API_KEY")
-        query_embedding = get_huggingface_embedding(query, hf_api_key)
+        if cached_response:
+            logging.info(f"Query cache hit (similar) for query: {query}")
+            return _deliver(context, cached_response)
         
         # Query the vector database using vector embedding with namespace
-        namespace = os.getenv("NAMESPACE")
-        results = vector_client.query(
-            vector=query_embedding,
-            top_k=3,
-            include_metadata=True,
-            include_vectors=False,
-            namespace=namespace
-        )
+        physical_namespace = resolve_namespace(namespace)
+        if prefetched is None:
+            with span("vector_query"):
+                results = await _vector_search(physical_namespace, query_embedding)
+
+        # Exact terms (phone number, service names, prices) are matched lexically in-process
+        with span("lexical_query"):
+            lexical_results = get_lexical_index(physical_namespace).search(query, top_k=3)
         
         # Debug logging
         logging.info(f"Query results: {len(results) if results else 0} results found")
         if results and len(results) > 0:
             logging.info(f"Top result score: {results[0].score}")
-        
+        if lexical_results:
+            logging.info(f"Top lexical result coverage: {lexical_results[0].coverage:.2f}")
+
+        vector_hit = bool(results) and results[0].score > 0.7
+        lexical_hit = bool(lexical_results) and lexical_results[0].coverage >= _lexical_min_coverage()
+        # Answers to questions already resolved once were precomputed at ingest; serve them without an LLM call
+        canonical = _canonical_answer(query, results, lexical_results) if vector_hit or lexical_hit else None
+        if canonical:
+            logging.info(f"Serving precomputed answer for query: {query}")
+            cache.put(query, query_embedding, canonical)
+            return _deliver(context, canonical)
+
+        if vector_hit or lexical_hit:
+            # Fuse both rankings so a strong hit from either retriever makes the top results
+            results = reciprocal_rank_fusion(results, lexical_results)[:3]
+
         # Check if we have relevant results (lowered similarity threshold)
-        if results and len(results) > 0 and results[0].score > 0.7:
+        if vector_hit or lexical_hit:
+            # Skip the formatter hop and let the agent LLM phrase the answer itself
+            if response_mode == "raw":
+                logging.info(f"Returning raw vector results for query: {query}")
+                return _raw_response(results, limit=len(results))
+
             # Combine all relevant content for AI formatting
             combined_content = ""
             for result in results:
                 if result.metadata:
                     content = result.metadata.get('content', '')
                     combined_content += f"{content}\n\n"
+
+            if response_mode == "stream":
+                try:
+                    spoken = await _speak_streamed_answer(context, cache, query, query_embedding,
+                                                          combined_content.strip(), tenant.formatter_instruction)
+                except Exception as e:
+                    # Retrieval worked; only the formatter failed, so relay the chunks as the format path does
+                    logging.error(f"AI streaming failed before the first sentence, falling back to raw response: {e}")
+                    return _raw_response(results)
+                if spoken:
+                    logging.info(f"Streaming AI response for query: {query}")
+                    raise StopResponse()
+                logging.info(f"Vector database did not return relevant results")
+                return NO_RELEVANT_INFORMATION
             
             # Use AI formatter to create professional receptionist response
             try:
-                ai_response = format_response_with_ai(combined_content.strip(), query)
+                with span("llm_format"):
+                    ai_response = await format_response_with_ai_async(
+                        combined_content.strip(), query, system_message=tenant.formatter_instruction
+                    )
                 if len(ai_response) == 0:
                     logging.info(f"Vector database did not return relevant results")
-                    return "No relevant information found"
+                    return NO_RELEVANT_INFORMATION
                 else:
                     logging.info(f"Vector database returned relevant results for query: {query}")
                     logging.info(f"Ai's response: {ai_response}")
+                    if ai_response != FORMATTER_FALLBACK_RESPONSE:
+                        cache.put(query, query_embedding, ai_response)
                     return ai_response
             except Exception as e:
                 logging.error(f"AI formatting failed, falling back to raw response: {e}")
                 # Fallback to original formatting if AI fails
-                response = "Based on our spa information:\n\n"
-                for i, result in enumerate(results[:2]):  # Use top 2 results
-                    if result.metadata:
-                        content = result.metadata.get('content', 'No content available')
-                        category = result.metadata.get('category', '')
-                        title = result.metadata.get('title', '')
-                        
-                        # Add some structure to the response
-                        if title and title != category:
-                            response += f"{title}\n"
-                        response += f"{content}\n\n"
-                
                 logging.info(f"Vector database returned relevant results for query: {query}")
-                return response.strip()
+                return _raw_response(results)
         else:
             # No relevant results found, fall back to text_supervisor
             logging.info(f"No relevant results in vector database for query: {query}, falling back to text_supervisor")
-            return "No relevant information found"
-            
+            return NO_RELEVANT_INFORMATION
+
+    except StopResponse:
+        # The answer is already being spoken; the agent LLM should not reply again
+        raise
     except Exception as e:
         logging.error(f"Error querying vector database: {e}")
         # Fall back to text_supervisor on error
-        return "No relevant information found"
+        return NO_RELEVANT_INFORMATION
 
 @function_tool()
 async def text_supervisor(
@@ -110,15 +342,17 @@ async def text_supervisor(
     Args:
         query: The user's question or search query
     """
-    global current_session_id
-    session_id = current_session_id or 'Unknown'
+    state = _call_state(context)
+    session_id = (state.session_id if state else None) or 'Unknown'
     
     logging.info(f"Texting supervisor with query: {query}")
     
     # Update the current session with the question and status
     if session_id != 'Unknown':
         try:
-            update_success = db.update_member_session(session_id, "PENDING", question=query)
+            # Queued to the session writer thread so SQLite locks never stall the event loop
+            with span("db_write", session_id=session_id):
+                update_success = await get_session_writer(state.tenant.sessions).update_member_session(session_id, "PENDING", question=query)
             if update_success:
                 logging.info(f"Updated session {session_id} with question and PENDING status")
             else:
@@ -127,5 +361,10 @@ async def text_supervisor(
             logging.error(f"Error updating session status: {e}")
     else:
         logging.warning("Session ID is unknown, cannot update session status")
-    
-    return "I don't have specific information about that in our spa knowledge base. Let me check with my supervisor, I will get back to you over text message."
\ No newline at end of file
+
+    # The fixed reply is pre-synthesized; play it instead of having the LLM and TTS repeat it
+    audio = _cached_audio(context, SUPERVISOR_FALLBACK_RESPONSE)
+    if audio is not None:
+        context.session.say(SUPERVISOR_FALLBACK_RESPONSE, audio=audio)
+        raise StopResponse()
+    return SUPERVISOR_FALLBACK_RESPONSE
\ No newline at end of file
@@ -0,0 +1,159 @@
+import asyncio
+import hashlib
+import logging
+import mmap
+import os
+import threading
+from typing import AsyncIterator, Callable, Iterable, Optional
+
+import aiohttp
+from livekit import rtc
+
+# Content-addressed PCM clips shared by every worker process on the machine
+TTS_CACHE_DIR = os.getenv(
+    "TTS_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "tts_audio")
+)
+FRAME_MS = 20
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+class TTSAudioCache:
+    """
+    On-disk cache of synthesized speech keyed on (text, voice, model, sample rate).
+
+    Clips are raw 16-bit PCM files named by the key's hash, written once and never
+    changed, so any process can populate them (atomic rename) and readers need no
+    locking. Playback memory-maps a clip and yields 20ms AudioFrames that point into
+    the mapping, so every call replaying a clip shares the same page-cache pages. A
+    clip that is not cached returns None and the caller falls back to live TTS.
+    """
+
+    def __init__(self, voice: str, model: str, sample_rate: int = 24000, num_channels: int = 1,
+                 root: Optional[str] = None):
+        self.voice = voice
+        self.model = model
+        self.sample_rate = sample_rate
+        self.num_channels = num_channels
+        self.root = root or TTS_CACHE_DIR
+        self._maps: dict[str, mmap.mmap] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, text: str) -> str:
+        raw = f"{self.model}\n{self.voice}\n{self.sample_rate}\n{self.num_channels}\n{_normalize(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, text: str) -> str:
+        return os.path.join(self.root, f"{self.key(text)}.pcm")
+
+    def contains(self, text: str) -> bool:
+        return os.path.exists(self._path(text))
+
+    def put(self, text: str, pcm: bytes):
+        """Store a clip of raw s16le PCM for `text`"""
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(text)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(pcm)
+        os.replace(tmp, path)
+
+    def _map(self, path: str) -> Optional[mmap.mmap]:
+        with self._lock:
+            mapping = self._maps.get(path)
+            if mapping is not None:
+                return mapping
+            try:
+                with open(path, "rb") as f:
+                    # The mapping stays valid after the file is closed
+                    mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (FileNotFoundError, ValueError):
+                return None
+            self._maps[path] = mapping
+            return mapping
+
+    def frames(self, text: str) -> Optional[AsyncIterator[rtc.AudioFrame]]:
+        """Cached audio for `text` as frames for AgentSession.say(audio=...), or None on a miss"""
+        mapping = self._map(self._path(text))
+        if mapping is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._play(memoryview(mapping))
+
+    async def _play(self, pcm: memoryview) -> AsyncIterator[rtc.AudioFrame]:
+        samples_per_frame = self.sample_rate * FRAME_MS // 1000
+        step = samples_per_frame * self.num_channels * 2
+        for offset in range(0, len(pcm) - len(pcm) % (2 * self.num_channels), step):
+            chunk = pcm[offset:offset + step]
+            yield rtc.AudioFrame(
+                data=chunk,
+                sample_rate=self.sample_rate,
+                num_channels=self.num_channels,
+                samples_per_channel=len(chunk) // (2 * self.num_channels)
+            )
+
+    async def synthesize(self, tts, text: str) -> bool:
+        """Synthesize `text` with a LiveKit TTS and store it; returns False if nothing was produced"""
+        pcm = bytearray()
+        async with tts.synthesize(text) as stream:
+            async for audio in stream:
+                frame = audio.frame
+                if frame.sample_rate != self.sample_rate or frame.num_channels != self.num_channels:
+                    raise ValueError(f"TTS produced {frame.sample_rate}Hz/{frame.num_channels}ch audio, "
+                                     f"cache expects {self.sample_rate}Hz/{self.num_channels}ch")
+                pcm.extend(frame.data.cast("B"))
+        if not pcm:
+            return False
+        self.put(text, bytes(pcm))
+        return True
+
+    async def prepopulate(self, tts, texts: Iterable[str]) -> int:
+        """Synthesize every text that is not cached yet; returns how many clips were added"""
+        added = 0
+        for text in dict.fromkeys(_normalize(text) for text in texts if text and text.strip()):
+            if self.contains(text):
+                continue
+            try:
+                if await self.synthesize(tts, text):
+                    added += 1
+            except Exception as e:
+                logging.warning(f"TTS cache: failed to synthesize {text[:40]!r}: {e}")
+        return added
+
+    def close(self):
+        with self._lock:
+            for mapping in self._maps.values():
+                try:
+                    mapping.close()
+                except BufferError:
+                    # A frame still references the clip; the mapping goes away with it
+                    pass
+            self._maps.clear()
+
+
+def prepopulate_in_background(cache: TTSAudioCache, make_tts: Callable, texts: Callable[[], Iterable[str]]) -> threading.Thread:
+    """
+    Fill the cache on a background thread with its own event loop, so a worker can
+    start accepting calls immediately. `make_tts(http_session)` builds the TTS;
+    `texts()` lists the utterances to cache.
+    """
+    async def run():
+        async with aiohttp.ClientSession() as http_session:
+            added = await cache.prepopulate(make_tts(http_session), texts())
+        logging.info(f"TTS cache: {added} clips synthesized at worker start")
+
+    def target():
+        try:
+            asyncio.run(run())
+        except Exception as e:
+            logging.warning(f"TTS cache prepopulation failed (non-critical): {e}")
+
+    thread = threading.Thread(target=target, name="tts-cache-prepopulate", daemon=True)
+    thread.start()
+    return thread
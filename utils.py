@@ -1,9 +1,12 @@
-import requests
 import os
+import re
+from typing import AsyncIterator
 from dotenv import load_dotenv
-from groq import Groq
+from clients import get_clients
 import logging
+import threading
 from datetime import datetime
+from latency_metrics import current_session_id
 
 
 # Load environment variables
@@ -48,6 +51,28 @@ SESSION_INSTRUCTION = """
 GREETING_MESSAGE = "Hi my name is Freya, this is Bliss Salon, how may I help you?"
 
 
+HF_INFERENCE_URL = "https://api-inference.huggingface.co/models/{model_name}"
+
+FORMATTER_SYSTEM_MESSAGE = """
+        You are Freya, a receptionist at Bliss Salon. Your job is to generate rely from the given texts by strictly following these instructions.
+        <instructions>
+        - DO NOT USE * OR ANY OTHER SYMBOLS
+        - Avoid unnecessary pleasantries. 
+        - Be polite, classy, and brief - answer in 1-2 sentences maximum.
+        - Do not use markdowns 
+        - Only answer questions about the salon using the provided information.
+        - If the provided information does not contain relevant details to answer the customer's question, return a blank string.
+        - If you don't know something or the information is insufficient, return a blank string.
+        - If you are unsure of something return a blank string.
+        </instructions>
+        """
+
+# Split streamed text after sentence-ending punctuation
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+FORMATTER_FALLBACK_RESPONSE = "I apologize, but I'm having technical difficulties at the moment. Please call us directly, and we'll be happy to assist you."
+
+
 def get_huggingface_embedding(text, api_key, model_name="BAAI/bge-small-en-v1.5"):
     """Get embeddings from HuggingFace Inference API"""
     headers = {
@@ -55,9 +80,30 @@ def get_huggingface_embedding(text, api_key, model_name="BAAI/bge-small-en-v1.5"
         "Content-Type": "application/json"
     }
 
-    url = f"https://api-inference.huggingface.co/models/{model_name}"
+    url = HF_INFERENCE_URL.format(model_name=model_name)
+
+    response = get_clients().http_session.post(
+        url,
+        headers=headers,
+        json={"inputs": text}
+    )
+
+    if response.status_code == 200:
+        return response.json()
+    else:
+        raise Exception(f"HuggingFace API error: {response.status_code} - {response.text}")
+
+
+async def get_huggingface_embedding_async(text, api_key, model_name="BAAI/bge-small-en-v1.5"):
+    """Get embeddings from HuggingFace Inference API without blocking the event loop"""
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+
+    url = HF_INFERENCE_URL.format(model_name=model_name)
 
-    response = requests.post(
+    response = await get_clients().http.post(
         url,
         headers=headers,
         json={"inputs": text}
@@ -69,11 +115,33 @@ def get_huggingface_embedding(text, api_key, model_name="BAAI/bge-small-en-v1.5"
         raise Exception(f"HuggingFace API error: {response.status_code} - {response.text}")
 
 
+def _build_formatter_messages(vectorstore_text: str, user_query: str, system_message: str = FORMATTER_SYSTEM_MESSAGE) -> list[dict]:
+    """Build the chat messages shared by the sync and async response formatters"""
+    # Create context from vectorstore text
+    context_prompt = f"""
+        Based on the following salon information, provide a response as the receptionist:
+
+        <salon_information>
+        {vectorstore_text}
+        </salon_information>
+
+        <customer_query> 
+        {user_query}
+        </customer_query> 
+        """
+
+    return [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": context_prompt}
+    ]
+
+
 def format_response_with_ai(
     vectorstore_text: str,
     user_query: str,
     model: str = "moonshotai/kimi-k2-instruct-0905",
-    temperature: float = 0.7
+    temperature: float = 0.7,
+    system_message: str = FORMATTER_SYSTEM_MESSAGE
 ) -> str:
     """
     Takes text from vectorstore and formats it as a proper salon receptionist response
@@ -84,49 +152,19 @@ def format_response_with_ai(
         user_query: The customer's original question
         model: Groq model to use
         temperature: Response creativity (0-1)
+        system_message: Formatter persona and rules (per tenant)
 
     Returns:
         Formatted response as Freya the receptionist
     """
     try:
-        # Initialize Groq client
-        client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-
-        # Create context from vectorstore text
-        context_prompt = f"""
-        Based on the following salon information, provide a response as Freya the receptionist:
-
-        <salon_information>
-        {vectorstore_text}
-        </salon_information>
-
-        <customer_query> 
-        {user_query}
-        </customer_query> 
-        """
-
-        # Streamlined instructions for the AI
-        system_message = """
-        You are Freya, a receptionist at Bliss Salon. Your job is to generate rely from the given texts by strictly following these instructions.
-        <instructions>
-        - DO NOT USE * OR ANY OTHER SYMBOLS
-        - Avoid unnecessary pleasantries. 
-        - Be polite, classy, and brief - answer in 1-2 sentences maximum.
-        - Do not use markdowns 
-        - Only answer questions about the salon using the provided information.
-        - If the provided information does not contain relevant details to answer the customer's question, return a blank string.
-        - If you don't know something or the information is insufficient, return a blank string.
-        - If you are unsure of something return a blank string.
-        </instructions>
-        """
+        # Reuse the pooled Groq client
+        client = get_clients().groq_sync
 
         # Make API call to Groq
         completion = client.chat.completions.create(
             model=model,
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": context_prompt}
-            ],
+            messages=_build_formatter_messages(vectorstore_text, user_query, system_message),
             temperature=temperature,
             max_tokens=150
         )
@@ -138,17 +176,168 @@ def format_response_with_ai(
         print(f"AI Formatter Error: {str(error)}")
         print(f"Error Type: {type(error).__name__}")
         # Fallback response in case of API error
-        return "I apologize, but I'm having technical difficulties at the moment. Please call us directly, and we'll be happy to assist you."
+        return FORMATTER_FALLBACK_RESPONSE
+
+
+def tts_ready(text: str) -> str:
+    """Strip markdown and list symbols and collapse whitespace so TTS reads the text cleanly"""
+    text = re.sub(r"[*_#`>|]+", "", text)
+    text = re.sub(r"^\s*[-\u2022]\s+", "", text, flags=re.MULTILINE)
+    return " ".join(text.split())
+
+
+def canonical_answer(content: str, question: str, system_message: str = FORMATTER_SYSTEM_MESSAGE) -> str:
+    """
+    Precompute the spoken answer for a knowledge-base entry, once at ingest time instead
+    of on every call. Returns "" if the formatter failed or had nothing to say, in which
+    case the entry keeps being answered through the formatter.
+    """
+    answer = format_response_with_ai(content, question, temperature=0.2, system_message=system_message)
+    if not answer or answer == FORMATTER_FALLBACK_RESPONSE:
+        return ""
+    return tts_ready(answer)
+
+
+async def format_response_with_ai_async(
+    vectorstore_text: str,
+    user_query: str,
+    model: str = "moonshotai/kimi-k2-instruct-0905",
+    temperature: float = 0.7,
+    system_message: str = FORMATTER_SYSTEM_MESSAGE
+) -> str:
+    """
+    Async variant of format_response_with_ai for use inside the agent's event loop.
+
+    Args:
+        vectorstore_text: Raw text retrieved from vectorstore
+        user_query: The customer's original question
+        model: Groq model to use
+        temperature: Response creativity (0-1)
+        system_message: Formatter persona and rules (per tenant)
+
+    Returns:
+        Formatted response as Freya the receptionist
+    """
+    try:
+        client = get_clients().groq
+
+        completion = await client.chat.completions.create(
+            model=model,
+            messages=_build_formatter_messages(vectorstore_text, user_query, system_message),
+            temperature=temperature,
+            max_tokens=150
+        )
+
+        return completion.choices[0].message.content
+
+    except Exception as error:
+        logging.error(f"AI Formatter Error ({type(error).__name__}): {error}")
+        return FORMATTER_FALLBACK_RESPONSE
+
+
+async def stream_response_with_ai(
+    vectorstore_text: str,
+    user_query: str,
+    model: str = "moonshotai/kimi-k2-instruct-0905",
+    temperature: float = 0.7,
+    system_message: str = FORMATTER_SYSTEM_MESSAGE
+) -> AsyncIterator[str]:
+    """
+    Streaming variant of format_response_with_ai_async. Yields the reply one sentence
+    at a time as Groq produces tokens, so TTS can start speaking on the first sentence.
+    Yields nothing when the model decides the information is insufficient.
+
+    Args:
+        vectorstore_text: Raw text retrieved from vectorstore
+        user_query: The customer's original question
+        model: Groq model to use
+        temperature: Response creativity (0-1)
+        system_message: Formatter persona and rules (per tenant)
+    """
+    stream = await get_clients().groq.chat.completions.create(
+        model=model,
+        messages=_build_formatter_messages(vectorstore_text, user_query, system_message),
+        temperature=temperature,
+        max_tokens=150,
+        stream=True
+    )
+
+    buffer = ""
+    async for chunk in stream:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if not delta:
+            continue
+        buffer += delta
+        sentences = SENTENCE_BOUNDARY.split(buffer)
+        buffer = sentences.pop()
+        for sentence in sentences:
+            if sentence.strip():
+                yield sentence.strip() + " "
+
+    if buffer.strip():
+        yield buffer.strip()
+
+
+class CartesiaErrorFilter(logging.Filter):
+    """Convert stack traces of expected Cartesia connection errors to simple messages"""
+
+    def filter(self, record):
+        if "Cartesia connection closed unexpectedly" in str(record.getMessage()):
+            record.msg = "TTS connection temporarily interrupted - retrying automatically"
+            record.levelno = logging.INFO
+            record.levelname = "INFO"
+            return True
+        if "APIConnectionError" in str(record.getMessage()) and "cartesia" in str(record.pathname).lower():
+            record.msg = "TTS service reconnecting - temporary interruption"
+            record.levelno = logging.INFO
+            record.levelname = "INFO"
+            return True
+        return True
+
+
+class SessionLogFilter(logging.Filter):
+    """Pass only records logged from tasks bound to one call with latency_metrics.bind_session"""
+
+    def __init__(self, session_id):
+        super().__init__()
+        self.session_id = session_id
+
+    def filter(self, record):
+        return current_session_id.get() == self.session_id
+
+
+LOG_FORMATTER = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+_logging_lock = threading.Lock()
+_console_handler = None
+# session_id -> file handler of a call in progress
+_session_handlers = {}
+
+
+def _file_handler(log_filepath):
+    handler = logging.FileHandler(log_filepath, encoding='utf-8')
+    handler.setLevel(logging.INFO)
+    handler.setFormatter(LOG_FORMATTER)
+    handler.addFilter(CartesiaErrorFilter())
+    return handler
 
 
 def setup_logging(session_id=None):
     """
-    Configure logging to output to both console and file with graceful error handling
+    Configure logging to output to both console and file with graceful error handling.
+
+    The root logger and its console handler are set up once per process. With a
+    session_id, logs/ai_receptionist_<session_id>.log receives only that call's
+    records (those logged from tasks bound to it with latency_metrics.bind_session),
+    so concurrent calls in one worker each keep their own file; call
+    teardown_session_logging when the call ends. Without one, a timestamped file
+    receives every record.
     """
+    global _console_handler
+
     # Create logs directory if it doesn't exist
     log_dir = "logs"
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
+    os.makedirs(log_dir, exist_ok=True)
 
     # Generate log filename with session_id if provided, otherwise use timestamp
     if session_id:
@@ -157,59 +346,41 @@ def setup_logging(session_id=None):
         log_filename = f"ai_receptionist_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
     log_filepath = os.path.join(log_dir, log_filename)
 
-    # Create formatter
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-
-    # Configure root logger
     root_logger = logging.getLogger()
-    root_logger.setLevel(logging.INFO)
-
-    # Remove any existing handlers to avoid duplicates
-    root_logger.handlers.clear()
-
-    # Create console handler
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
-    console_handler.setFormatter(formatter)
-
-    # Create file handler
-    file_handler = logging.FileHandler(log_filepath, encoding='utf-8')
-    file_handler.setLevel(logging.INFO)
-    file_handler.setFormatter(formatter)
-
-    # Add handlers to root logger
-    root_logger.addHandler(console_handler)
-    root_logger.addHandler(file_handler)
-
-    # Configure specific loggers to handle expected errors gracefully
-    # Suppress verbose Cartesia connection errors in favor of clean messages
-    cartesia_logger = logging.getLogger("livekit.plugins.cartesia")
-    cartesia_logger.setLevel(logging.WARNING)
-
-    # Add custom filter for Cartesia connection errors
-    class CartesiaErrorFilter(logging.Filter):
-        def filter(self, record):
-            # Convert stack traces to simple messages for expected connection errors
-            if "Cartesia connection closed unexpectedly" in str(record.getMessage()):
-                record.msg = "TTS connection temporarily interrupted - retrying automatically"
-                record.levelno = logging.INFO
-                record.levelname = "INFO"
-                return True
-            if "APIConnectionError" in str(record.getMessage()) and "cartesia" in str(record.pathname).lower():
-                record.msg = "TTS service reconnecting - temporary interruption"
-                record.levelno = logging.INFO
-                record.levelname = "INFO"
-                return True
-            return True
-
-    # Apply filter to all handlers
-    error_filter = CartesiaErrorFilter()
-    for handler in root_logger.handlers:
-        handler.addFilter(error_filter)
+    with _logging_lock:
+        if _console_handler is None:
+            root_logger.setLevel(logging.INFO)
+            # Replace the default handlers once; later calls only add and remove their own file
+            root_logger.handlers.clear()
+            _console_handler = logging.StreamHandler()
+            _console_handler.setLevel(logging.INFO)
+            _console_handler.setFormatter(LOG_FORMATTER)
+            _console_handler.addFilter(CartesiaErrorFilter())
+            root_logger.addHandler(_console_handler)
+
+            # Suppress verbose Cartesia connection errors in favor of clean messages
+            logging.getLogger("livekit.plugins.cartesia").setLevel(logging.WARNING)
+
+        file_handler = _file_handler(log_filepath)
+        if session_id:
+            file_handler.addFilter(SessionLogFilter(session_id))
+            previous = _session_handlers.pop(session_id, None)
+            if previous is not None:
+                root_logger.removeHandler(previous)
+                previous.close()
+            _session_handlers[session_id] = file_handler
+        root_logger.addHandler(file_handler)
 
     # Log the initialization
     logging.info(f"Logging initialized. Log file: {log_filepath}")
 
     return log_filepath
+
+
+def teardown_session_logging(session_id):
+    """Detach and close the log file of a call set up with setup_logging(session_id)"""
+    with _logging_lock:
+        handler = _session_handlers.pop(session_id, None)
+    if handler is not None:
+        logging.getLogger().removeHandler(handler)
+        handler.close()
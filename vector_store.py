@@ -0,0 +1,355 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from clients import get_clients
+
+DEFAULT_LOCAL_VECTOR_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vector_data")
+
+# Blue/green pointers from a logical namespace (NAMESPACE) to the physical one being served
+KB_ALIAS_DIR = os.getenv(
+    "KB_ALIAS_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "kb_aliases")
+)
+
+_aliases: dict = {}
+_aliases_lock = threading.Lock()
+
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Exclusive lock on `path` across processes (ingest, server.py), so read-modify-write
+    updates of files several processes write never lose each other's changes
+    """
+    with open(path, "a+b") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _alias_path(namespace: Optional[str]) -> str:
+    return os.path.join(KB_ALIAS_DIR, f"{namespace or 'default'}.alias")
+
+
+def set_namespace_alias(namespace: Optional[str], physical: str) -> None:
+    """Atomically point a logical namespace at a physical one (used to swap in a rebuilt index)"""
+    os.makedirs(KB_ALIAS_DIR, exist_ok=True)
+    path = _alias_path(namespace)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(physical)
+    os.replace(path + ".tmp", path)
+    with _aliases_lock:
+        _aliases.pop(namespace, None)
+
+
+def resolve_namespace(namespace: Optional[str]) -> Optional[str]:
+    """Physical namespace currently serving `namespace` (itself if it was never swapped); re-read at most every 100ms"""
+    now = time.monotonic()
+    with _aliases_lock:
+        cached = _aliases.get(namespace)
+        if cached is not None and now - cached[0] < 0.1:
+            return cached[1]
+    try:
+        with open(_alias_path(namespace), "r", encoding="utf-8") as f:
+            physical = f.read().strip() or namespace
+    except FileNotFoundError:
+        physical = namespace
+    with _aliases_lock:
+        _aliases[namespace] = (now, physical)
+    return physical
+
+
+@dataclass
+class VectorMatch:
+    """A query hit, shaped like upstash_vector.types.QueryResult so callers can use either backend"""
+    id: str
+    score: float
+    metadata: Optional[dict] = None
+    data: Optional[str] = None
+
+
+class VectorStore:
+    """
+    Minimal vector store interface used by the agent, server.py and the ingest script.
+
+    Vectors are passed in the dict format the repo already builds for Upstash:
+    {"id": ..., "vector": [...], "metadata": {...}, "data": ...}
+    Namespaces are physical; readers and writers of the live knowledge base pass
+    resolve_namespace(NAMESPACE) so the ingest script can swap it blue/green.
+    """
+
+    name = "base"
+
+    def upsert(self, vectors: list[dict], namespace: Optional[str] = None):
+        raise NotImplementedError
+
+    def query(self, vector, top_k: int = 3, include_metadata: bool = True,
+              include_vectors: bool = False, namespace: Optional[str] = None) -> list:
+        raise NotImplementedError
+
+    async def query_async(self, vector, top_k: int = 3, include_metadata: bool = True,
+                          include_vectors: bool = False, namespace: Optional[str] = None) -> list:
+        return self.query(vector, top_k=top_k, include_metadata=include_metadata,
+                          include_vectors=include_vectors, namespace=namespace)
+
+    def delete(self, ids: list[str], namespace: Optional[str] = None):
+        raise NotImplementedError
+
+    def reset(self, namespace: Optional[str] = None):
+        raise NotImplementedError
+
+
+class UpstashVectorStore(VectorStore):
+    """Remote Upstash Vector index, using the pooled clients from the registry"""
+
+    name = "upstash"
+
+    def upsert(self, vectors: list[dict], namespace: Optional[str] = None):
+        return get_clients().vector_index_sync.upsert(vectors=vectors, namespace=namespace or "")
+
+    def query(self, vector, top_k: int = 3, include_metadata: bool = True,
+              include_vectors: bool = False, namespace: Optional[str] = None) -> list:
+        return get_clients().vector_index_sync.query(
+            vector=vector,
+            top_k=top_k,
+            include_metadata=include_metadata,
+            include_vectors=include_vectors,
+            namespace=namespace or ""
+        )
+
+    async def query_async(self, vector, top_k: int = 3, include_metadata: bool = True,
+                          include_vectors: bool = False, namespace: Optional[str] = None) -> list:
+        return await get_clients().vector_index.query(
+            vector=vector,
+            top_k=top_k,
+            include_metadata=include_metadata,
+            include_vectors=include_vectors,
+            namespace=namespace or ""
+        )
+
+    def delete(self, ids: list[str], namespace: Optional[str] = None):
+        return get_clients().vector_index_sync.delete(ids=ids, namespace=namespace or "")
+
+    def reset(self, namespace: Optional[str] = None):
+        return get_clients().vector_index_sync.reset(namespace=namespace or "")
+
+
+class _NamespaceSnapshot:
+    """In-memory view of one namespace: a memory-mapped, row-normalized matrix plus its metadata"""
+
+    def __init__(self, matrix: np.ndarray, ids: list, metadata: list, data: list, mtime: int):
+        self.matrix = matrix
+        self.ids = ids
+        self.metadata = metadata
+        self.data = data
+        self.mtime = mtime
+
+
+class LocalVectorStore(VectorStore):
+    """
+    Embedded vector index on local disk.
+
+    Each namespace is a directory holding vectors.npy (float32, L2-normalized rows,
+    memory-mapped on read) and meta.json (ids, metadata, data). Search is a brute-force
+    cosine top-k, which is sub-millisecond at knowledge-base sizes. Readers pick up
+    changes written by other processes by checking the files' mtime. Writers (ingest and
+    server.py both write the live namespace) hold a per-namespace file lock and re-read
+    the files under it, so concurrent upserts and deletes never drop each other's vectors.
+    """
+
+    name = "local"
+
+    def __init__(self, root: str = DEFAULT_LOCAL_VECTOR_DIR):
+        self.root = root
+        self._snapshots: dict[str, _NamespaceSnapshot] = {}
+        self._lock = threading.RLock()
+
+    def _paths(self, namespace: Optional[str]):
+        directory = os.path.join(self.root, namespace or "default")
+        return directory, os.path.join(directory, "vectors.npy"), os.path.join(directory, "meta.json")
+
+    @contextmanager
+    def _write_lock(self, namespace: Optional[str]):
+        """This process's lock plus the namespace's file lock (next to its directory, which reset() removes)"""
+        os.makedirs(self.root, exist_ok=True)
+        with self._lock, file_lock(os.path.join(self.root, f"{namespace or 'default'}.lock")):
+            yield
+
+    def _load(self, namespace: Optional[str], fresh: bool = False) -> Optional[_NamespaceSnapshot]:
+        """Return the namespace snapshot, re-reading it if the files changed on disk (or always if fresh)"""
+        directory, vectors_path, meta_path = self._paths(namespace)
+        try:
+            mtime = os.stat(meta_path).st_mtime_ns
+        except FileNotFoundError:
+            self._snapshots.pop(namespace, None)
+            return None
+
+        snapshot = self._snapshots.get(namespace)
+        if snapshot is not None and snapshot.mtime == mtime and not fresh:
+            return snapshot
+
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        matrix = np.load(vectors_path, mmap_mode="r")
+        if matrix.shape[0] != len(meta["ids"]):
+            # A writer is between replacing the two files; keep serving the previous snapshot
+            return snapshot
+        snapshot = _NamespaceSnapshot(matrix, meta["ids"], meta["metadata"], meta["data"], mtime)
+        self._snapshots[namespace] = snapshot
+        return snapshot
+
+    def _write(self, namespace: Optional[str], matrix: np.ndarray, ids: list, metadata: list, data: list):
+        """Atomically replace the namespace files"""
+        directory, vectors_path, meta_path = self._paths(namespace)
+        os.makedirs(directory, exist_ok=True)
+
+        tmp_vectors = vectors_path + ".tmp.npy"
+        np.save(tmp_vectors, matrix.astype(np.float32))
+        os.replace(tmp_vectors, vectors_path)
+
+        tmp_meta = meta_path + ".tmp"
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump({'ids': ids, 'metadata': metadata, 'data': data}, f)
+        os.replace(tmp_meta, meta_path)
+        self._snapshots.pop(namespace, None)
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def upsert(self, vectors: list[dict], namespace: Optional[str] = None):
+        if not vectors:
+            return "Success"
+        with self._write_lock(namespace):
+            # A coarse mtime may hide another process's write from the cached snapshot
+            snapshot = self._load(namespace, fresh=True)
+            if snapshot is not None:
+                matrix = np.array(snapshot.matrix)
+                ids, metadata, data = list(snapshot.ids), list(snapshot.metadata), list(snapshot.data)
+            else:
+                matrix = np.empty((0, len(vectors[0]["vector"])), dtype=np.float32)
+                ids, metadata, data = [], [], []
+
+            positions = {vector_id: i for i, vector_id in enumerate(ids)}
+            new_rows = []
+            for vector in vectors:
+                row = self._normalize(np.asarray(vector["vector"], dtype=np.float32))
+                if vector["id"] in positions:
+                    i = positions[vector["id"]]
+                    if i < matrix.shape[0]:
+                        matrix[i] = row
+                    else:
+                        new_rows[i - matrix.shape[0]] = row
+                    metadata[i] = vector.get("metadata")
+                    data[i] = vector.get("data")
+                else:
+                    positions[vector["id"]] = len(ids)
+                    ids.append(vector["id"])
+                    metadata.append(vector.get("metadata"))
+                    data.append(vector.get("data"))
+                    new_rows.append(row)
+            if new_rows:
+                matrix = np.vstack([matrix, np.stack(new_rows)])
+
+            self._write(namespace, matrix, ids, metadata, data)
+        logging.info(f"Local vector store upserted {len(vectors)} vectors into namespace {namespace}")
+        return "Success"
+
+    def query(self, vector, top_k: int = 3, include_metadata: bool = True,
+              include_vectors: bool = False, namespace: Optional[str] = None) -> list:
+        with self._lock:
+            snapshot = self._load(namespace)
+        if snapshot is None or not snapshot.ids:
+            return []
+
+        query = self._normalize(np.asarray(vector, dtype=np.float32))
+        scores = snapshot.matrix @ query
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            VectorMatch(
+                id=snapshot.ids[i],
+                score=float(scores[i]),
+                metadata=snapshot.metadata[i] if include_metadata else None,
+                data=snapshot.data[i]
+            )
+            for i in top
+        ]
+
+    def delete(self, ids: list[str], namespace: Optional[str] = None):
+        with self._write_lock(namespace):
+            snapshot = self._load(namespace, fresh=True)
+            if snapshot is None:
+                return 0
+            doomed = set(ids)
+            keep = [i for i, vector_id in enumerate(snapshot.ids) if vector_id not in doomed]
+            deleted = len(snapshot.ids) - len(keep)
+            if deleted:
+                self._write(
+                    namespace,
+                    np.array(snapshot.matrix)[keep],
+                    [snapshot.ids[i] for i in keep],
+                    [snapshot.metadata[i] for i in keep],
+                    [snapshot.data[i] for i in keep]
+                )
+        return deleted
+
+    def reset(self, namespace: Optional[str] = None):
+        directory, _, _ = self._paths(namespace)
+        with self._write_lock(namespace):
+            shutil.rmtree(directory, ignore_errors=True)
+            self._snapshots.pop(namespace, None)
+        return "Success"
+
+
+def create_vector_store(name: Optional[str] = None) -> VectorStore:
+    """Create a vector store by name: "upstash" (default) or "local" """
+    name = (name or os.getenv("VECTOR_BACKEND", "upstash")).lower()
+    if name == "local":
+        return LocalVectorStore(os.getenv("LOCAL_VECTOR_DIR", DEFAULT_LOCAL_VECTOR_DIR))
+    if name != "upstash":
+        logging.warning(f"Unknown VECTOR_BACKEND '{name}', using upstash")
+    return UpstashVectorStore()
+
+
+_store: Optional[VectorStore] = None
+_store_lock = threading.Lock()
+
+
+def get_vector_store() -> VectorStore:
+    """Return the process-wide vector store selected by VECTOR_BACKEND"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_vector_store()
+                logging.info(f"Using {_store.name} vector store")
+    return _store
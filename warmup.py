@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import os
+from typing import Callable, Iterable, Optional
+
+from clients import get_clients
+from embeddings import get_embedder, LocalEmbedding
+from vector_store import get_vector_store, resolve_namespace
+from tenants import get_tenant_registry, DEFAULT_TENANT_ID
+from lexical_index import get_lexical_index
+
+# Seconds between keep-warm rounds; serverless backends (HF Inference, Upstash) go cold after a few idle minutes
+KEEP_WARM_INTERVAL = float(os.getenv("KEEP_WARM_INTERVAL", "240"))
+# Most clips synthesized into the TTS cache at worker start
+TTS_CACHE_PREPOPULATE_MAX = int(os.getenv("TTS_CACHE_PREPOPULATE_MAX", "200"))
+# Dimension of bge-small-en-v1.5, used for the dummy keep-warm query
+WARMUP_VECTOR = [0.1] * 384
+
+
+def load_shared_resources() -> dict:
+    """
+    Build the per-process singletons once, before the worker accepts jobs: client
+    registry, embedding backend (loading the local model if one is configured),
+    vector store and the default tenant's session database.
+    """
+    get_clients()
+    embedder = get_embedder()
+    if isinstance(embedder, LocalEmbedding):
+        # Load the weights and run one encode so the first caller doesn't pay for it
+        embedder.embed_sync("warmup")
+    tenant = get_tenant_registry().get()
+    return {
+        "embedder": embedder,
+        "vector_store": get_vector_store(),
+        "default_tenant": tenant,
+    }
+
+
+async def warm_services(namespaces: Iterable[Optional[str]]):
+    """Round-trip the embedding backend and vector store on the running loop's pooled clients"""
+    embedder = get_embedder()
+    try:
+        await embedder.embed("test query")
+        logging.info(f"{embedder.name} embedding backend warm")
+    except Exception as e:
+        logging.warning(f"Keep-warm {embedder.name} embedding failed (non-critical): {e}")
+
+    vector_client = get_vector_store()
+    for namespace in set(namespaces):
+        try:
+            await vector_client.query_async(vector=WARMUP_VECTOR, top_k=1, namespace=resolve_namespace(namespace))
+            logging.info(f"{vector_client.name} vector store warm for namespace {namespace}")
+        except Exception as e:
+            logging.warning(f"Keep-warm {vector_client.name} query failed for namespace {namespace} (non-critical): {e}")
+
+
+class KeepWarm:
+    """
+    Background task that keeps serverless backends warm for the worker process.
+
+    The first round runs as soon as the task starts and then every `interval` seconds,
+    so calls never wait on a warm-up round-trip. Async clients are bound to an event
+    loop, so the task runs on the job loop and is restarted if a new loop starts it.
+    """
+
+    def __init__(self, namespaces: Callable[[], Iterable[Optional[str]]], interval: float = KEEP_WARM_INTERVAL):
+        self.namespaces = namespaces
+        self.interval = interval
+        self.rounds = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def ensure_running(self) -> asyncio.Task:
+        """Start the keep-warm task on the running loop unless it is already running there"""
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._task = loop.create_task(self._run(), name="keep-warm")
+        return self._task
+
+    async def _run(self):
+        while True:
+            await warm_services(self.namespaces())
+            self.rounds += 1
+            await asyncio.sleep(self.interval)
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+def loaded_namespaces() -> list:
+    """Namespaces of the tenants this process has served (the default tenant at least)"""
+    registry = get_tenant_registry()
+    # Runs on the event loop: read the default tenant's config rather than loading it and opening its database
+    return [tenant.namespace for tenant in registry.loaded()] or [
+        tenant.namespace for tenant in registry.configured() if tenant.tenant_id == DEFAULT_TENANT_ID
+    ]
+
+
+def common_utterances(fixed: Iterable[str] = (), limit: int = TTS_CACHE_PREPOPULATE_MAX) -> list:
+    """
+    Sentences spoken the same way on many calls, worth pre-synthesizing: the `fixed`
+    ones, every configured tenant's greeting and the knowledge base's precomputed answers.
+    """
+    utterances = list(fixed)
+    tenants = get_tenant_registry().configured()
+    utterances.extend(tenant.greeting for tenant in tenants)
+    for namespace in dict.fromkeys(tenant.namespace for tenant in tenants):
+        for document in get_lexical_index(resolve_namespace(namespace)).documents.values():
+            if document.get('question') and document.get('canonical_answer'):
+                utterances.append(document['canonical_answer'])
+    return list(dict.fromkeys(utterances))[:limit]